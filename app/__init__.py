@@ -79,7 +79,12 @@ def create_app(config_class=Config):
         }), 500
     
     with app.app_context():
+        from app.models import ensure_columns, ensure_indexes
+        from app.player_identity import backfill_identities
         db.create_all()
+        ensure_columns()
+        ensure_indexes()
+        backfill_identities()
         # 创建默认管理员用户（如果不存在）
         from app.models import User
         admin_username = app.config.get('ADMIN_USERNAME', 'admin')
@@ -97,3 +102,34 @@ def create_app(config_class=Config):
     
     return app
 
+def start_background_services(app):
+    """启动后台任务（仅在Web服务进程中调用，辅助脚本不需要）"""
+    from app.session_retention import session_retention
+    from app.status_sampler import status_sampler
+    from app.resource_history import resource_history
+    from app.effect_scheduler import effect_scheduler
+    from app.position_sampler import position_sampler
+    from app.join_latency import join_latency
+    from app.ban_manager import ban_list
+    from app.event_hub import event_hub
+    from app.public_status import public_status
+    from app.server_tuning import server_tuner
+    from app.lifecycle import lifecycle_worker
+    from app.server_readiness import server_readiness
+    from app.instances import instance_registry
+    from app.watchdog import watchdog
+    
+    session_retention.init_app(app)
+    status_sampler.init_app(app)
+    resource_history.init_app(app)
+    effect_scheduler.init_app(app)
+    position_sampler.init_app(app)
+    join_latency.init_app(app)
+    ban_list.init_app(app)
+    event_hub.init_app(app)
+    public_status.init_app(app)
+    server_tuner.init_app(app)
+    lifecycle_worker.init_app(app)
+    server_readiness.init_app(app)
+    instance_registry.init_app(app)
+    watchdog.init_app(app)
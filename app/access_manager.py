@@ -0,0 +1,352 @@
+"""
+白名单与权限管理模块 - 批量导入、对比和应用 allowlist.json / permissions.json
+文件内容在内存中按xuid和名称建立索引（每个条目 O(1) 查找），
+写入使用临时文件 + fsync + rename 保证原子性，写入后通过控制台
+发送 allowlist reload / permission reload，无需重启服务器
+"""
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+
+PERMISSION_LEVELS = ('visitor', 'member', 'operator')
+MODES = ('merge', 'replace')
+
+
+def atomic_write_text(path: Path, content: str) -> None:
+    """原子写入文本文件：写临时文件并fsync，再rename覆盖目标文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{path.name}.', suffix='.tmp', dir=str(path.parent))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        if path.exists():
+            os.chmod(tmp_path, path.stat().st_mode & 0o777)
+        os.replace(tmp_path, path)
+    except Exception:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+    # 确保rename本身也已落盘
+    dir_fd = os.open(str(path.parent), os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def atomic_write_json(path: Path, data) -> None:
+    """原子写入JSON文件"""
+    atomic_write_text(path, json.dumps(data, indent=2, ensure_ascii=False) + '\n')
+
+
+def _parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y')
+
+
+class AccessListManager:
+    """allowlist.json 和 permissions.json 的内存索引"""
+
+    def __init__(self):
+        self._allowlist: Dict[str, Dict] = {}      # 小写名称 -> 条目
+        self._allow_by_xuid: Dict[str, str] = {}   # xuid -> 小写名称
+        self._permissions: Dict[str, str] = {}     # xuid -> 权限等级
+        self._mtimes: Tuple[Optional[float], Optional[float]] = (None, None)
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _mtime(path: Path) -> Optional[float]:
+        try:
+            return path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _read_json(path: Path) -> List[Dict]:
+        if not path.exists():
+            return []
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+        data = json.loads(content) if content else []
+        if not isinstance(data, list):
+            raise ValueError(f"{path.name} 格式无效：应为数组")
+        return data
+
+    def _refresh(self):
+        """文件被手动修改时重新建立索引"""
+        mtimes = (self._mtime(Config.ALLOWLIST_FILE), self._mtime(Config.PERMISSIONS_FILE))
+        if mtimes == self._mtimes:
+            return
+
+        allowlist, by_xuid = {}, {}
+        for entry in self._read_json(Config.ALLOWLIST_FILE):
+            name = str(entry.get('name', '')).strip()
+            if not name:
+                continue
+            allowlist[name.lower()] = entry
+            if entry.get('xuid'):
+                by_xuid[str(entry['xuid'])] = name.lower()
+
+        permissions = {}
+        for entry in self._read_json(Config.PERMISSIONS_FILE):
+            if entry.get('xuid') and entry.get('permission'):
+                permissions[str(entry['xuid'])] = entry['permission']
+
+        self._allowlist, self._allow_by_xuid, self._permissions = allowlist, by_xuid, permissions
+        self._mtimes = mtimes
+
+    def get_lists(self) -> Dict:
+        """返回当前的白名单和权限列表"""
+        with self._lock:
+            self._refresh()
+            return {
+                'allowlist': list(self._allowlist.values()),
+                'permissions': [{'permission': level, 'xuid': xuid} for xuid, level in self._permissions.items()],
+            }
+
+    def is_allowed(self, name: str = '', xuid: str = '') -> bool:
+        """O(1) 检查玩家是否在白名单中"""
+        with self._lock:
+            self._refresh()
+            return (bool(xuid) and xuid in self._allow_by_xuid) or (bool(name) and name.lower() in self._allowlist)
+
+    def permission_of(self, xuid: str) -> Optional[str]:
+        with self._lock:
+            self._refresh()
+            return self._permissions.get(xuid)
+
+    @staticmethod
+    def parse_csv(text: str) -> Dict[str, List[Dict]]:
+        """
+        解析CSV导入：列为 name, xuid, ignoresPlayerLimit, permission, remove
+        每行都是白名单条目；有 permission 列时同时作为权限条目
+        """
+        reader = csv.DictReader(io.StringIO(text.lstrip('\ufeff')))
+        fields = {f.strip() for f in (reader.fieldnames or [])}
+        if 'name' not in fields and 'xuid' not in fields:
+            raise ValueError("CSV需要 name 或 xuid 列")
+
+        allowlist, permissions = [], []
+        for row in reader:
+            row = {(k or '').strip(): (v or '').strip() for k, v in row.items()}
+            if not row.get('name') and not row.get('xuid'):
+                continue
+            allowlist.append(row)
+            if row.get('permission'):
+                permissions.append({'xuid': row.get('xuid', ''), 'name': row.get('name', ''),
+                                    'permission': row['permission'], 'remove': row.get('remove', '')})
+
+        payload = {'allowlist': allowlist}
+        if 'permission' in fields:
+            payload['permissions'] = permissions
+        return payload
+
+    @staticmethod
+    def _normalize(entry: Dict, require_permission: bool = False) -> Tuple[Optional[Dict], Optional[str]]:
+        """校验并规范化一个导入条目，返回 (条目, 错误)"""
+        from app.player_identity import player_identity
+
+        if not isinstance(entry, dict):
+            return None, "条目格式无效"
+        name = str(entry.get('name') or '').strip()
+        xuid = str(entry.get('xuid') or '').strip()
+        if name and (len(name) > 100 or re.search(r'["\n\r]', name)):
+            return None, f"无效的玩家名称: {name}"
+        if xuid and not xuid.isdigit():
+            return None, f"无效的xuid: {xuid}"
+
+        # 通过身份缓存补全名称或xuid
+        if not name or not xuid:
+            player = player_identity.resolve(name=name, xuid=xuid)
+            if player is not None:
+                name = name or player.name
+                xuid = xuid or player.xuid
+        if not name and not xuid:
+            return None, "需要玩家名称或xuid"
+
+        normalized = {
+            'name': name,
+            'xuid': xuid,
+            'ignoresPlayerLimit': _parse_bool(entry.get('ignoresPlayerLimit', False)),
+            'remove': _parse_bool(entry.get('remove', False)),
+        }
+        if require_permission:
+            permission = str(entry.get('permission') or '').strip().lower()
+            if permission not in PERMISSION_LEVELS:
+                return None, f"无效的权限等级: {permission or '(空)'}"
+            if not xuid:
+                return None, f"无法确定 {name} 的xuid（权限按xuid设置）"
+            normalized['permission'] = permission
+        elif not name and not normalized['remove']:
+            return None, f"无法确定xuid {xuid} 对应的玩家名称"
+        return normalized, None
+
+    def _find_allow_key(self, entry: Dict) -> Optional[str]:
+        if entry['xuid'] and entry['xuid'] in self._allow_by_xuid:
+            return self._allow_by_xuid[entry['xuid']]
+        key = entry['name'].lower()
+        return key if key in self._allowlist else None
+
+    def _diff_allowlist(self, entries: List[Dict], mode: str) -> Tuple[Dict, Dict[str, Dict]]:
+        """计算白名单变更，返回 (变更摘要, 新的白名单)"""
+        result = {'add': [], 'update': [], 'remove': [], 'unchanged': 0}
+        new_list = dict(self._allowlist)
+        seen = set()
+
+        for entry in entries:
+            key = self._find_allow_key(entry)
+            if entry['remove']:
+                if key is not None and key in new_list:
+                    result['remove'].append(new_list.pop(key))
+                continue
+
+            target = {'ignoresPlayerLimit': entry['ignoresPlayerLimit'], 'name': entry['name']}
+            if entry['xuid']:
+                target['xuid'] = entry['xuid']
+
+            if key is None:
+                key = entry['name'].lower()
+                if key in seen:
+                    continue
+                result['add'].append(target)
+            else:
+                current = new_list.get(key, {})
+                if not entry['xuid'] and current.get('xuid'):
+                    target['xuid'] = current['xuid']
+                if target == current:
+                    result['unchanged'] += 1
+                else:
+                    result['update'].append({'from': current, 'to': target})
+                if key != target['name'].lower():
+                    # 同一xuid换了名称
+                    new_list.pop(key, None)
+                    key = target['name'].lower()
+            new_list[key] = target
+            seen.add(key)
+
+        if mode == 'replace':
+            for key in [k for k in new_list if k not in seen]:
+                result['remove'].append(new_list.pop(key))
+        return result, new_list
+
+    def _diff_permissions(self, entries: List[Dict], mode: str) -> Tuple[Dict, Dict[str, str]]:
+        """计算权限变更，返回 (变更摘要, 新的权限表)"""
+        result = {'add': [], 'update': [], 'remove': [], 'unchanged': 0}
+        new_permissions = dict(self._permissions)
+        seen = set()
+
+        for entry in entries:
+            xuid = entry['xuid']
+            current = new_permissions.get(xuid)
+            if entry['remove']:
+                if current is not None:
+                    result['remove'].append({'xuid': xuid, 'permission': new_permissions.pop(xuid)})
+                continue
+            if current is None:
+                result['add'].append({'xuid': xuid, 'name': entry['name'], 'permission': entry['permission']})
+            elif current != entry['permission']:
+                result['update'].append({'xuid': xuid, 'name': entry['name'], 'from': current,
+                                         'to': entry['permission']})
+            else:
+                result['unchanged'] += 1
+            new_permissions[xuid] = entry['permission']
+            seen.add(xuid)
+
+        if mode == 'replace':
+            for xuid in [x for x in new_permissions if x not in seen]:
+                result['remove'].append({'xuid': xuid, 'permission': new_permissions.pop(xuid)})
+        return result, new_permissions
+
+    def _plan(self, payload: Dict, mode: str) -> Tuple[Dict, Optional[Dict], Optional[Dict]]:
+        """规范化导入数据并计算两个列表的变更"""
+        if mode not in MODES:
+            raise ValueError("mode 必须是 merge 或 replace")
+        self._refresh()
+
+        diff = {'mode': mode, 'errors': []}
+        new_allowlist = new_permissions = None
+
+        if 'allowlist' in payload:
+            entries = []
+            for i, raw in enumerate(payload['allowlist'] or []):
+                entry, error = self._normalize(raw)
+                if error:
+                    diff['errors'].append({'list': 'allowlist', 'index': i, 'error': error})
+                else:
+                    entries.append(entry)
+            diff['allowlist'], new_allowlist = self._diff_allowlist(entries, mode)
+
+        if 'permissions' in payload:
+            entries = []
+            for i, raw in enumerate(payload['permissions'] or []):
+                entry, error = self._normalize(raw, require_permission=True)
+                if error:
+                    diff['errors'].append({'list': 'permissions', 'index': i, 'error': error})
+                else:
+                    entries.append(entry)
+            diff['permissions'], new_permissions = self._diff_permissions(entries, mode)
+
+        return diff, new_allowlist, new_permissions
+
+    @staticmethod
+    def _has_changes(section: Optional[Dict]) -> bool:
+        return bool(section and (section['add'] or section['update'] or section['remove']))
+
+    def diff(self, payload: Dict, mode: str = 'merge') -> Dict:
+        """预览导入会产生的变更（不写入文件）"""
+        with self._lock:
+            diff, _, _ = self._plan(payload, mode)
+            return diff
+
+    def apply(self, payload: Dict, mode: str = 'merge') -> Tuple[bool, str, Dict]:
+        """
+        应用导入：原子写入变更的文件，并让服务器重新加载
+        有无效条目时不写入任何文件（replace 模式下无效的行会让对应玩家被移除）
+        """
+        from app.player_manager import PlayerManager
+
+        with self._lock:
+            diff, new_allowlist, new_permissions = self._plan(payload, mode)
+            if diff['errors']:
+                return False, f"有 {len(diff['errors'])} 个无效条目，未应用任何变更", diff
+            commands = []
+            try:
+                if self._has_changes(diff.get('allowlist')):
+                    atomic_write_json(Config.ALLOWLIST_FILE, list(new_allowlist.values()))
+                    commands.append('allowlist reload')
+                if self._has_changes(diff.get('permissions')):
+                    atomic_write_json(Config.PERMISSIONS_FILE, [
+                        {'permission': level, 'xuid': xuid} for xuid, level in new_permissions.items()
+                    ])
+                    commands.append('permission reload')
+            except Exception as e:
+                self._mtimes = (None, None)
+                return False, f"写入文件失败: {str(e)}", diff
+            self._refresh()
+
+        if not commands:
+            return True, "没有需要应用的变更", diff
+
+        diff['reloaded'] = False
+        if PlayerManager.is_server_running():
+            success, msg = PlayerManager.send_commands(commands)
+            diff['reloaded'] = success
+            if not success:
+                return True, f"文件已更新，但重新加载失败: {msg}", diff
+            return True, "已更新并重新加载", diff
+        return True, "文件已更新，服务器启动时生效", diff
+
+
+# 全局白名单与权限管理实例
+access_lists = AccessListManager()
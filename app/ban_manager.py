@@ -0,0 +1,181 @@
+"""
+封禁管理模块 - 玩家封禁列表与加入时自动踢出
+封禁按名称和xuid保存在内存哈希表中（O(1) 查找）并持久化到SQLite，
+日志跟踪发现 "Player connected" 时立即通过命令通道踢出被封禁的玩家；
+名称和xuid通过玩家身份缓存互相解析，改名后封禁仍然有效
+"""
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from app import db
+from app.models import PlayerBan
+from app.player_identity import player_identity
+
+CONNECT_PATTERN = re.compile(r'Player connected:\s+([^,]+)(?:,\s*xuid:\s*(\d*))?', re.IGNORECASE)
+
+
+class BanList:
+    """内存中的封禁索引"""
+
+    def __init__(self):
+        self.app = None
+        self._by_name: Dict[str, Tuple[int, Optional[float], str]] = {}
+        self._by_xuid: Dict[str, Tuple[int, Optional[float], str]] = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """从数据库加载封禁并订阅日志跟踪"""
+        from app.log_monitor import log_tail
+
+        self.app = app
+        with app.app_context():
+            self.reload()
+        log_tail.subscribe(self.handle_line)
+
+    @staticmethod
+    def _entry(ban: PlayerBan) -> Tuple[int, Optional[float], str]:
+        expires = (ban.expires_at - datetime(1970, 1, 1)).total_seconds() if ban.expires_at else None
+        return ban.id, expires, ban.reason or ''
+
+    def reload(self):
+        """重新加载所有生效中的封禁（需要在应用上下文中调用）"""
+        now = datetime.utcnow()
+        by_name, by_xuid = {}, {}
+        for ban in PlayerBan.query.all():
+            if not ban.is_active(now):
+                continue
+            if ban.player_name:
+                by_name[ban.player_name.lower()] = self._entry(ban)
+            if ban.xuid:
+                by_xuid[ban.xuid] = self._entry(ban)
+        with self._lock:
+            self._by_name, self._by_xuid = by_name, by_xuid
+
+    def _index(self, ban: PlayerBan):
+        with self._lock:
+            if ban.player_name:
+                self._by_name[ban.player_name.lower()] = self._entry(ban)
+            if ban.xuid:
+                self._by_xuid[ban.xuid] = self._entry(ban)
+
+    def _unindex(self, ban: PlayerBan):
+        with self._lock:
+            if ban.player_name and self._by_name.get(ban.player_name.lower(), (None,))[0] == ban.id:
+                del self._by_name[ban.player_name.lower()]
+            if ban.xuid and self._by_xuid.get(ban.xuid, (None,))[0] == ban.id:
+                del self._by_xuid[ban.xuid]
+
+    def lookup(self, player_name: str = '', xuid: str = '') -> Optional[Tuple[int, Optional[float], str]]:
+        """O(1) 检查玩家是否被封禁，返回 (封禁ID, 到期时间戳, 原因)"""
+        now = time.time()
+        with self._lock:
+            for index, key in ((self._by_xuid, xuid), (self._by_name, player_name.lower())):
+                if not key:
+                    continue
+                entry = index.get(key)
+                if entry is None:
+                    continue
+                if entry[1] is not None and entry[1] <= now:
+                    # 已过期，惰性移除
+                    del index[key]
+                    continue
+                return entry
+        return None
+
+    def handle_line(self, line: str):
+        """日志跟踪回调：被封禁的玩家连接时立即踢出"""
+        match = CONNECT_PATTERN.search(line)
+        if not match:
+            return
+        player_name, xuid = match.group(1).strip(), match.group(2) or ''
+        if not xuid and self.app is not None:
+            # 不带xuid的日志行按名称解析到已知的xuid
+            with self.app.app_context():
+                player = player_identity.resolve(name=player_name)
+            xuid = player.xuid if player else ''
+        entry = self.lookup(player_name, xuid)
+        if entry is None:
+            return
+
+        from app.player_manager import PlayerManager
+        PlayerManager.send_command(f'kick "{player_name}" {entry[2] or "你已被封禁"}')
+
+        # 仅按名称封禁时补充xuid，之后改名也能识别
+        if xuid and xuid not in self._by_xuid and self.app is not None:
+            with self.app.app_context():
+                ban = PlayerBan.query.get(entry[0])
+                if ban and not ban.xuid:
+                    ban.xuid = xuid
+                    db.session.commit()
+                    self._index(ban)
+
+    def ban(self, player_name: str = '', xuid: str = '', reason: str = '', duration: Optional[int] = None,
+            created_by: Optional[str] = None) -> Tuple[bool, str, Optional[PlayerBan]]:
+        """添加封禁，如果玩家在线立即踢出"""
+        from app.player_manager import PlayerManager
+
+        player_name = (player_name or '').strip()
+        xuid = (xuid or '').strip()
+        if not player_name and not xuid:
+            return False, "需要玩家名称或xuid", None
+        if player_name and (len(player_name) > 100 or re.search(r'["\n\r]', player_name)):
+            return False, "无效的玩家名称", None
+        if xuid and not xuid.isdigit():
+            return False, "无效的xuid", None
+        reason = re.sub(r'[^\w\s\u4e00-\u9fff]', '', reason or '')[:100]
+
+        # 通过身份缓存补全名称或xuid，玩家改名后按xuid仍能识别
+        player = player_identity.resolve(name=player_name, xuid=xuid)
+        if player is not None:
+            xuid = xuid or player.xuid
+            player_name = player_name or player.name
+
+        expires_at = None
+        if duration:
+            if duration < 0:
+                return False, "封禁时长无效", None
+            expires_at = datetime.utcnow() + timedelta(seconds=duration)
+
+        try:
+            ban = PlayerBan(
+                player_name=player_name or None, xuid=xuid or None, reason=reason,
+                expires_at=expires_at, created_by=created_by
+            )
+            db.session.add(ban)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return False, f"保存封禁失败: {str(e)}", None
+
+        self._index(ban)
+
+        if player_name:
+            PlayerManager.send_command(f'kick "{player_name}" {reason or "你已被封禁"}')
+            PlayerManager._player_disconnected(player_name)
+
+        return True, f"已封禁 {player_name or xuid}", ban
+
+    def unban(self, ban_id: int) -> Tuple[bool, str]:
+        """解除封禁"""
+        ban = PlayerBan.query.get(ban_id)
+        if not ban:
+            return False, "封禁记录不存在"
+        self._unindex(ban)
+        db.session.delete(ban)
+        db.session.commit()
+        # 同一玩家可能还有其他封禁记录
+        self.reload()
+        return True, f"已解除 {ban.player_name or ban.xuid} 的封禁"
+
+    def list_bans(self, include_expired: bool = False) -> List[PlayerBan]:
+        bans = PlayerBan.query.order_by(PlayerBan.created_at.desc()).all()
+        if include_expired:
+            return bans
+        return [ban for ban in bans if ban.is_active()]
+
+
+# 全局封禁列表实例
+ban_list = BanList()
@@ -0,0 +1,202 @@
+"""
+定时效果调度模块 - 处理无敌等限时效果的到期和重连后重新应用
+使用最小堆按截止时间排序，每个事件 O(log n)，待执行的计时器持久化到数据库
+"""
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from app import db
+from app.models import PlayerSession, ScheduledEffect
+from config import Config
+
+# 持久化的动作：到期移除无敌效果
+EXPIRE_INVINCIBLE = 'expire_invincible'
+# 内存中的动作：玩家重连后重新应用未到期的效果
+REAPPLY_EFFECTS = 'reapply_effects'
+
+
+class EffectScheduler:
+    """基于最小堆的定时效果调度器"""
+
+    def __init__(self):
+        self.app = None
+        self._heap: List[Tuple[float, int, Optional[int], str, str, Optional[int]]] = []
+        # 有效的持久化计时器 id -> (玩家键, 动作)；玩家键为身份ID，没有身份的旧记录为名称
+        self._active: Dict[int, Tuple[object, str]] = {}
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def init_app(self, app):
+        """从数据库恢复待执行的计时器并启动调度线程"""
+        from app.player_identity import player_identity
+
+        self.app = app
+        with app.app_context():
+            timers = ScheduledEffect.query.all()
+            # 身份表之前创建的计时器按名称关联到身份
+            for timer in timers:
+                if timer.player_id is None:
+                    player = player_identity.resolve(name=timer.player_name)
+                    timer.player_id = player.id if player else None
+            db.session.commit()
+            for timer in timers:
+                self._push(timer.deadline, timer.player_id, timer.player_name, timer.action, timer.id)
+
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='effect-scheduler', daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _timestamp(deadline: datetime) -> float:
+        return (deadline - datetime(1970, 1, 1)).total_seconds()
+
+    @staticmethod
+    def _timers(player_id: Optional[int], player_name: str):
+        """玩家的计时器查询（有身份时按身份ID，改名后仍能找到）"""
+        if player_id is not None:
+            return ScheduledEffect.query.filter_by(player_id=player_id)
+        return ScheduledEffect.query.filter_by(player_name=player_name)
+
+    def _push(self, deadline: datetime, player_id: Optional[int], player_name: str, action: str,
+              timer_id: Optional[int] = None):
+        with self._condition:
+            if timer_id is not None:
+                key = (player_id if player_id is not None else player_name, action)
+                # 同一玩家的同一动作只保留最新的计时器
+                for stale in [i for i, active in self._active.items() if active == key]:
+                    del self._active[stale]
+                self._active[timer_id] = key
+            heapq.heappush(self._heap, (self._timestamp(deadline), next(self._seq),
+                                        player_id, player_name, action, timer_id))
+            self._condition.notify()
+
+    def schedule(self, player_id: Optional[int], player_name: str, action: str, deadline: datetime,
+                 commit: bool = True) -> ScheduledEffect:
+        """
+        安排一个持久化的定时动作（同一玩家的同一动作只保留最新的一个）
+        需要在应用上下文中调用；commit=False 时由调用方提交事务后再调用 activate()，
+        被替换的旧计时器在 activate() 时才失效，事务回滚不影响已有的计时器
+        """
+        for timer in self._timers(player_id, player_name).filter_by(action=action).all():
+            db.session.delete(timer)
+        timer = ScheduledEffect(player_id=player_id, player_name=player_name, action=action, deadline=deadline)
+        db.session.add(timer)
+        if commit:
+            db.session.commit()
+            self.activate([timer])
+        return timer
+
+    def activate(self, timers: List[ScheduledEffect]):
+        """事务提交后把计时器加入堆"""
+        for timer in timers:
+            self._push(timer.deadline, timer.player_id, timer.player_name, timer.action, timer.id)
+
+    def cancel(self, player_id: Optional[int], player_name: str, action: Optional[str] = None,
+               commit: bool = True) -> List[int]:
+        """
+        取消玩家的定时动作（堆中的条目延迟删除）
+        commit=False 时返回被删除的计时器ID，由调用方提交事务后再调用 deactivate()
+        """
+        query = self._timers(player_id, player_name)
+        if action:
+            query = query.filter_by(action=action)
+        timer_ids = []
+        for timer in query.all():
+            timer_ids.append(timer.id)
+            db.session.delete(timer)
+        if commit:
+            db.session.commit()
+            self.deactivate(timer_ids)
+        return timer_ids
+
+    def deactivate(self, timer_ids: List[int]):
+        """事务提交后使已删除的计时器失效"""
+        with self._condition:
+            for timer_id in timer_ids:
+                self._active.pop(timer_id, None)
+
+    def pending(self, player_id: Optional[int], player_name: str, action: str) -> Optional[datetime]:
+        """返回玩家尚未执行的定时动作截止时间"""
+        timer = self._timers(player_id, player_name).filter_by(action=action).first()
+        return timer.deadline if timer else None
+
+    def on_player_connected(self, player_id: Optional[int], player_name: str):
+        """玩家重新连接时，稍后重新应用未到期的效果（刚连接时玩家尚未生成）"""
+        deadline = datetime.utcnow() + timedelta(seconds=Config.EFFECT_REAPPLY_DELAY)
+        self._push(deadline, player_id, player_name, REAPPLY_EFFECTS)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            with self._condition:
+                # 跳过已取消的计时器
+                while self._heap and self._heap[0][5] is not None and self._heap[0][5] not in self._active:
+                    heapq.heappop(self._heap)
+
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+
+                wait = self._heap[0][0] - time.time()
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+
+                _, _, player_id, player_name, action, timer_id = heapq.heappop(self._heap)
+                if timer_id is not None:
+                    self._active.pop(timer_id, None)
+
+            try:
+                with self.app.app_context():
+                    self._fire(player_id, player_name, action, timer_id)
+            except Exception as e:
+                print(f"Error running scheduled effect {action} for {player_name}: {e}")
+
+    def _fire(self, player_id: Optional[int], player_name: str, action: str, timer_id: Optional[int]):
+        """执行到期的动作"""
+        from app.player_manager import PlayerManager
+        from app.player_identity import player_identity
+
+        if player_id is not None:
+            # 命令发给玩家当前的名称（安排后可能已改名）
+            player_name = player_identity.names_for([player_id]).get(player_id, player_name)
+            session = PlayerSession.query.filter_by(player_id=player_id, is_online=True).first()
+        else:
+            session = PlayerSession.query.filter_by(player_name=player_name, is_online=True).first()
+
+        if action == EXPIRE_INVINCIBLE:
+            if timer_id is not None and ScheduledEffect.query.get(timer_id) is None:
+                # 已被取消（数据库中已删除）
+                return
+            if session:
+                PlayerManager.send_command(f'effect {player_name} clear')
+                session.is_invincible = False
+                session.invincible_until = None
+            if timer_id is not None:
+                ScheduledEffect.query.filter_by(id=timer_id).delete()
+            db.session.commit()
+
+        elif action == REAPPLY_EFFECTS:
+            if not session:
+                return
+            deadline = self.pending(player_id, player_name, EXPIRE_INVINCIBLE)
+            if deadline is None:
+                return
+            remaining = int((deadline - datetime.utcnow()).total_seconds())
+            if remaining <= 0:
+                return
+            success, _ = PlayerManager.send_commands(PlayerManager._invincible_commands(player_name, remaining))
+            if success:
+                session.is_invincible = True
+                session.invincible_until = deadline
+                db.session.commit()
+
+
+# 全局效果调度器实例
+effect_scheduler = EffectScheduler()
@@ -0,0 +1,235 @@
+"""
+事件推送模块 - 每个页面一个SSE连接，按主题（status / players / logs / addons）推送变化
+服务器状态、在线玩家和addon由一个共享的后台采样线程获取，新日志行来自日志跟踪，
+结果只在发生变化时以增量形式推送给所有订阅者，打开多少个页面采样开销都相同
+"""
+import json
+import queue
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from flask import Response, stream_with_context
+
+from config import Config
+
+TOPICS = ('status', 'players', 'logs', 'addons')
+
+# 订阅者队列上限，消费过慢的连接会丢弃最旧的事件
+SUBSCRIBER_QUEUE_SIZE = 1000
+# 没有事件时发送心跳的间隔（秒），防止代理断开空闲连接
+HEARTBEAT_INTERVAL = 15
+
+
+class Subscriber:
+    """一个SSE连接的事件队列"""
+
+    def __init__(self, topics: Set[str]):
+        self.topics = topics
+        self.queue: 'queue.Queue[tuple]' = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def put(self, event: tuple):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.queue.put_nowait(event)
+
+
+def _dict_delta(old: Dict, new: Dict) -> Optional[Dict]:
+    """两个状态字典之间的增量，没有变化时返回None"""
+    changed = {k: v for k, v in new.items() if old.get(k) != v or k not in old}
+    removed = [k for k in old if k not in new]
+    if not changed and not removed:
+        return None
+    delta = {'changed': changed}
+    if removed:
+        delta['removed'] = removed
+    return delta
+
+
+def _players_delta(old: List[Dict], new: List[Dict]) -> Optional[Dict]:
+    """在线玩家列表的增量（按名称）"""
+    old_by_name = {p['name']: p for p in old}
+    new_by_name = {p['name']: p for p in new}
+    added = [p for name, p in new_by_name.items() if name not in old_by_name]
+    updated = [p for name, p in new_by_name.items() if name in old_by_name and old_by_name[name] != p]
+    removed = [name for name in old_by_name if name not in new_by_name]
+    if not added and not updated and not removed:
+        return None
+    return {'added': added, 'updated': updated, 'removed': removed}
+
+
+class EventHub:
+    """主题订阅与共享采样"""
+
+    def __init__(self):
+        self.app = None
+        self._subscribers: List[Subscriber] = []
+        self._state: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def init_app(self, app):
+        """订阅日志跟踪（采样线程在有订阅者时才启动）"""
+        from app.log_monitor import log_tail
+
+        self.app = app
+        log_tail.subscribe(self._on_log_line)
+
+    def _wanted(self, topic: str) -> bool:
+        with self._lock:
+            return any(topic in s.topics for s in self._subscribers)
+
+    def subscribe(self, topics: Iterable[str]) -> Subscriber:
+        """注册订阅者，立即放入各状态主题的当前快照"""
+        subscriber = Subscriber({t for t in topics if t in TOPICS} or set(TOPICS))
+        with self._lock:
+            self._subscribers.append(subscriber)
+            for topic in subscriber.topics:
+                if topic in self._state:
+                    subscriber.put((topic, {'snapshot': self._state[topic]}))
+            if self.app is not None and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name='event-sampler', daemon=True)
+                self._thread.start()
+        # 新订阅者可能需要之前没人订阅的主题，立即采样一次
+        self._wakeup.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def publish(self, topic: str, data: Dict):
+        """把事件发送给订阅了该主题的所有连接"""
+        with self._lock:
+            for subscriber in self._subscribers:
+                if topic in subscriber.topics:
+                    subscriber.put((topic, data))
+
+    def update_state(self, topic: str, state, delta_func=_dict_delta):
+        """更新状态主题，只有发生变化时才推送增量"""
+        with self._lock:
+            previous = self._state.get(topic)
+            self._state[topic] = state
+        if previous is None:
+            self.publish(topic, {'snapshot': state})
+            return
+        delta = delta_func(previous, state)
+        if delta is not None:
+            self.publish(topic, delta)
+
+    def _on_log_line(self, line: str):
+        if line.strip() and line.strip() != 'Dedicated_Server.txt' and self._wanted('logs'):
+            self.publish('logs', {'lines': [line.rstrip('\n\r')]})
+
+    @staticmethod
+    def _sample_status() -> Dict:
+        from app.status_sampler import status_sampler
+        status = status_sampler.get()
+        status.pop('sampled_at', None)
+        # 资源数据保留一位小数，避免微小波动也产生推送
+        for key in ('cpu_percent', 'memory_mb'):
+            if isinstance(status.get(key), float):
+                status[key] = round(status[key], 1)
+        status.pop('ping_ms', None)
+        return status
+
+    @staticmethod
+    def _sample_players() -> List[Dict]:
+        from app.player_manager import PlayerManager
+        success, _, players = PlayerManager.get_online_players()
+        return sorted(players, key=lambda p: p['name']) if success else []
+
+    @staticmethod
+    def _sample_addons() -> Dict:
+        """addon统计和变更指纹（一次聚合查询）"""
+        from app import db
+        from app.models import Addon
+
+        rows = db.session.query(Addon.pack_type, Addon.enabled, db.func.count(Addon.id),
+                                db.func.max(Addon.installed_date), db.func.max(Addon.last_checked)) \
+            .group_by(Addon.pack_type, Addon.enabled).all()
+        stats = {'total': 0, 'enabled': 0, 'behavior': 0, 'resource': 0}
+        fingerprint = []
+        for pack_type, enabled, count, installed, checked in rows:
+            stats['total'] += count
+            stats['enabled'] += count if enabled else 0
+            if pack_type in stats:
+                stats[pack_type] += count
+            fingerprint.append(f'{pack_type}:{enabled}:{count}:{installed}:{checked}')
+        stats['fingerprint'] = ';'.join(sorted(fingerprint))
+        return stats
+
+    def _run(self):
+        intervals = {
+            'status': Config.EVENT_STATUS_INTERVAL,
+            'players': Config.EVENT_PLAYERS_INTERVAL,
+            'addons': Config.EVENT_ADDONS_INTERVAL,
+        }
+        samplers = {'status': self._sample_status, 'players': self._sample_players, 'addons': self._sample_addons}
+        deltas = {'players': _players_delta}
+        last_run = {topic: 0.0 for topic in samplers}
+
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    # 没有订阅者时停止采样，清除状态（下次订阅重新发送完整快照）
+                    self._thread = None
+                    self._state.clear()
+                    return
+                wanted = set().union(*(s.topics for s in self._subscribers))
+
+            self._wakeup.clear()
+            now = time.monotonic()
+            for topic, sample in samplers.items():
+                if topic not in wanted:
+                    continue
+                if last_run[topic] and now - last_run[topic] < intervals[topic]:
+                    continue
+                last_run[topic] = now
+                try:
+                    with self.app.app_context():
+                        state = sample()
+                    self.update_state(topic, state, deltas.get(topic, _dict_delta))
+                except Exception as e:
+                    print(f"Error sampling {topic} for event stream: {e}")
+
+            self._wakeup.wait(1)
+
+    def stream(self, topics: Iterable[str]) -> Response:
+        """为一个页面创建SSE响应"""
+        topics = list(topics)
+
+        def generate():
+            # 在生成器内订阅，连接在开始传输前断开时不会留下订阅者
+            subscriber = self.subscribe(topics)
+            try:
+                yield "retry: 3000\n\n"
+                while True:
+                    try:
+                        topic, data = subscriber.queue.get(timeout=HEARTBEAT_INTERVAL)
+                    except queue.Empty:
+                        yield ": heartbeat\n\n"
+                        continue
+                    yield f"event: {topic}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+            finally:
+                self.unsubscribe(subscriber)
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'
+            }
+        )
+
+
+# 全局事件推送实例
+event_hub = EventHub()
@@ -0,0 +1,176 @@
+"""
+数据导出模块 - 以CSV或NDJSON流式导出玩家会话、日志记录和addon清单
+数据库查询使用 yield_per 分批读取，日志按行读取，响应通过生成器逐块输出，
+导出百万行时内存占用保持平稳；可选gzip压缩
+"""
+import csv
+import io
+import json
+import re
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.models import Addon, PlayerSession
+from config import Config
+
+FORMATS = ('csv', 'ndjson')
+
+# 每次输出的块大小（字节）
+CHUNK_SIZE = 64 * 1024
+
+# Bedrock日志格式: [2024-01-15 10:30:45:123 INFO] message
+LOG_LINE_PATTERN = re.compile(r'^\[(\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2})(?::(\d{1,3}))?\s*([A-Z]*)\]\s?(.*)$')
+
+SESSION_FIELDS = ['id', 'player_name', 'xuid', 'join_time', 'leave_time', 'duration_seconds',
+                  'is_online', 'server_session_id']
+LOG_FIELDS = ['timestamp', 'level', 'message']
+ADDON_FIELDS = ['id', 'name', 'uuid', 'pack_type', 'version', 'enabled', 'curseforge_id',
+                'installed_date', 'last_checked', 'local_path']
+
+
+def _to_datetime(timestamp: Optional[int]) -> Optional[datetime]:
+    return datetime.utcfromtimestamp(timestamp) if timestamp is not None else None
+
+
+def _format_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def iter_sessions(start: Optional[int] = None, end: Optional[int] = None) -> Iterator[Dict]:
+    """按加入时间筛选玩家会话（需要在应用上下文中调用）"""
+    query = PlayerSession.query.with_entities(
+        PlayerSession.id, PlayerSession.player_name, PlayerSession.xuid, PlayerSession.join_time,
+        PlayerSession.leave_time, PlayerSession.is_online, PlayerSession.server_session_id
+    )
+    if start is not None:
+        query = query.filter(PlayerSession.join_time >= _to_datetime(start))
+    if end is not None:
+        query = query.filter(PlayerSession.join_time < _to_datetime(end))
+
+    for row in query.order_by(PlayerSession.id).yield_per(Config.EXPORT_BATCH_SIZE):
+        duration = None
+        if row.join_time and row.leave_time:
+            duration = int((row.leave_time - row.join_time).total_seconds())
+        yield {
+            'id': row.id,
+            'player_name': row.player_name,
+            'xuid': row.xuid,
+            'join_time': row.join_time,
+            'leave_time': row.leave_time,
+            'duration_seconds': duration,
+            'is_online': bool(row.is_online),
+            'server_session_id': row.server_session_id,
+        }
+
+
+def iter_addons(start: Optional[int] = None, end: Optional[int] = None) -> Iterator[Dict]:
+    """按安装时间筛选addon清单（需要在应用上下文中调用）"""
+    query = Addon.query.with_entities(*[getattr(Addon, name) for name in ADDON_FIELDS])
+    if start is not None:
+        query = query.filter(Addon.installed_date >= _to_datetime(start))
+    if end is not None:
+        query = query.filter(Addon.installed_date < _to_datetime(end))
+
+    for row in query.order_by(Addon.id).yield_per(Config.EXPORT_BATCH_SIZE):
+        yield dict(zip(ADDON_FIELDS, row))
+
+
+def parse_log_line(line: str) -> Tuple[Optional[datetime], Optional[str], str]:
+    """解析一行日志，返回 (时间, 级别, 消息)；没有时间戳的行时间和级别为None"""
+    match = LOG_LINE_PATTERN.match(line)
+    if not match:
+        return None, None, line
+    try:
+        timestamp = datetime.strptime(match.group(1), '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return None, None, line
+    millis = int((match.group(2) or '0').ljust(3, '0'))
+    timestamp = timestamp.replace(microsecond=millis * 1000)
+    return timestamp, (match.group(3) or None), match.group(4)
+
+
+def iter_log_records(start: Optional[int] = None, end: Optional[int] = None) -> Iterator[Dict]:
+    """
+    逐行解析日志文件
+    没有时间戳的行（例如多行输出）沿用上一行的时间和级别；
+    日志按时间顺序写入，超过结束时间后停止读取
+    """
+    log_file = Config.LOG_FILE
+    if not log_file.exists():
+        return
+
+    # 日志时间为服务器本地时间
+    start_dt = datetime.fromtimestamp(start) if start is not None else None
+    end_dt = datetime.fromtimestamp(end) if end is not None else None
+
+    current_time, current_level = None, None
+    with open(log_file, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            line = line.rstrip('\n\r')
+            if not line.strip() or line.strip() == 'Dedicated_Server.txt':
+                continue
+
+            timestamp, level, message = parse_log_line(line)
+            if timestamp is not None:
+                current_time, current_level = timestamp, level
+
+            if end_dt is not None and current_time is not None and current_time >= end_dt:
+                break
+            if start_dt is not None and (current_time is None or current_time < start_dt):
+                continue
+
+            yield {'timestamp': current_time, 'level': current_level, 'message': message}
+
+
+def _encode_csv(rows: Iterable[Dict], fields: List[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({k: _format_value(v) for k, v in row.items()})
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _encode_ndjson(rows: Iterable[Dict]) -> Iterator[str]:
+    parts, size = [], 0
+    for row in rows:
+        line = json.dumps(row, ensure_ascii=False, default=_format_value) + '\n'
+        parts.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(parts)
+            parts, size = [], 0
+    yield ''.join(parts)
+
+
+def _gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def encode(rows: Iterable[Dict], fields: List[str], fmt: str, compress: bool = False) -> Iterator[bytes]:
+    """把行序列编码为CSV或NDJSON字节块，可选gzip压缩"""
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+    chunks = _encode_csv(rows, fields) if fmt == 'csv' else _encode_ndjson(rows)
+    chunks = (chunk.encode('utf-8') for chunk in chunks if chunk)
+    return _gzip(chunks) if compress else chunks
+
+
+# 导出数据集: 名称 -> (行生成函数, 字段)
+DATASETS = {
+    'sessions': (iter_sessions, SESSION_FIELDS),
+    'logs': (iter_log_records, LOG_FIELDS),
+    'addons': (iter_addons, ADDON_FIELDS),
+}
@@ -0,0 +1,246 @@
+"""
+服务器实例模块 - 同一台主机上运行的多个Bedrock服务器（例如生存服、创造服、活动服）
+默认实例来自原有配置（BEDROCK_SERVER_DIR 等），INSTANCES_FILE 中列出其余实例。
+每个实例有自己的目录、日志、PID文件、FIFO、systemd单元和端口：ServerManager、PlayerManager
+通过覆盖类属性为每个实例创建子类，LogMonitor、日志跟踪、进程托管、就绪检测和
+安全关闭为每个实例单独创建；默认实例直接使用原有的全局对象。
+所有实例的日志由同一个轮询线程跟踪，状态由同一个采样线程刷新。
+addon目录和玩家记录保存在共用的数据库表中（Addon.uuid 唯一，启用状态不区分实例），目前只属于默认实例
+"""
+import json
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import Config
+
+DEFAULT_INSTANCE_ID = 'default'
+INSTANCE_ID_PATTERN = re.compile(r'^[a-z0-9][a-z0-9_-]{0,49}$')
+
+
+class ServerInstance:
+    """一个服务器实例的路径、端口和按实例划分的管理对象"""
+
+    def __init__(self, id: str, name: str, server_dir: Path, port: int = 19132,
+                 address: str = '127.0.0.1', systemd_unit: Optional[str] = None,
+                 world: str = 'Bedrock level', log_file: Optional[Path] = None,
+                 pid_file: Optional[Path] = None, fifo_path: Optional[Path] = None):
+        self.id = id
+        self.name = name
+        self.server_dir = Path(server_dir)
+        self.port = port
+        self.address = address
+        self.systemd_unit = systemd_unit
+        self.binary = self.server_dir / 'bedrock_server'
+        self.world_dir = self.server_dir / 'worlds' / world
+        self.log_file = Path(log_file) if log_file else self.server_dir / 'Dedicated_Server.txt'
+        self.pid_file = Path(pid_file) if pid_file else Path(f'/tmp/bedrock_server-{id}.pid')
+        self.fifo_path = Path(fifo_path) if fifo_path else self.server_dir / 'server_stdin.fifo'
+
+        # 由 InstanceRegistry 设置
+        self.server_manager = None
+        self.player_manager = None
+        self.log_monitor = None
+        self.log_tail = None
+        self.supervisor = None
+        self.readiness = None
+        self.shutdown = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ServerInstance':
+        """从 INSTANCES_FILE 中的一项创建，格式错误时抛出ValueError"""
+        instance_id = str(data.get('id', '')).strip()
+        if not INSTANCE_ID_PATTERN.match(instance_id):
+            raise ValueError(f"无效的实例ID: {instance_id!r}（小写字母、数字、- 和 _）")
+        if not data.get('server_dir'):
+            raise ValueError(f"实例 {instance_id} 缺少 server_dir")
+        try:
+            port = int(data.get('port', 19132))
+        except (TypeError, ValueError):
+            raise ValueError(f"实例 {instance_id} 的端口无效: {data.get('port')!r}")
+
+        return cls(
+            id=instance_id,
+            name=str(data.get('name') or instance_id),
+            server_dir=Path(data['server_dir']),
+            port=port,
+            address=data.get('address') or Config.BEDROCK_SERVER_ADDRESS,
+            systemd_unit=data.get('systemd_unit') or None,
+            world=data.get('world') or 'Bedrock level',
+            log_file=data.get('log_file'),
+            pid_file=data.get('pid_file'),
+            fifo_path=data.get('fifo_path')
+        )
+
+    @property
+    def is_default(self) -> bool:
+        return self.id == DEFAULT_INSTANCE_ID
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'name': self.name,
+            'default': self.is_default,
+            'server_dir': str(self.server_dir),
+            'address': self.address,
+            'port': self.port,
+            'systemd_unit': self.systemd_unit,
+            'world_dir': str(self.world_dir),
+            'log_file': str(self.log_file)
+        }
+
+
+def _default_instance() -> ServerInstance:
+    """默认实例：原有的配置和全局对象"""
+    from app.log_monitor import log_monitor, log_tail
+    from app.player_manager import PlayerManager
+    from app.server_manager import ServerManager
+    from app.server_readiness import server_readiness
+    from app.server_shutdown import server_shutdown
+    from app.server_supervisor import server_supervisor
+
+    instance = ServerInstance(
+        id=DEFAULT_INSTANCE_ID,
+        name=Config.DEFAULT_INSTANCE_NAME,
+        server_dir=Config.BEDROCK_SERVER_DIR,
+        port=Config.BEDROCK_SERVER_PORT,
+        address=Config.BEDROCK_SERVER_ADDRESS,
+        systemd_unit=ServerManager.SYSTEMD_SERVICE,
+        log_file=Config.LOG_FILE,
+        pid_file=ServerManager.PID_FILE,
+        fifo_path=PlayerManager.SERVER_FIFO_PATH
+    )
+    instance.world_dir = Config.WORLD_DIR
+    instance.server_manager = ServerManager
+    instance.player_manager = PlayerManager
+    instance.log_monitor = log_monitor
+    instance.log_tail = log_tail
+    instance.supervisor = server_supervisor
+    instance.readiness = server_readiness
+    instance.shutdown = server_shutdown
+    return instance
+
+
+def _scope(instance: ServerInstance):
+    """为实例创建日志跟踪、进程托管、就绪检测和管理类的子类"""
+    from app.log_monitor import LogMonitor, LogTail
+    from app.player_manager import PlayerManager
+    from app.server_manager import ServerManager
+    from app.server_readiness import ServerReadiness
+    from app.server_shutdown import ServerShutdown
+    from app.server_supervisor import ServerSupervisor
+
+    instance.log_tail = LogTail(instance.log_file)
+    instance.supervisor = ServerSupervisor(instance.binary, instance.server_dir, instance.log_file, instance.pid_file)
+    instance.log_monitor = LogMonitor(instance.log_file, instance.systemd_unit, instance.supervisor)
+
+    instance.player_manager = type(f'PlayerManager[{instance.id}]', (PlayerManager,), {
+        'SYSTEMD_SERVICE': instance.systemd_unit,
+        'SERVER_FIFO_PATH': instance.fifo_path,
+        'PID_FILE': instance.pid_file,
+        'SESSION_FILE': Path(f'/tmp/bedrock_session_id-{instance.id}.txt'),
+        'LOG_FILE': instance.log_file,
+        'tail': instance.log_tail,
+        'supervisor': instance.supervisor,
+        # 日志增量读取状态每个实例单独保存
+        '_last_log_position': 0,
+        '_last_log_inode': 0,
+        '_current_server_session': None,
+        '_last_list_command_time': 0
+    })
+
+    instance.server_manager = type(f'ServerManager[{instance.id}]', (ServerManager,), {
+        'PID_FILE': instance.pid_file,
+        'SYSTEMD_SERVICE': instance.systemd_unit,
+        'INSTANCE_ID': instance.id,
+        'SERVER_ADDRESS': instance.address,
+        'SERVER_PORT': instance.port,
+        'PROCESS_NAME': str(instance.binary),
+        'AUTOTUNE': False,
+        'supervisor': instance.supervisor,
+        'player_manager': instance.player_manager,
+        '_process': None
+    })
+    instance.readiness = ServerReadiness(instance.server_manager, instance.log_tail, instance.id)
+    instance.server_manager.readiness = instance.readiness
+    instance.shutdown = ServerShutdown(instance.server_manager, instance.log_tail, instance.id)
+    instance.server_manager.shutdown = instance.shutdown
+
+
+class InstanceRegistry:
+    """所有服务器实例（第一次使用时加载）"""
+
+    def __init__(self):
+        self._instances: Optional['OrderedDict[str, ServerInstance]'] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> 'OrderedDict[str, ServerInstance]':
+        instances = OrderedDict()
+        default = _default_instance()
+        instances[default.id] = default
+        ports = {default.port: default.id}
+
+        for data in self._read_file():
+            try:
+                instance = ServerInstance.from_dict(data)
+            except (ValueError, AttributeError) as e:
+                print(f"Error loading server instance: {e}")
+                continue
+            if instance.id in instances:
+                print(f"Error loading server instance: 重复的实例ID {instance.id}")
+                continue
+            if instance.port in ports:
+                print(f"Error loading server instance: {instance.id} 与 {ports[instance.port]} 使用相同的端口 {instance.port}")
+                continue
+            _scope(instance)
+            instances[instance.id] = instance
+            ports[instance.port] = instance.id
+
+        if len(instances) > 1:
+            # 多个实例时按可执行文件的完整路径区分进程，清理孤立进程时不会误杀其他实例
+            default.server_manager.PROCESS_NAME = str(Config.BEDROCK_SERVER_BINARY)
+        return instances
+
+    @staticmethod
+    def _read_file() -> List[Dict]:
+        path = Config.INSTANCES_FILE
+        if not path.exists():
+            return []
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            print(f"Error reading {path}: {e}")
+            return []
+        if not isinstance(data, list):
+            print(f"Error reading {path}: 需要JSON数组")
+            return []
+        return data
+
+    def _all(self) -> 'OrderedDict[str, ServerInstance]':
+        if self._instances is None:
+            with self._lock:
+                if self._instances is None:
+                    self._instances = self._load()
+        return self._instances
+
+    def init_app(self, app):
+        """加载实例并开始跟踪其他实例的日志（默认实例的就绪检测单独初始化）"""
+        for instance in self.all():
+            if not instance.is_default:
+                instance.readiness.init_app(app)
+
+    def all(self) -> List[ServerInstance]:
+        return list(self._all().values())
+
+    def get(self, instance_id: str) -> Optional[ServerInstance]:
+        return self._all().get(instance_id)
+
+    @property
+    def default(self) -> ServerInstance:
+        return self._all()[DEFAULT_INSTANCE_ID]
+
+
+# 全局实例注册表
+instance_registry = InstanceRegistry()
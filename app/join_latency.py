@@ -0,0 +1,187 @@
+"""
+玩家加入耗时统计模块
+从日志跟踪中测量 "Player connected" 到 "Player Spawned" 的时间（主要由资源包下载和世界加载决定），
+按天记录固定区间直方图，并与当时启用的addon组合关联
+"""
+import bisect
+import hashlib
+import json
+import re
+import threading
+import time
+from datetime import datetime, date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from app import db
+from app.models import Addon, JoinLatencyStat
+
+# 直方图区间上限（毫秒），最后一个区间收集所有更长的耗时
+BUCKET_BOUNDS_MS = [250, 500, 1000, 2000, 3000, 5000, 7500, 10000, 15000, 20000, 30000, 45000, 60000, 90000, 120000]
+
+# 超过此时间仍未生成的连接视为放弃
+PENDING_TIMEOUT = 600
+
+TIMESTAMP = r'\[(\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2})(?::(\d{1,3}))?[^\]]*\]'
+CONNECT_PATTERN = re.compile(r'(?:' + TIMESTAMP + r'.*?)?Player connected:\s+([^,]+),', re.IGNORECASE)
+SPAWN_PATTERN = re.compile(r'(?:' + TIMESTAMP + r'.*?)?Player Spawned:\s+(.+?)\s+xuid', re.IGNORECASE)
+DISCONNECT_PATTERN = re.compile(r'Player disconnected:\s+([^,]+)', re.IGNORECASE)
+
+
+def _line_time(match) -> float:
+    """取日志行中的时间戳（含毫秒），没有时间戳时使用当前时间"""
+    if match.group(1):
+        try:
+            dt = datetime.strptime(match.group(1), '%Y-%m-%d %H:%M:%S')
+            millis = int((match.group(2) or '0').ljust(3, '0'))
+            return time.mktime(dt.timetuple()) + millis / 1000
+        except ValueError:
+            pass
+    return time.time()
+
+
+class JoinLatencyTracker:
+    """根据日志跟踪记录玩家加入耗时"""
+
+    def __init__(self):
+        self.app = None
+        self._pending: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """订阅日志跟踪"""
+        from app.log_monitor import log_tail
+
+        self.app = app
+        log_tail.subscribe(self.handle_line)
+
+    def handle_line(self, line: str):
+        """处理一行日志"""
+        match = CONNECT_PATTERN.search(line)
+        if match:
+            with self._lock:
+                self._pending[match.group(3).strip()] = _line_time(match)
+            return
+
+        match = SPAWN_PATTERN.search(line)
+        if match:
+            name = match.group(3).strip()
+            with self._lock:
+                connected = self._pending.pop(name, None)
+            if connected is not None:
+                latency_ms = max(0, int((_line_time(match) - connected) * 1000))
+                with self.app.app_context():
+                    self.record(latency_ms)
+            return
+
+        match = DISCONNECT_PATTERN.search(line)
+        if match:
+            with self._lock:
+                self._pending.pop(match.group(1).strip(), None)
+                # 清理长时间未生成的连接
+                cutoff = time.time() - PENDING_TIMEOUT
+                for name in [n for n, t in self._pending.items() if t < cutoff]:
+                    del self._pending[name]
+
+    @staticmethod
+    def current_addons() -> Tuple[str, List[str]]:
+        """返回当前启用的addon组合指纹和名称列表"""
+        addons = Addon.query.filter_by(enabled=True).order_by(Addon.uuid).all()
+        fingerprint = hashlib.sha1(','.join(a.uuid for a in addons).encode()).hexdigest()[:16]
+        return fingerprint, sorted(a.name for a in addons)
+
+    def record(self, latency_ms: int, day: Optional[date] = None):
+        """记录一次加入耗时（需要在应用上下文中调用）"""
+        day = day or datetime.utcnow().date()
+        fingerprint, names = self.current_addons()
+        try:
+            stat = JoinLatencyStat.query.filter_by(day=day, addon_fingerprint=fingerprint).first()
+            if stat is None:
+                stat = JoinLatencyStat(
+                    day=day, addon_fingerprint=fingerprint, addons=json.dumps(names, ensure_ascii=False),
+                    bucket_counts=json.dumps([0] * (len(BUCKET_BOUNDS_MS) + 1)), count=0, sum_ms=0
+                )
+                db.session.add(stat)
+
+            counts = json.loads(stat.bucket_counts)
+            counts[bisect.bisect_left(BUCKET_BOUNDS_MS, latency_ms)] += 1
+            stat.bucket_counts = json.dumps(counts)
+            stat.count += 1
+            stat.sum_ms += latency_ms
+            stat.min_ms = latency_ms if stat.min_ms is None else min(stat.min_ms, latency_ms)
+            stat.max_ms = latency_ms if stat.max_ms is None else max(stat.max_ms, latency_ms)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error recording join latency: {e}")
+
+    @staticmethod
+    def _percentile(counts: List[int], total: int, q: float) -> Optional[int]:
+        """用区间上限估算分位数"""
+        if total == 0:
+            return None
+        target = q * total
+        running = 0
+        for i, c in enumerate(counts):
+            running += c
+            if running >= target:
+                return BUCKET_BOUNDS_MS[i] if i < len(BUCKET_BOUNDS_MS) else None
+        return None
+
+    @classmethod
+    def _summary(cls, counts: List[int], total: int, sum_ms: int, min_ms, max_ms) -> Dict:
+        return {
+            'count': total,
+            'mean_ms': round(sum_ms / total) if total else None,
+            'min_ms': min_ms,
+            'max_ms': max_ms,
+            'p50_ms': cls._percentile(counts, total, 0.5),
+            'p90_ms': cls._percentile(counts, total, 0.9),
+            'p99_ms': cls._percentile(counts, total, 0.99),
+            'buckets': counts,
+        }
+
+    def get_stats(self, days: int = 30) -> Dict:
+        """返回最近若干天的加入耗时直方图（按天，以及按addon组合汇总）"""
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+        stats = JoinLatencyStat.query.filter(JoinLatencyStat.day >= since).order_by(JoinLatencyStat.day).all()
+
+        daily = []
+        by_addons: Dict[str, Dict] = {}
+        for stat in stats:
+            counts = json.loads(stat.bucket_counts)
+            addons = json.loads(stat.addons)
+            daily.append({
+                'day': stat.day.isoformat(),
+                'addon_fingerprint': stat.addon_fingerprint,
+                **self._summary(counts, stat.count, stat.sum_ms, stat.min_ms, stat.max_ms),
+            })
+
+            group = by_addons.setdefault(stat.addon_fingerprint, {
+                'addons': addons, 'first_day': stat.day.isoformat(), 'counts': [0] * len(counts),
+                'count': 0, 'sum_ms': 0, 'min_ms': None, 'max_ms': None,
+            })
+            group['counts'] = [a + b for a, b in zip(group['counts'], counts)]
+            group['count'] += stat.count
+            group['sum_ms'] += stat.sum_ms
+            group['min_ms'] = min(filter(lambda v: v is not None, [group['min_ms'], stat.min_ms]), default=None)
+            group['max_ms'] = max(filter(lambda v: v is not None, [group['max_ms'], stat.max_ms]), default=None)
+            group['last_day'] = stat.day.isoformat()
+
+        return {
+            'bucket_bounds_ms': BUCKET_BOUNDS_MS,
+            'daily': daily,
+            'by_addon_set': [
+                {
+                    'addon_fingerprint': fingerprint,
+                    'addons': group['addons'],
+                    'first_day': group['first_day'],
+                    'last_day': group['last_day'],
+                    **self._summary(group['counts'], group['count'], group['sum_ms'], group['min_ms'], group['max_ms']),
+                }
+                for fingerprint, group in by_addons.items()
+            ],
+        }
+
+
+# 全局加入耗时统计实例
+join_latency = JoinLatencyTracker()
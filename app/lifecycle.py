@@ -0,0 +1,178 @@
+"""
+服务器生命周期任务模块 - 启动/停止/重启作为异步任务串行执行
+HTTP请求只负责提交任务并立即返回任务ID；唯一的工作线程按顺序执行所有实例的任务，
+记录每一步的进度。同一实例的相同操作已在排队或执行时直接返回已有任务，重复点击不会排队多次
+"""
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# 保留的已完成任务数量
+JOB_HISTORY_SIZE = 50
+
+# 操作 -> ServerManager 方法
+ACTIONS = {
+    'start': 'start_server',
+    'stop': 'stop_server',
+    'restart': 'restart_server',
+}
+
+STATE_QUEUED = 'queued'
+STATE_RUNNING = 'running'
+STATE_SUCCEEDED = 'succeeded'
+STATE_FAILED = 'failed'
+FINISHED_STATES = (STATE_SUCCEEDED, STATE_FAILED)
+
+
+class LifecycleJob:
+    """一个生命周期任务"""
+
+    def __init__(self, action: str, requested_by: Optional[str] = None, instance_id: str = 'default'):
+        self.id = uuid.uuid4().hex[:12]
+        self.action = action
+        self.instance_id = instance_id
+        self.requested_by = requested_by
+        self.state = STATE_QUEUED
+        self.message = ''
+        self.steps: List[Dict] = []
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.done = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    def report(self, step: str):
+        """记录一步进度"""
+        self.steps.append({'time': datetime.utcnow().isoformat(), 'step': step})
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'action': self.action,
+            'instance_id': self.instance_id,
+            'state': self.state,
+            'message': self.message,
+            'progress': self.steps[-1]['step'] if self.steps else '',
+            'steps': list(self.steps),
+            'requested_by': self.requested_by,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class LifecycleWorker:
+    """串行执行生命周期任务的工作线程"""
+
+    def __init__(self):
+        self.app = None
+        self._jobs: 'OrderedDict[str, LifecycleJob]' = OrderedDict()
+        self._queue: 'queue.Queue[LifecycleJob]' = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def init_app(self, app):
+        """工作线程在提交任务时按需启动"""
+        self.app = app
+
+    def submit(self, action: str, requested_by: Optional[str] = None,
+               instance_id: str = 'default') -> Tuple[LifecycleJob, bool]:
+        """
+        提交任务
+
+        Returns:
+            (任务, 是否为新任务)；同一实例的相同操作已在排队或执行时返回已有任务
+        """
+        if self.app is None:
+            # 没有启动后台服务时（例如测试），使用当前请求的应用
+            from flask import current_app
+            self.init_app(current_app._get_current_object())
+        if action not in ACTIONS:
+            raise ValueError(f"未知的操作: {action}")
+
+        with self._lock:
+            for job in self._jobs.values():
+                if job.action == action and job.instance_id == instance_id and not job.finished:
+                    return job, False
+
+            job = LifecycleJob(action, requested_by, instance_id)
+            job.report('排队中')
+            self._jobs[job.id] = job
+            self._trim()
+            self._queue.put(job)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='lifecycle-worker', daemon=True)
+                self._thread.start()
+        return job, True
+
+    def _trim(self):
+        """只保留最近的已完成任务"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - JOB_HISTORY_SIZE)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[LifecycleJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def busy(self, instance_id: str) -> bool:
+        """实例是否有排队或执行中的任务"""
+        with self._lock:
+            return any(job.instance_id == instance_id and not job.finished for job in self._jobs.values())
+
+    def list(self, instance_id: Optional[str] = None) -> List[Dict]:
+        with self._lock:
+            return [
+                job.to_dict() for job in reversed(self._jobs.values())
+                if instance_id is None or job.instance_id == instance_id
+            ]
+
+    def _execute(self, job: LifecycleJob):
+        from app.instances import instance_registry
+        from app.server_manager import ServerManager
+        from app.status_sampler import status_sampler
+
+        job.state = STATE_RUNNING
+        job.started_at = datetime.utcnow()
+        ServerManager.set_progress_callback(job.report)
+        try:
+            manager = instance_registry.get(job.instance_id).server_manager
+            with self.app.app_context():
+                success, message = getattr(manager, ACTIONS[job.action])()
+        except Exception as e:
+            success, message = False, f"执行失败: {e}"
+        finally:
+            ServerManager.set_progress_callback(None)
+        status_sampler.invalidate()
+
+        job.message = message
+        job.report('完成' if success else '失败')
+        job.finished_at = datetime.utcnow()
+        job.state = STATE_SUCCEEDED if success else STATE_FAILED
+        job.done.set()
+
+    def _run(self):
+        while True:
+            try:
+                job = self._queue.get(timeout=60)
+            except queue.Empty:
+                # 空闲时退出，下次提交任务时重新启动
+                with self._lock:
+                    if self._queue.empty():
+                        self._thread = None
+                        return
+                continue
+            try:
+                self._execute(job)
+            except Exception as e:
+                print(f"Error running lifecycle job {job.action}: {e}")
+
+
+# 全局生命周期任务实例
+lifecycle_worker = LifecycleWorker()
@@ -1,32 +1,38 @@
+import re
 import time
 import threading
 import subprocess
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from pathlib import Path
-from typing import List, Optional, Callable
+from typing import List, Optional, Callable, NamedTuple, Pattern, Union
 from config import Config
 from flask import Response, stream_with_context
 
 class LogMonitor:
     """监控服务器日志"""
     
-    def __init__(self):
-        self.log_file = Config.LOG_FILE
+    def __init__(self, log_file: Optional[Path] = None, systemd_unit: Optional[str] = 'bedrock.service',
+                 supervisor=None):
+        self.log_file = Path(log_file or Config.LOG_FILE)
+        self.systemd_unit = systemd_unit
+        self._supervisor = supervisor
         self.last_position = 0
         self.running = False
         self.callbacks: List[Callable] = []
-        self.use_systemd = self._check_systemd_available()
     
-    def _check_systemd_available(self) -> bool:
-        """检查systemd是否可用"""
-        try:
-            result = subprocess.run(
-                ['systemctl', '--version'],
-                capture_output=True,
-                timeout=2
-            )
-            return result.returncode == 0
-        except (subprocess.TimeoutExpired, FileNotFoundError):
-            return False
+    @property
+    def use_systemd(self) -> bool:
+        """systemd是否可用（首次使用时探测，不在导入时启动子进程）"""
+        from app.service_backend import SystemdBackend
+        return bool(self.systemd_unit) and SystemdBackend.available()
+    
+    @property
+    def supervisor(self):
+        """手动模式下托管服务器进程的实例（默认为全局实例）"""
+        if self._supervisor is None:
+            from app.server_supervisor import server_supervisor
+            return server_supervisor
+        return self._supervisor
     
     def _get_logs_from_systemd(self, lines: int = 100) -> List[str]:
         """从systemd journal获取日志"""
@@ -35,7 +41,7 @@ class LogMonitor:
         
         try:
             result = subprocess.run(
-                ['journalctl', '-u', 'bedrock.service', '-n', str(lines), '--no-pager', '-o', 'cat'],
+                ['journalctl', '-u', self.systemd_unit, '-n', str(lines), '--no-pager', '-o', 'cat'],
                 capture_output=True,
                 text=True,
                 timeout=5
@@ -65,6 +71,10 @@ class LogMonitor:
             except Exception as e:
                 print(f"Error reading log file: {e}")
         
+        # 日志文件不可用时，使用管理器启动的服务器的最近输出
+        if not file_logs and self.supervisor.running:
+            return self.supervisor.recent(lines)
+        
         # 如果日志文件为空或不存在，尝试从systemd journal读取
         if not file_logs and self.use_systemd:
             systemd_logs = self._get_logs_from_systemd(lines)
@@ -162,6 +172,252 @@ class LogMonitor:
         
         return log_entry
 
+class LogResponse(NamedTuple):
+    """与等待者匹配的日志响应"""
+    match: 're.Match'
+    lines: List[str]
+
+
+class _ResponseWaiter:
+    """等待日志中出现指定响应的调用方"""
+    
+    def __init__(self, pattern: Pattern, deadline: float, min_offset: int,
+                 continuation: Optional[Callable[['re.Match'], int]] = None):
+        self.pattern = pattern
+        self.deadline = deadline
+        self.min_offset = min_offset
+        self.continuation = continuation
+        self.future: Future = Future()
+        self.match = None
+        self.lines: List[str] = []
+        self.remaining = 0
+    
+    def feed(self, line: str, offset: int) -> bool:
+        """处理一行日志，返回True表示等待已完成"""
+        if self.match is not None:
+            # 已匹配，正在收集后续行（例如 list 命令的玩家名单行）
+            self.lines.append(line)
+            self.remaining -= 1
+        else:
+            # 忽略注册之前写入的行，避免匹配到旧命令的响应
+            if offset < self.min_offset:
+                return False
+            match = self.pattern.search(line)
+            if not match:
+                return False
+            self.match = match
+            self.lines.append(line)
+            self.remaining = self.continuation(match) if self.continuation else 0
+        
+        if self.remaining <= 0:
+            self.future.set_result(LogResponse(self.match, self.lines))
+            return True
+        return False
+
+
+class _TailPoller:
+    """所有日志跟踪共用的轮询线程（多个服务器实例时不为每个日志文件单独启动线程）"""
+    
+    def __init__(self):
+        self._tails: List['LogTail'] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+    
+    def add(self, tail: 'LogTail'):
+        with self._lock:
+            if tail not in self._tails:
+                self._tails.append(tail)
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='log-tail', daemon=True)
+            self._thread.start()
+    
+    def remove(self, tail: 'LogTail'):
+        with self._lock:
+            if tail in self._tails:
+                self._tails.remove(tail)
+    
+    def _run(self):
+        while True:
+            with self._lock:
+                tails = list(self._tails)
+                if not tails:
+                    self._thread = None
+                    return
+            
+            now = time.monotonic()
+            for tail in tails:
+                if tail.next_poll <= now:
+                    tail.poll()
+                    tail.next_poll = now + tail.poll_interval
+            
+            next_poll = min(tail.next_poll for tail in tails)
+            time.sleep(max(0.0, next_poll - time.monotonic()))
+
+
+_poller = _TailPoller()
+
+
+class LogTail:
+    """
+    后台跟踪日志文件（类似 tail -F）
+    新行会分发给订阅者，并与等待命令响应的调用方进行关联；
+    所有日志文件由同一个轮询线程读取
+    """
+    
+    def __init__(self, log_file: Optional[Path] = None, poll_interval: Optional[float] = None):
+        self.log_file = Path(log_file or Config.LOG_FILE)
+        self.poll_interval = poll_interval or Config.LOG_TAIL_INTERVAL
+        self._position: Optional[int] = None
+        self._inode: Optional[int] = None
+        self._partial = b''
+        self._lock = threading.Lock()
+        self._waiters: List[_ResponseWaiter] = []
+        self._subscribers: List[Callable[[str], None]] = []
+        self.next_poll = 0.0
+    
+    def start(self):
+        """开始跟踪（重复调用无副作用）"""
+        _poller.add(self)
+    
+    def stop(self):
+        """停止跟踪"""
+        _poller.remove(self)
+    
+    def subscribe(self, callback: Callable[[str], None]):
+        """订阅新日志行"""
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+        self.start()
+    
+    def unsubscribe(self, callback: Callable[[str], None]):
+        """取消订阅"""
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+    
+    def expect(self, pattern: Union[str, Pattern], timeout: float = 5.0,
+               continuation: Optional[Callable[['re.Match'], int]] = None) -> Future:
+        """
+        注册一个期望的响应匹配器
+        
+        必须在发送命令之前调用，第一条匹配的新日志行会完成返回的Future。
+        continuation 根据匹配结果返回还需要收集的后续行数。
+        超过截止时间仍未匹配时，Future 以 TimeoutError 结束。
+        """
+        if isinstance(pattern, str):
+            pattern = re.compile(pattern, re.IGNORECASE)
+        
+        try:
+            stat = self.log_file.stat()
+            min_offset, inode = stat.st_size, stat.st_ino
+        except OSError:
+            # 文件尚未创建，之后写入的内容都是新的
+            min_offset, inode = 0, None
+        
+        waiter = _ResponseWaiter(pattern, time.monotonic() + timeout, min_offset, continuation)
+        with self._lock:
+            if self._position is None:
+                # 尚未开始跟踪时从同一位置开始，否则轮询线程首次读取时会跳过这之间写入的响应
+                self._position = min_offset
+                self._inode = inode
+            self._waiters.append(waiter)
+        self.start()
+        return waiter.future
+    
+    def cancel(self, future: Future):
+        """取消一个尚未完成的等待"""
+        with self._lock:
+            self._waiters = [w for w in self._waiters if w.future is not future]
+        future.cancel()
+    
+    def _read_new_lines(self) -> List[tuple]:
+        """读取新增的完整行，返回 (起始偏移, 行内容) 列表"""
+        try:
+            stat = self.log_file.stat()
+        except OSError:
+            return []
+        
+        with self._lock:
+            if self._position is None:
+                # 首次启动只跟踪之后写入的内容
+                self._inode = stat.st_ino
+                self._position = stat.st_size
+                return []
+        
+        if stat.st_ino != self._inode or stat.st_size < self._position:
+            # 文件被重新创建或截断
+            self._inode = stat.st_ino
+            self._position = 0
+            self._partial = b''
+        
+        if stat.st_size == self._position:
+            return []
+        
+        with open(self.log_file, 'rb') as f:
+            f.seek(self._position)
+            data = f.read()
+        
+        start = self._position - len(self._partial)
+        self._position += len(data)
+        data = self._partial + data
+        
+        # 最后一行可能尚未写完，留到下次读取
+        *complete, self._partial = data.split(b'\n')
+        
+        lines = []
+        for raw in complete:
+            line = raw.decode('utf-8', errors='ignore').rstrip('\r')
+            if line.strip() and line.strip() != 'Dedicated_Server.txt':
+                lines.append((start, line))
+            start += len(raw) + 1
+        return lines
+    
+    def _dispatch(self, line: str, offset: int):
+        """把一行日志分发给等待者和订阅者"""
+        with self._lock:
+            waiters = list(self._waiters)
+            subscribers = list(self._subscribers)
+        
+        done = [w for w in waiters if not w.future.done() and w.feed(line, offset)]
+        if done:
+            with self._lock:
+                self._waiters = [w for w in self._waiters if w not in done]
+        
+        for callback in subscribers:
+            try:
+                callback(line)
+            except Exception as e:
+                print(f"Error in log subscriber: {e}")
+    
+    def _expire_waiters(self):
+        """结束已超过截止时间的等待"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [w for w in self._waiters if w.deadline <= now or w.future.done()]
+            if not expired:
+                return
+            self._waiters = [w for w in self._waiters if w not in expired]
+        
+        for waiter in expired:
+            if not waiter.future.done():
+                waiter.future.set_exception(FutureTimeoutError('等待服务器响应超时'))
+    
+    def poll(self):
+        """读取并分发新行，结束超时的等待（由轮询线程调用）"""
+        try:
+            for offset, line in self._read_new_lines():
+                self._dispatch(line, offset)
+        except Exception as e:
+            print(f"Error tailing log file: {e}")
+        
+        self._expire_waiters()
+
+
 # 全局日志监控实例
 log_monitor = LogMonitor()
 
+# 全局日志跟踪实例（命令响应关联）
+log_tail = LogTail()
+
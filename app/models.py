@@ -1,5 +1,6 @@
 from app import db
 from datetime import datetime
+import json
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -25,12 +26,45 @@ class User(UserMixin, db.Model):
     def __repr__(self):
         return f'<User {self.username}>'
 
+class Player(db.Model):
+    """玩家身份 - 以xuid为唯一标识，改名后历史记录仍归属同一玩家"""
+    __tablename__ = 'players'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    xuid = db.Column(db.String(50), unique=True, nullable=True)  # 只见过无xuid的日志行时为空
+    name = db.Column(db.String(100), nullable=False, index=True)  # 当前名称
+    previous_names = db.Column(db.Text, nullable=False, default='[]')  # JSON: 曾用名
+    first_seen = db.Column(db.DateTime, default=datetime.utcnow)
+    last_seen = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'xuid': self.xuid or '',
+            'name': self.name,
+            'previous_names': json.loads(self.previous_names or '[]'),
+            'first_seen': self.first_seen.isoformat() if self.first_seen else None,
+            'last_seen': self.last_seen.isoformat() if self.last_seen else None
+        }
+    
+    def __repr__(self):
+        return f'<Player {self.name} ({self.xuid or "no xuid"})>'
+
 class PlayerSession(db.Model):
     """玩家会话模型 - 持久化存储玩家在线状态"""
     __tablename__ = 'player_sessions'
+    __table_args__ = (
+        # 在线状态查询总是按 (player_name, is_online) 过滤
+        db.Index('ix_player_sessions_name_online', 'player_name', 'is_online'),
+        # 统计增量加载和历史会话压缩按 (is_online, leave_time) 过滤
+        db.Index('ix_player_sessions_online_leave', 'is_online', 'leave_time'),
+        # 通过身份查找在线会话
+        db.Index('ix_player_sessions_player_online', 'player_id', 'is_online'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    player_name = db.Column(db.String(100), nullable=False, index=True)
+    player_id = db.Column(db.Integer, db.ForeignKey('players.id'), nullable=True, index=True)
+    player_name = db.Column(db.String(100), nullable=False, index=True)  # 会话时使用的名称
     xuid = db.Column(db.String(50), nullable=True)
     is_online = db.Column(db.Boolean, default=True, index=True)
     join_time = db.Column(db.DateTime, default=datetime.utcnow)
@@ -45,8 +79,10 @@ class PlayerSession(db.Model):
         return {
             'name': self.player_name,
             'xuid': self.xuid or '',
+            'player_id': self.player_id,
             'join_time': self.join_time.isoformat() if self.join_time else None,
-            'invincible': self.is_invincible and (self.invincible_until is None or self.invincible_until > datetime.utcnow())
+            'invincible': bool(self.is_invincible),  # 到期由效果调度器清除
+            'invincible_until': self.invincible_until.isoformat() if self.is_invincible and self.invincible_until else None
         }
     
     def __repr__(self):
@@ -54,6 +90,274 @@ class PlayerSession(db.Model):
         return f'<PlayerSession {self.player_name} ({status})>'
 
 
+class PlayerDailySummary(db.Model):
+    """玩家每日汇总 - 压缩后的历史会话（每个玩家每天一行）"""
+    __tablename__ = 'player_daily_summaries'
+    __table_args__ = (
+        db.UniqueConstraint('player_name', 'day', name='uq_player_daily_summaries_name_day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    player_id = db.Column(db.Integer, db.ForeignKey('players.id'), nullable=True, index=True)
+    player_name = db.Column(db.String(100), nullable=False, index=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    session_count = db.Column(db.Integer, default=0, nullable=False)
+    playtime_seconds = db.Column(db.Integer, default=0, nullable=False)
+    first_join = db.Column(db.DateTime, nullable=True)
+    last_leave = db.Column(db.DateTime, nullable=True)
+    
+    def to_dict(self):
+        return {
+            'name': self.player_name,
+            'day': self.day.isoformat(),
+            'sessions': self.session_count,
+            'playtime_seconds': self.playtime_seconds,
+            'first_join': self.first_join.isoformat() if self.first_join else None,
+            'last_leave': self.last_leave.isoformat() if self.last_leave else None
+        }
+    
+    def __repr__(self):
+        return f'<PlayerDailySummary {self.player_name} {self.day}>'
+
+
+class ScheduledEffect(db.Model):
+    """待执行的定时效果（持久化，服务重启后恢复）"""
+    __tablename__ = 'scheduled_effects'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    player_id = db.Column(db.Integer, db.ForeignKey('players.id'), nullable=True, index=True)
+    player_name = db.Column(db.String(100), nullable=False, index=True)  # 安排时的名称（没有身份的旧记录按名称匹配）
+    action = db.Column(db.String(50), nullable=False)
+    deadline = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'player_id': self.player_id,
+            'player': self.player_name,
+            'action': self.action,
+            'deadline': self.deadline.isoformat()
+        }
+    
+    def __repr__(self):
+        return f'<ScheduledEffect {self.action} {self.player_name} @ {self.deadline}>'
+
+
+class JoinLatencyStat(db.Model):
+    """玩家加入耗时直方图（每天 + 每个启用的addon组合一行）"""
+    __tablename__ = 'join_latency_stats'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'addon_fingerprint', name='uq_join_latency_stats_day_addons'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    addon_fingerprint = db.Column(db.String(16), nullable=False)
+    addons = db.Column(db.Text, nullable=False, default='[]')  # JSON: 启用的addon名称列表
+    bucket_counts = db.Column(db.Text, nullable=False, default='[]')  # JSON: 每个区间的次数
+    count = db.Column(db.Integer, default=0, nullable=False)
+    sum_ms = db.Column(db.Integer, default=0, nullable=False)
+    min_ms = db.Column(db.Integer, nullable=True)
+    max_ms = db.Column(db.Integer, nullable=True)
+    
+    def __repr__(self):
+        return f'<JoinLatencyStat {self.day} {self.addon_fingerprint} n={self.count}>'
+
+
+class PlayerBan(db.Model):
+    """玩家封禁（按名称和/或xuid）"""
+    __tablename__ = 'player_bans'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    player_name = db.Column(db.String(100), nullable=True, index=True)
+    xuid = db.Column(db.String(50), nullable=True, index=True)
+    reason = db.Column(db.String(200), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_by = db.Column(db.String(80), nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=True)  # 为空表示永久封禁
+    
+    def is_active(self, now: datetime = None) -> bool:
+        return self.expires_at is None or self.expires_at > (now or datetime.utcnow())
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.player_name,
+            'xuid': self.xuid or '',
+            'reason': self.reason or '',
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'created_by': self.created_by,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'active': self.is_active()
+        }
+    
+    def __repr__(self):
+        return f'<PlayerBan {self.player_name or self.xuid}>'
+
+
+class ServerLoadSample(db.Model):
+    """服务器负载采样（CPU和在线玩家数），供 server.properties 自动调优使用"""
+    __tablename__ = 'server_load_samples'
+
+    id = db.Column(db.Integer, primary_key=True)
+    timestamp = db.Column(db.DateTime, nullable=False, index=True)
+    cpu_percent = db.Column(db.Float, nullable=False)  # 占全部CPU核心的百分比
+    players_online = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ServerLoadSample {self.timestamp} cpu={self.cpu_percent} players={self.players_online}>'
+
+
+class ServerTuningChange(db.Model):
+    """server.properties 修改记录（修改前后的负载指标）"""
+    __tablename__ = 'server_tuning_changes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    source = db.Column(db.String(20), nullable=False)  # manual / autotune
+    created_by = db.Column(db.String(80), nullable=True)
+    changes = db.Column(db.Text, nullable=False, default='{}')  # JSON: 键 -> [修改前, 修改后]
+    reason = db.Column(db.String(500), nullable=True)
+    metrics_before = db.Column(db.Text, nullable=True)  # JSON: 修改前窗口内的负载指标
+    effective_at = db.Column(db.DateTime, nullable=True)  # 修改后服务器第一次启动的时间
+    metrics_after = db.Column(db.Text, nullable=True)   # JSON: 生效后一个统计窗口内的负载指标
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'source': self.source,
+            'created_by': self.created_by,
+            'changes': json.loads(self.changes or '{}'),
+            'reason': self.reason or '',
+            'effective_at': self.effective_at.isoformat() if self.effective_at else None,
+            'metrics_before': json.loads(self.metrics_before) if self.metrics_before else None,
+            'metrics_after': json.loads(self.metrics_after) if self.metrics_after else None
+        }
+
+    def __repr__(self):
+        return f'<ServerTuningChange {self.source} {self.created_at}>'
+
+
+class ServerBoot(db.Model):
+    """服务器启动记录（从发出启动命令到日志出现 "Server started." 的耗时）"""
+    __tablename__ = 'server_boots'
+
+    id = db.Column(db.Integer, primary_key=True)
+    instance_id = db.Column(db.String(50), nullable=True, index=True)  # 服务器实例
+    started_at = db.Column(db.DateTime, nullable=False, index=True)
+    ready_at = db.Column(db.DateTime, nullable=True)
+    duration_seconds = db.Column(db.Float, nullable=True)  # 启动耗时（未就绪时为等待的时间）
+    outcome = db.Column(db.String(20), nullable=False)  # ready / failed / exited / timeout
+    method = db.Column(db.String(20), nullable=False)  # systemd / direct / external（非本程序发起）
+    pid = db.Column(db.Integer, nullable=True)
+    message = db.Column(db.String(500), nullable=True)  # 失败时匹配到的日志行
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'instance_id': self.instance_id or 'default',
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'ready_at': self.ready_at.isoformat() if self.ready_at else None,
+            'duration_seconds': self.duration_seconds,
+            'outcome': self.outcome,
+            'method': self.method,
+            'pid': self.pid,
+            'message': self.message or ''
+        }
+
+    def __repr__(self):
+        return f'<ServerBoot {self.started_at} {self.outcome}>'
+
+
+class ServerStop(db.Model):
+    """服务器关闭记录（从发出停止命令到进程退出的耗时，用于调整关闭截止时间）"""
+    __tablename__ = 'server_stops'
+
+    id = db.Column(db.Integer, primary_key=True)
+    instance_id = db.Column(db.String(50), nullable=True, index=True)  # 服务器实例
+    started_at = db.Column(db.DateTime, nullable=False, index=True)  # 发出停止命令（倒计时结束）的时间
+    finished_at = db.Column(db.DateTime, nullable=True)
+    countdown_seconds = db.Column(db.Integer, nullable=True)  # 通知玩家的倒计时
+    duration_seconds = db.Column(db.Float, nullable=True)  # 停止耗时（不含倒计时）
+    outcome = db.Column(db.String(20), nullable=False)  # clean / terminated / killed / failed
+    method = db.Column(db.String(20), nullable=False)  # console / systemd
+    quit_correctly = db.Column(db.Boolean, default=False)  # 日志中出现 "Quit correctly"
+    pid = db.Column(db.Integer, nullable=True)
+    message = db.Column(db.String(500), nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'instance_id': self.instance_id or 'default',
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'countdown_seconds': self.countdown_seconds or 0,
+            'duration_seconds': self.duration_seconds,
+            'outcome': self.outcome,
+            'method': self.method,
+            'quit_correctly': bool(self.quit_correctly),
+            'pid': self.pid,
+            'message': self.message or ''
+        }
+
+    def __repr__(self):
+        return f'<ServerStop {self.started_at} {self.outcome}>'
+
+
+class WatchdogEvent(db.Model):
+    """看门狗记录（崩溃、卡死、自动重启和崩溃循环）"""
+    __tablename__ = 'watchdog_events'
+
+    id = db.Column(db.Integer, primary_key=True)
+    instance_id = db.Column(db.String(50), nullable=True, index=True)  # 服务器实例
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # crash / unresponsive / systemd_restart / restart / restart_failed / crash_loop
+    kind = db.Column(db.String(20), nullable=False)
+    pid = db.Column(db.Integer, nullable=True)
+    reason = db.Column(db.String(500), nullable=True)  # 日志中的崩溃标记或检测方式
+    backoff_seconds = db.Column(db.Float, nullable=True)  # 重启前的等待时间
+    message = db.Column(db.String(500), nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'instance_id': self.instance_id or 'default',
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'kind': self.kind,
+            'pid': self.pid,
+            'reason': self.reason or '',
+            'backoff_seconds': self.backoff_seconds,
+            'message': self.message or ''
+        }
+
+    def __repr__(self):
+        return f'<WatchdogEvent {self.created_at} {self.kind}>'
+
+
+def ensure_columns():
+    """为已存在的表补充新增的列（db.create_all 不会修改已存在的表，新增列都必须可为空）"""
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            db.session.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+    db.session.commit()
+
+
+def ensure_indexes():
+    """为已存在的表补建索引（db.create_all 不会修改已存在的表）"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
+
 class Addon(db.Model):
     __tablename__ = 'addons'
     
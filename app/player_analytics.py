@@ -0,0 +1,323 @@
+"""
+玩家数据分析模块 - 基于列式数组统计玩家会话
+把 player_sessions 加载为 NumPy int64 数组（加入/离开时间戳 + 玩家编号），
+以向量化方式计算游戏时长、日活跃玩家、同时在线曲线和高峰时段
+玩家按身份ID归并（改名不拆分统计），显示名称通过玩家身份缓存解析为当前名称
+已压缩为每日汇总的历史会话计入游戏时长和日活跃玩家（不含同时在线曲线）
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app import db
+from app.models import PlayerSession, PlayerDailySummary
+from app.player_identity import player_identity
+from config import Config
+
+DAY_SECONDS = 86400
+HOUR_SECONDS = 3600
+
+
+class PlayerAnalytics:
+    """玩家会话分析引擎（已结束的会话增量加载并缓存）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._join = np.empty(0, dtype=np.int64)
+        self._leave = np.empty(0, dtype=np.int64)
+        self._player = np.empty(0, dtype=np.int32)
+        self._keys: List = []  # 身份ID；没有关联身份的旧记录使用名称
+        self._key_index: Dict = {}
+
+        # 增量加载水位：已加载的最大离开时间，以及恰好等于该时间的会话ID（用于去重）
+        self._watermark: Optional[datetime] = None
+        self._boundary_ids: set = set()
+        self._dirty = True
+        self._version = 0
+        # (start, end, bucket, limit) -> (计算时间, 是否只含历史数据, 结果)，按最近使用排序
+        self._results: 'OrderedDict[tuple, Tuple[float, bool, dict]]' = OrderedDict()
+
+        # 每日汇总（压缩后的历史会话）
+        self._summary_day = np.empty(0, dtype=np.int64)
+        self._summary_player = np.empty(0, dtype=np.int32)
+        self._summary_seconds = np.empty(0, dtype=np.int64)
+        self._summary_sessions = np.empty(0, dtype=np.int64)
+        self._summaries_loaded = False
+
+    def mark_dirty(self):
+        """有会话结束时调用，下次查询会增量加载新结束的会话"""
+        self._dirty = True
+
+    def reset(self):
+        """丢弃所有已加载的数据（会话被压缩或删除后调用）"""
+        with self._lock:
+            self._reset()
+
+    def _player_index(self, player_id: Optional[int], name: str) -> int:
+        key = player_id if player_id is not None else name
+        index = self._key_index.get(key)
+        if index is None:
+            index = len(self._keys)
+            self._keys.append(key)
+            self._key_index[key] = index
+        return index
+
+    def _display_names(self) -> List[str]:
+        """把玩家编号映射为当前名称"""
+        names = player_identity.names_for(k for k in self._keys if isinstance(k, int))
+        return [names.get(k, str(k)) if isinstance(k, int) else k for k in self._keys]
+
+    @staticmethod
+    def _epoch_columns():
+        """在SQLite中直接把时间列转换为整数时间戳，避免逐行构造datetime"""
+        return (
+            db.cast(db.func.strftime('%s', PlayerSession.join_time), db.Integer),
+            db.cast(db.func.strftime('%s', PlayerSession.leave_time), db.Integer),
+        )
+
+    def _load_closed_sessions(self):
+        """增量加载自上次水位以来结束的会话"""
+        join_col, leave_col = self._epoch_columns()
+        query = db.session.query(
+            PlayerSession.id, PlayerSession.player_id, PlayerSession.player_name, PlayerSession.leave_time,
+            join_col, leave_col
+        ).filter(
+            PlayerSession.is_online == False,  # noqa: E712
+            PlayerSession.join_time.isnot(None),
+            PlayerSession.leave_time.isnot(None),
+        )
+        if self._watermark is not None:
+            query = query.filter(PlayerSession.leave_time >= self._watermark)
+
+        rows = [r for r in query.all() if r[0] not in self._boundary_ids]
+        if not rows:
+            return
+
+        players = np.fromiter((self._player_index(r[1], r[2]) for r in rows), dtype=np.int32, count=len(rows))
+        joins = np.fromiter((r[4] for r in rows), dtype=np.int64, count=len(rows))
+        leaves = np.fromiter((r[5] for r in rows), dtype=np.int64, count=len(rows))
+
+        self._join = np.concatenate([self._join, joins])
+        self._leave = np.concatenate([self._leave, np.maximum(leaves, joins)])
+        self._player = np.concatenate([self._player, players])
+
+        watermark = max(r[3] for r in rows)
+        if watermark != self._watermark:
+            self._boundary_ids = set()
+        self._watermark = watermark
+        self._boundary_ids.update(r[0] for r in rows if r[3] == watermark)
+
+        self._version += 1
+        self._results.clear()
+
+    def _load_summaries(self):
+        """加载每日汇总"""
+        rows = db.session.query(
+            PlayerDailySummary.player_id,
+            PlayerDailySummary.player_name,
+            db.cast(db.func.strftime('%s', PlayerDailySummary.day), db.Integer),
+            PlayerDailySummary.playtime_seconds,
+            PlayerDailySummary.session_count,
+        ).all()
+        count = len(rows)
+        self._summary_player = np.fromiter((self._player_index(r[0], r[1]) for r in rows), dtype=np.int32, count=count)
+        self._summary_day = np.fromiter((r[2] // DAY_SECONDS for r in rows), dtype=np.int64, count=count)
+        self._summary_seconds = np.fromiter((r[3] for r in rows), dtype=np.int64, count=count)
+        self._summary_sessions = np.fromiter((r[4] for r in rows), dtype=np.int64, count=count)
+        self._summaries_loaded = True
+
+    def _load_open_sessions(self, now: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """在线会话不缓存，离开时间按当前时间计算"""
+        join_col, _ = self._epoch_columns()
+        rows = db.session.query(PlayerSession.player_id, PlayerSession.player_name, join_col).filter(
+            PlayerSession.is_online == True,  # noqa: E712
+            PlayerSession.join_time.isnot(None),
+        ).all()
+
+        players = np.fromiter((self._player_index(r[0], r[1]) for r in rows), dtype=np.int32, count=len(rows))
+        joins = np.fromiter((r[2] for r in rows), dtype=np.int64, count=len(rows))
+        leaves = np.maximum(np.full(len(rows), now, dtype=np.int64), joins)
+        return joins, leaves, players
+
+    def get_stats(self, start: int, end: int, bucket: Optional[int] = None, limit: int = 50) -> Dict:
+        """
+        统计 [start, end) 范围内的玩家数据
+
+        Args:
+            start: 起始UTC时间戳（秒）
+            end: 结束UTC时间戳（秒）
+            bucket: 同时在线曲线的时间粒度（秒），默认自动选择；
+                    曲线点数超过 ANALYTICS_MAX_POINTS 时自动增大
+            limit: 返回游戏时长排行的玩家数量
+        """
+        if end <= start:
+            raise ValueError("结束时间必须晚于开始时间")
+        # 结束时间向上取整到分钟，默认以当前时间结束的查询在同一分钟内共用缓存
+        end = -(-end // 60) * 60
+        if bucket is None:
+            bucket = self._auto_bucket(end - start)
+        max_points = max(Config.ANALYTICS_MAX_POINTS, 1)
+        bucket = max(60, int(bucket), -(-(end - start) // max_points))
+        bucket = -(-bucket // 60) * 60
+
+        with self._lock:
+            if not self._summaries_loaded:
+                self._load_summaries()
+            if self._dirty:
+                self._dirty = False
+                self._load_closed_sessions()
+
+            now = int(time.time())
+            open_join, open_leave, open_player = self._load_open_sessions(now)
+
+            # 只包含历史数据（不受在线会话和当前时间影响）的结果可以一直缓存到数据版本变化
+            historical = end <= now and (len(open_join) == 0 or end <= int(open_join.min()))
+            key = (start, end, bucket, limit)
+            cached = self._results.get(key)
+            if cached and (historical or time.monotonic() - cached[0] < Config.ANALYTICS_CACHE_TTL):
+                self._results.move_to_end(key)
+                return cached[2]
+
+            join = np.concatenate([self._join, open_join])
+            leave = np.concatenate([self._leave, open_leave])
+            player = np.concatenate([self._player, open_player])
+            names = self._display_names()
+            summaries = (self._summary_day, self._summary_player, self._summary_seconds, self._summary_sessions)
+
+            result = self._compute(join, leave, player, names, summaries, start, end, bucket, limit)
+            self._store(key, historical, result)
+            return result
+
+    def _store(self, key: tuple, historical: bool, result: dict):
+        """缓存结果：先丢弃已过期的非历史结果，再按最近使用淘汰到 ANALYTICS_CACHE_SIZE 条"""
+        now = time.monotonic()
+        for stale in [k for k, (at, hist, _) in self._results.items()
+                      if not hist and now - at >= Config.ANALYTICS_CACHE_TTL]:
+            del self._results[stale]
+        self._results[key] = (now, historical, result)
+        self._results.move_to_end(key)
+        while len(self._results) > max(Config.ANALYTICS_CACHE_SIZE, 1):
+            self._results.popitem(last=False)
+
+    @staticmethod
+    def _auto_bucket(span: int) -> int:
+        if span <= 2 * DAY_SECONDS:
+            return 300
+        if span <= 60 * DAY_SECONDS:
+            return HOUR_SECONDS
+        return DAY_SECONDS
+
+    @staticmethod
+    def _compute(join: np.ndarray, leave: np.ndarray, player: np.ndarray, names: List[str],
+                 summaries: tuple, start: int, end: int, bucket: int, limit: int) -> Dict:
+        # 只保留与范围重叠的会话，并裁剪到范围内
+        mask = (join < end) & (leave > start)
+        join = np.clip(join[mask], start, end)
+        leave = np.clip(leave[mask], start, end)
+        player = player[mask]
+        duration = leave - join
+
+        # 完全落在范围内的每日汇总
+        summary_day, summary_player, summary_seconds, summary_sessions = summaries
+        summary_mask = (summary_day * DAY_SECONDS >= start) & ((summary_day + 1) * DAY_SECONDS <= end)
+        summary_day = summary_day[summary_mask]
+        summary_player = summary_player[summary_mask]
+        summary_seconds = summary_seconds[summary_mask]
+        summary_sessions = summary_sessions[summary_mask]
+
+        # 每个玩家的游戏时长和会话数
+        playtime = (np.bincount(player, weights=duration, minlength=len(names))
+                    + np.bincount(summary_player, weights=summary_seconds, minlength=len(names)))
+        sessions = (np.bincount(player, minlength=len(names))
+                    + np.bincount(summary_player, weights=summary_sessions, minlength=len(names)).astype(np.int64))
+        active = np.flatnonzero(playtime + sessions)
+        top = active[np.argsort(-playtime[active], kind='stable')][:limit]
+
+        # 日活跃玩家：把跨天会话展开到每一天，再按 (天, 玩家) 去重
+        first_day = join // DAY_SECONDS
+        last_day = np.maximum(leave - 1, join) // DAY_SECONDS
+        span = (last_day - first_day + 1).astype(np.int64)
+        offsets = np.arange(int(span.sum()), dtype=np.int64) - np.repeat(np.cumsum(span) - span, span)
+        days = np.concatenate([np.repeat(first_day, span) + offsets, summary_day])
+        players = np.concatenate([np.repeat(player, span), summary_player])
+        keys = np.unique(days * (len(names) + 1) + players)
+        dau_days, dau_counts = np.unique(keys // (len(names) + 1), return_counts=True)
+
+        # 同时在线曲线：用排序后的加入/离开时间的前缀和计算每个时间段的在线人·秒
+        edges = np.arange(start, end + bucket, bucket, dtype=np.int64)
+        edges[-1] = min(edges[-1], end)
+        if len(edges) > 1 and edges[-1] == edges[-2]:
+            edges = edges[:-1]
+        sorted_join = np.sort(join)
+        sorted_leave = np.sort(leave)
+        cum_join = np.concatenate([[0], np.cumsum(sorted_join)])
+        cum_leave = np.concatenate([[0], np.cumsum(sorted_leave)])
+        n_join = np.searchsorted(sorted_join, edges, side='right')
+        n_leave = np.searchsorted(sorted_leave, edges, side='right')
+        integral = edges * (n_join - n_leave) - (cum_join[n_join] - cum_leave[n_leave])
+        widths = np.diff(edges)
+        average = np.diff(integral) / np.maximum(widths, 1)
+
+        # 每个时间段的峰值：段起点的在线人数与段内每个事件之后的人数取最大值
+        peak = (n_join - n_leave)[:-1].astype(np.int64)
+        times = np.concatenate([join, leave])
+        deltas = np.concatenate([np.ones(len(join), dtype=np.int64), -np.ones(len(leave), dtype=np.int64)])
+        order = np.lexsort((deltas, times))  # 同一时刻先离开后加入
+        times, levels = times[order], np.cumsum(deltas[order])
+        inside = times < end
+        if inside.any():
+            idx = np.minimum((times[inside] - start) // bucket, len(peak) - 1)
+            np.maximum.at(peak, idx, levels[inside])
+
+        # 高峰时段：按一天中的小时（UTC）汇总平均在线人数
+        hour_edges = np.arange(start - start % HOUR_SECONDS, end + HOUR_SECONDS, HOUR_SECONDS, dtype=np.int64)
+        hour_edges = np.clip(hour_edges, start, end)
+        n_join_h = np.searchsorted(sorted_join, hour_edges, side='right')
+        n_leave_h = np.searchsorted(sorted_leave, hour_edges, side='right')
+        integral_h = hour_edges * (n_join_h - n_leave_h) - (cum_join[n_join_h] - cum_leave[n_leave_h])
+        hour_seconds = np.diff(integral_h)
+        hour_of_day = (hour_edges[:-1] // HOUR_SECONDS) % 24
+        hour_widths = np.diff(hour_edges)
+        hourly_total = np.bincount(hour_of_day, weights=hour_seconds, minlength=24)
+        hourly_width = np.bincount(hour_of_day, weights=hour_widths, minlength=24)
+        hourly_average = np.divide(hourly_total, hourly_width, out=np.zeros(24), where=hourly_width > 0)
+
+        peak_index = int(np.argmax(peak)) if len(peak) else 0
+        return {
+            'range': {'start': start, 'end': end, 'bucket': bucket},
+            'totals': {
+                'sessions': int(len(join) + summary_sessions.sum()),
+                'unique_players': int(len(active)),
+                'playtime_seconds': int(duration.sum() + summary_seconds.sum()),
+                'peak_concurrency': int(peak[peak_index]) if len(peak) else 0,
+                'peak_time': int(edges[peak_index]) if len(peak) else None,
+            },
+            'playtime': [
+                {'name': names[i], 'seconds': int(playtime[i]), 'sessions': int(sessions[i])}
+                for i in top
+            ],
+            'daily_active_users': {
+                'days': [datetime.utcfromtimestamp(int(d) * DAY_SECONDS).strftime('%Y-%m-%d') for d in dau_days],
+                'counts': dau_counts.tolist(),
+            },
+            'concurrency': {
+                'timestamps': edges[:-1].tolist(),
+                'average': np.round(average, 2).tolist(),
+                'peak': peak.tolist(),
+            },
+            'peak_hours': {
+                'hourly_average': np.round(hourly_average, 2).tolist(),
+                'busiest_hour': int(np.argmax(hourly_average)) if hourly_average.any() else None,
+            },
+        }
+
+
+# 全局分析引擎实例
+player_analytics = PlayerAnalytics()
@@ -0,0 +1,282 @@
+"""
+玩家身份模块 - 以xuid为键的玩家身份表和内存中的 名称↔xuid LRU 缓存
+连接日志中出现的 (名称, xuid) 会写入身份表并填充缓存；
+会话、封禁和统计都通过缓存解析到同一个玩家，改名不会拆分历史记录
+"""
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from app import db
+from app.models import Player, PlayerDailySummary, PlayerSession
+from config import Config
+
+
+class PlayerRef(NamedTuple):
+    """缓存中的玩家身份"""
+    id: int
+    xuid: str
+    name: str
+
+
+class PlayerIdentityCache:
+    """名称↔xuid↔身份ID 的LRU缓存（未命中时查询身份表）"""
+
+    def __init__(self, capacity: Optional[int] = None):
+        self.capacity = capacity or Config.PLAYER_CACHE_SIZE
+        self._entries: 'OrderedDict[int, PlayerRef]' = OrderedDict()
+        self._by_name: Dict[str, int] = {}
+        self._by_xuid: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _put(self, ref: PlayerRef):
+        with self._lock:
+            old = self._entries.pop(ref.id, None)
+            if old is not None:
+                self._drop_keys(old)
+            self._entries[ref.id] = ref
+            self._by_name[ref.name.lower()] = ref.id
+            if ref.xuid:
+                self._by_xuid[ref.xuid] = ref.id
+            while len(self._entries) > self.capacity:
+                _, evicted = self._entries.popitem(last=False)
+                self._drop_keys(evicted)
+
+    def _drop_keys(self, ref: PlayerRef):
+        if self._by_name.get(ref.name.lower()) == ref.id:
+            del self._by_name[ref.name.lower()]
+        if ref.xuid and self._by_xuid.get(ref.xuid) == ref.id:
+            del self._by_xuid[ref.xuid]
+
+    def _get(self, player_id: Optional[int]) -> Optional[PlayerRef]:
+        with self._lock:
+            ref = self._entries.get(player_id) if player_id is not None else None
+            if ref is not None:
+                self._entries.move_to_end(player_id)
+            return ref
+
+    def _store(self, player: Player) -> PlayerRef:
+        ref = PlayerRef(player.id, player.xuid or '', player.name)
+        self._put(ref)
+        return ref
+
+    def forget(self, player_id: int):
+        with self._lock:
+            ref = self._entries.pop(player_id, None)
+            if ref is not None:
+                self._drop_keys(ref)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_name.clear()
+            self._by_xuid.clear()
+
+    def resolve(self, name: str = '', xuid: str = '', previous_names: bool = False) -> Optional[PlayerRef]:
+        """
+        按xuid（优先）或名称解析玩家身份
+        未命中缓存时查询身份表（需要在应用上下文中调用）；同名时取最近出现的玩家。
+        previous_names=True 时没有玩家当前使用该名称则再查曾用名，只用于查询：
+        曾用名可能已被新玩家使用，记录连接和发送命令时只按当前名称解析
+        """
+        if xuid:
+            with self._lock:
+                player_id = self._by_xuid.get(xuid)
+            ref = self._get(player_id)
+            if ref is not None:
+                return ref
+            player = Player.query.filter_by(xuid=xuid).first()
+            if player is not None:
+                return self._store(player)
+
+        if name:
+            with self._lock:
+                player_id = self._by_name.get(name.lower())
+            ref = self._get(player_id)
+            if ref is not None:
+                return ref
+            player = Player.query.filter(db.func.lower(Player.name) == name.lower()) \
+                .order_by(Player.last_seen.desc()).first()
+            if player is None:
+                if not previous_names:
+                    return None
+                # 曾用名（不放入名称索引，避免覆盖当前使用该名称的玩家）
+                pattern = '%' + json.dumps(name, ensure_ascii=False).replace('%', r'\%').replace('_', r'\_') + '%'
+                player = Player.query.filter(Player.previous_names.like(pattern, escape='\\')) \
+                    .order_by(Player.last_seen.desc()).first()
+                return PlayerRef(player.id, player.xuid or '', player.name) if player else None
+            return self._store(player)
+        return None
+
+    def names_for(self, player_ids: Iterable[int]) -> Dict[int, str]:
+        """批量获取玩家当前名称，缓存未命中的用一次查询补齐"""
+        names, missing = {}, []
+        for player_id in player_ids:
+            ref = self._get(player_id)
+            if ref is not None:
+                names[player_id] = ref.name
+            else:
+                missing.append(player_id)
+        for start in range(0, len(missing), 500):
+            for player in Player.query.filter(Player.id.in_(missing[start:start + 500])).all():
+                names[player.id] = player.name
+        return names
+
+    def observe(self, name: str, xuid: str = '', seen_at: Optional[datetime] = None) -> Optional[PlayerRef]:
+        """
+        记录连接日志中出现的玩家（需要在应用上下文中调用，由调用方提交事务）
+        同一xuid换了名称时更新当前名称并记录曾用名；
+        之前只以名称记录（没有xuid）的身份会合并到带xuid的身份中
+        """
+        if not name:
+            return None
+        seen_at = seen_at or datetime.utcnow()
+
+        if not xuid:
+            ref = self.resolve(name=name)
+            if ref is not None:
+                Player.query.filter_by(id=ref.id).update({'last_seen': seen_at}, synchronize_session=False)
+                return ref
+            player = Player(name=name, first_seen=seen_at, last_seen=seen_at)
+            db.session.add(player)
+            db.session.flush()
+            return self._store(player)
+
+        ref = self.resolve(xuid=xuid)
+        if ref is not None and ref.name == name:
+            Player.query.filter_by(id=ref.id).update({'last_seen': seen_at}, synchronize_session=False)
+            return ref
+
+        player = Player.query.get(ref.id) if ref is not None else None
+        # 同名但没有xuid的身份（来自不带xuid的日志行）
+        unnamed = Player.query.filter(
+            db.func.lower(Player.name) == name.lower(), Player.xuid.is_(None)
+        ).first()
+
+        if player is None:
+            if unnamed is not None:
+                player, unnamed = unnamed, None
+                player.xuid = xuid
+            else:
+                player = Player(xuid=xuid, name=name, first_seen=seen_at)
+                db.session.add(player)
+        elif player.name != name:
+            previous = json.loads(player.previous_names or '[]')
+            if player.name not in previous:
+                previous.append(player.name)
+            player.previous_names = json.dumps(previous, ensure_ascii=False)
+            self.forget(player.id)
+
+        player.name = name
+        player.last_seen = seen_at
+        db.session.flush()
+
+        if unnamed is not None and unnamed.id != player.id:
+            self._merge(unnamed, player)
+
+        return self._store(player)
+
+    def _merge(self, source: Player, target: Player):
+        """把 source 的会话和汇总归并到 target 并删除 source"""
+        from app.player_analytics import player_analytics
+
+        PlayerSession.query.filter_by(player_id=source.id).update(
+            {'player_id': target.id}, synchronize_session=False
+        )
+        PlayerDailySummary.query.filter_by(player_id=source.id).update(
+            {'player_id': target.id}, synchronize_session=False
+        )
+        if source.first_seen and (target.first_seen is None or source.first_seen < target.first_seen):
+            target.first_seen = source.first_seen
+        self.forget(source.id)
+        db.session.delete(source)
+        # 已加载的统计数组仍按旧的身份ID分组
+        player_analytics.reset()
+
+
+def backfill_identities():
+    """为还没有关联身份的历史会话和每日汇总建立身份（需要在应用上下文中调用）"""
+    if not PlayerSession.query.filter(PlayerSession.player_id.is_(None)).first() and \
+            not PlayerDailySummary.query.filter(PlayerDailySummary.player_id.is_(None)).first():
+        return
+
+    try:
+        known_xuids = {xuid for (xuid,) in db.session.query(Player.xuid).filter(Player.xuid.isnot(None))}
+
+        # 每个xuid按最近一次会话的名称建立身份
+        rows = db.session.query(
+            PlayerSession.xuid, PlayerSession.player_name,
+            db.func.min(PlayerSession.join_time), db.func.max(PlayerSession.join_time)
+        ).filter(
+            PlayerSession.player_id.is_(None), PlayerSession.xuid.isnot(None), PlayerSession.xuid != ''
+        ).group_by(PlayerSession.xuid, PlayerSession.player_name).all()
+
+        identities: Dict[str, Dict] = {}
+        for xuid, name, first, last in rows:
+            entry = identities.setdefault(xuid, {'first_seen': first, 'names': []})
+            if first and (entry['first_seen'] is None or first < entry['first_seen']):
+                entry['first_seen'] = first
+            entry['names'].append((last or datetime.min, name))
+
+        for xuid, entry in identities.items():
+            if xuid in known_xuids:
+                continue
+            names = sorted(entry['names'])
+            last_seen, current = names[-1]
+            previous = list(dict.fromkeys(n for _, n in names[:-1] if n != current))
+            db.session.add(Player(
+                xuid=xuid, name=current, first_seen=entry['first_seen'],
+                last_seen=last_seen if last_seen != datetime.min else None,
+                previous_names=json.dumps(previous, ensure_ascii=False)
+            ))
+        db.session.flush()
+
+        # 名称 -> 身份：当前名称优先（同名取最近出现的身份），其次是曾用名
+        by_name: Dict[str, int] = {}
+        players = Player.query.order_by(Player.last_seen.asc()).all()
+        for player in players:
+            for previous in json.loads(player.previous_names or '[]'):
+                by_name.setdefault(previous.lower(), player.id)
+        for player in players:
+            by_name[player.name.lower()] = player.id
+
+        # 从未记录过xuid的名称
+        rows = db.session.query(
+            PlayerSession.player_name, db.func.min(PlayerSession.join_time), db.func.max(PlayerSession.join_time)
+        ).filter(
+            PlayerSession.player_id.is_(None), db.or_(PlayerSession.xuid.is_(None), PlayerSession.xuid == '')
+        ).group_by(PlayerSession.player_name).all()
+        rows += db.session.query(PlayerDailySummary.player_name, db.func.min(PlayerDailySummary.first_join),
+                                 db.func.max(PlayerDailySummary.last_leave)) \
+            .filter(PlayerDailySummary.player_id.is_(None)).group_by(PlayerDailySummary.player_name).all()
+        for name, first, last in rows:
+            if name.lower() in by_name:
+                continue
+            player = Player(name=name, first_seen=first, last_seen=last)
+            db.session.add(player)
+            db.session.flush()
+            by_name[name.lower()] = player.id
+
+        # 批量关联：有xuid的按xuid，其余按名称
+        by_xuid = db.select(Player.id).where(Player.xuid == PlayerSession.xuid).scalar_subquery()
+        PlayerSession.query.filter(
+            PlayerSession.player_id.is_(None), PlayerSession.xuid.isnot(None), PlayerSession.xuid != ''
+        ).update({'player_id': by_xuid}, synchronize_session=False)
+
+        for model in (PlayerSession, PlayerDailySummary):
+            names = [name for (name,) in db.session.query(model.player_name).filter(model.player_id.is_(None)).distinct()]
+            for name in names:
+                model.query.filter(model.player_id.is_(None), model.player_name == name).update(
+                    {'player_id': by_name[name.lower()]}, synchronize_session=False
+                )
+
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error backfilling player identities: {e}")
+
+
+# 全局玩家身份缓存实例
+player_identity = PlayerIdentityCache()
@@ -8,8 +8,11 @@ import os
 import time
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
 from config import Config
+from app.log_monitor import log_tail, LogResponse
+from app.server_supervisor import server_supervisor
 
 
 class PlayerManager:
@@ -18,6 +21,13 @@ class PlayerManager:
     SYSTEMD_SERVICE = 'bedrock.service'
     SERVER_FIFO_PATH = Path('/home/ubuntu/bedrock-server/server_stdin.fifo')
     
+    # 以下属性由 app.instances 为每个服务器实例创建的子类覆盖
+    PID_FILE = Path('/tmp/bedrock_server.pid')
+    SESSION_FILE = Path('/tmp/bedrock_session_id.txt')
+    LOG_FILE = Config.LOG_FILE
+    tail = log_tail
+    supervisor = server_supervisor
+    
     # 上次处理的日志位置（用于增量读取）
     _last_log_position: int = 0
     _last_log_inode: int = 0
@@ -27,11 +37,14 @@ class PlayerManager:
     @classmethod
     def is_server_running(cls) -> bool:
         """检查服务器是否正在运行"""
-        return cls.SERVER_FIFO_PATH.exists()
+        return cls.supervisor.running or cls.SERVER_FIFO_PATH.exists()
     
     @classmethod
     def send_command(cls, command: str) -> Tuple[bool, str]:
         """向Bedrock服务器发送命令"""
+        # 手动模式下由管理器启动的服务器通过标准输入接收命令
+        if cls.supervisor.running:
+            return cls.supervisor.send([command])
         if not cls.is_server_running():
             return False, "服务器命令通道不可用。请确认服务器是否正在运行。"
         
@@ -42,11 +55,53 @@ class PlayerManager:
         except Exception as e:
             return False, f"发送命令失败: {str(e)}"
     
+    @classmethod
+    def send_commands(cls, commands: List[str]) -> Tuple[bool, str]:
+        """一次写入向服务器发送多条命令"""
+        if not commands:
+            return True, "没有需要发送的命令"
+        if cls.supervisor.running:
+            return cls.supervisor.send(commands)
+        if not cls.is_server_running():
+            return False, "服务器命令通道不可用。请确认服务器是否正在运行。"
+        
+        try:
+            with open(cls.SERVER_FIFO_PATH, 'w') as fifo:
+                fifo.write(''.join(f"{command}\n" for command in commands))
+            return True, f"已发送 {len(commands)} 条命令"
+        except Exception as e:
+            return False, f"发送命令失败: {str(e)}"
+    
+    @classmethod
+    def send_command_and_wait(cls, command: str, pattern: str, timeout: Optional[float] = None,
+                              continuation=None) -> Tuple[bool, str, Optional[LogResponse]]:
+        """
+        发送命令并等待服务器在日志中输出匹配的响应
+        匹配到第一条响应行后立即返回，不再固定等待
+        """
+        if timeout is None:
+            timeout = Config.COMMAND_RESPONSE_TIMEOUT
+        
+        # 先注册匹配器再发送命令，避免错过快速响应
+        future = cls.tail.expect(pattern, timeout, continuation)
+        success, msg = cls.send_command(command)
+        if not success:
+            cls.tail.cancel(future)
+            return False, msg, None
+        
+        try:
+            response = future.result(timeout=timeout + 1)
+        except FutureTimeoutError:
+            cls.tail.cancel(future)
+            return False, "等待服务器响应超时", None
+        
+        return True, '\n'.join(response.lines), response
+    
     @classmethod
     def refresh_player_list(cls) -> Tuple[bool, str]:
         """
         主动刷新玩家列表
-        发送 list 命令，等待响应，然后解析日志
+        发送 list 命令，等待服务器响应后更新在线玩家
         """
         if not cls.is_server_running():
             return False, "服务器未运行"
@@ -57,79 +112,55 @@ class PlayerManager:
             return True, "请稍后再刷新"
         cls._last_list_command_time = now
         
-        # 记录当前日志位置
-        log_file = Config.LOG_FILE
-        try:
-            start_pos = log_file.stat().st_size if log_file.exists() else 0
-        except:
-            start_pos = 0
+        # 解析 list 命令的响应
+        # 格式: There are X/Y players online:
+        # 或: There are X/Y players online: player1, player2
+        # 部分版本会把玩家名称输出在下一行，此时多收集一行
+        list_pattern = r'There are (\d+)/\d+ players online:?\s*(.*)$'
         
-        # 发送 list 命令
-        success, msg = cls.send_command("list")
+        def continuation(match) -> int:
+            return 1 if int(match.group(1)) > 0 and not match.group(2).strip() else 0
+        
+        success, msg, response = cls.send_command_and_wait("list", list_pattern, continuation=continuation)
         if not success:
             return False, msg
         
-        # 等待响应写入日志
-        time.sleep(0.5)
-        
-        # 读取新的日志内容
         try:
-            if not log_file.exists():
-                return False, "日志文件不存在"
+            count = int(response.match.group(1))
+            players_str = response.match.group(2).strip()
+            if not players_str and len(response.lines) > 1:
+                players_str = re.sub(r'^\[[^\]]*\]\s*', '', response.lines[1]).strip()
             
-            with open(log_file, 'r', encoding='utf-8', errors='ignore') as f:
-                f.seek(start_pos)
-                new_content = f.read()
+            from app.models import PlayerSession
             
-            # 解析 list 命令的响应
-            # 格式: There are X/Y players online:
-            # 或: There are X/Y players online: player1, player2
-            list_pattern = re.compile(
-                r'There are (\d+)/\d+ players online[:\s]*(.*?)(?:\n|$)',
-                re.IGNORECASE
-            )
+            # 获取当前数据库中的在线玩家
+            current_online = {p.player_name for p in PlayerSession.query.filter_by(is_online=True).all()}
             
-            match = list_pattern.search(new_content)
-            if match:
-                count = int(match.group(1))
-                players_str = match.group(2).strip()
-                
-                from app import db
-                from app.models import PlayerSession
-                
-                # 获取当前数据库中的在线玩家
-                current_online = {p.player_name for p in PlayerSession.query.filter_by(is_online=True).all()}
-                
-                if count == 0:
-                    # 没有玩家在线，标记所有玩家离线
-                    cls._mark_all_offline()
-                    return True, "已更新：0 个在线玩家"
-                else:
-                    # 解析玩家名称
-                    if players_str:
-                        player_names = [p.strip() for p in players_str.split(',') if p.strip()]
-                    else:
-                        player_names = []
-                    
-                    # 重要：如果服务器报告有玩家但我们没有解析到名称，不要清空现有玩家！
-                    if count > 0 and not player_names:
-                        # 无法解析玩家名称，保持现有状态
-                        return True, f"服务器报告 {count} 个在线玩家，但无法解析名称"
-                    
-                    # 更新数据库
-                    new_players = set(player_names)
-                    
-                    # 标记离线的玩家
-                    for name in current_online - new_players:
-                        cls._player_disconnected(name)
-                    
-                    # 添加新玩家
-                    for name in new_players - current_online:
-                        cls._player_connected(name)
-                    
-                    return True, f"已更新：{len(new_players)} 个在线玩家"
+            if count == 0:
+                # 没有玩家在线，标记所有玩家离线
+                cls._mark_all_offline()
+                return True, "已更新：0 个在线玩家"
+            
+            # 解析玩家名称
+            player_names = [p.strip() for p in players_str.split(',') if p.strip()]
+            
+            # 重要：如果服务器报告有玩家但我们没有解析到名称，不要清空现有玩家！
+            if not player_names:
+                # 无法解析玩家名称，保持现有状态
+                return True, f"服务器报告 {count} 个在线玩家，但无法解析名称"
             
-            return True, "命令已发送，等待响应..."
+            # 更新数据库
+            new_players = set(player_names)
+            
+            # 标记离线的玩家
+            for name in current_online - new_players:
+                cls._player_disconnected(name)
+            
+            # 添加新玩家
+            for name in new_players - current_online:
+                cls._player_connected(name)
+            
+            return True, f"已更新：{len(new_players)} 个在线玩家"
             
         except Exception as e:
             return False, f"解析响应失败: {str(e)}"
@@ -137,7 +168,7 @@ class PlayerManager:
     @classmethod
     def _get_server_session_id(cls) -> str:
         """获取当前服务器会话ID（基于服务器PID）"""
-        pid_file = Path('/tmp/bedrock_server.pid')
+        pid_file = cls.PID_FILE
         try:
             # 优先使用 PID 文件内容作为会话标识（更稳定）
             if pid_file.exists():
@@ -162,6 +193,7 @@ class PlayerManager:
         """将所有玩家标记为离线（服务器重启时调用）"""
         from app import db
         from app.models import PlayerSession
+        from app.player_analytics import player_analytics
         
         try:
             PlayerSession.query.filter_by(is_online=True).update({
@@ -169,6 +201,7 @@ class PlayerManager:
                 'leave_time': datetime.utcnow()
             })
             db.session.commit()
+            player_analytics.mark_dirty()
         except Exception as e:
             db.session.rollback()
             print(f"Error marking all players offline: {e}")
@@ -178,25 +211,35 @@ class PlayerManager:
         """记录玩家连接"""
         from app import db
         from app.models import PlayerSession
+        from app.effect_scheduler import effect_scheduler
+        from app.player_identity import player_identity
         
         if join_time is None:
             join_time = datetime.utcnow()
         
         try:
+            # 通过身份缓存解析玩家（不带xuid的日志行按名称解析到已知的xuid）
+            player = player_identity.observe(player_name, xuid, join_time)
+            if player is None:
+                return
+            xuid = xuid or player.xuid
+            
             # 检查是否已有该玩家的在线记录
             existing = PlayerSession.query.filter_by(
-                player_name=player_name,
+                player_id=player.id,
                 is_online=True
             ).first()
             
             if existing:
                 # 已经在线，更新时间
                 existing.join_time = join_time
+                existing.player_name = player_name
                 if xuid:
                     existing.xuid = xuid
             else:
                 # 创建新记录
                 session = PlayerSession(
+                    player_id=player.id,
                     player_name=player_name,
                     xuid=xuid,
                     is_online=True,
@@ -206,28 +249,45 @@ class PlayerManager:
                 db.session.add(session)
             
             db.session.commit()
+            
+            if not existing:
+                # 重新连接的玩家需要恢复未到期的定时效果
+                effect_scheduler.on_player_connected(player.id, player_name)
         except Exception as e:
             db.session.rollback()
+            player_identity.clear()
             print(f"Error recording player connect: {e}")
     
+    @staticmethod
+    def _online_session(player_name: str):
+        """玩家的在线会话（通过身份缓存解析到 player_id；身份表中没有的名称按名称查找）"""
+        from app.models import PlayerSession
+        from app.player_identity import player_identity
+        
+        player = player_identity.resolve(name=player_name)
+        query = PlayerSession.query.filter_by(is_online=True)
+        if player is not None:
+            query = query.filter_by(player_id=player.id)
+        else:
+            query = query.filter_by(player_name=player_name)
+        return query.first()
+    
     @classmethod
     def _player_disconnected(cls, player_name: str):
         """记录玩家断开连接"""
         from app import db
-        from app.models import PlayerSession
+        from app.player_analytics import player_analytics
         
         try:
             # 找到该玩家的在线记录并标记为离线
-            session = PlayerSession.query.filter_by(
-                player_name=player_name,
-                is_online=True
-            ).first()
+            session = cls._online_session(player_name)
             
             if session:
                 session.is_online = False
                 session.leave_time = datetime.utcnow()
                 session.is_invincible = False  # 离线时清除无敌状态
                 db.session.commit()
+                player_analytics.mark_dirty()
         except Exception as e:
             db.session.rollback()
             print(f"Error recording player disconnect: {e}")
@@ -235,7 +295,7 @@ class PlayerManager:
     @classmethod
     def _get_stored_session_id(cls) -> Optional[str]:
         """从文件获取存储的服务器会话ID"""
-        session_file = Path('/tmp/bedrock_session_id.txt')
+        session_file = cls.SESSION_FILE
         try:
             if session_file.exists():
                 return session_file.read_text().strip()
@@ -246,7 +306,7 @@ class PlayerManager:
     @classmethod
     def _store_session_id(cls, session_id: str):
         """存储服务器会话ID到文件"""
-        session_file = Path('/tmp/bedrock_session_id.txt')
+        session_file = cls.SESSION_FILE
         try:
             session_file.write_text(session_id)
         except:
@@ -278,7 +338,7 @@ class PlayerManager:
     @classmethod
     def _process_log_file(cls):
         """处理日志文件，更新玩家状态"""
-        log_file = Config.LOG_FILE
+        log_file = cls.LOG_FILE
         if not log_file.exists():
             return
         
@@ -400,25 +460,40 @@ class PlayerManager:
     def is_player_invincible(cls, player_name: str) -> bool:
         """检查玩家是否处于无敌状态"""
         from app.models import PlayerSession
+        from app.player_identity import player_identity
         
         try:
+            player = player_identity.resolve(name=player_name)
+            if player is None:
+                return False
             session = PlayerSession.query.filter_by(
-                player_name=player_name,
+                player_id=player.id,
                 is_online=True
             ).first()
             
+            # 到期由效果调度器清除，这里不再比较时间
             if session and session.is_invincible:
-                if session.invincible_until is None or session.invincible_until > datetime.utcnow():
-                    return True
+                return True
         except:
             pass
         return False
     
+    @staticmethod
+    def _invincible_commands(player_name: str, duration: int) -> List[str]:
+        """生成无敌效果命令"""
+        return [
+            f'effect {player_name} resistance {duration} 255 true',
+            f'effect {player_name} regeneration {duration} 255 true',
+            f'effect {player_name} fire_resistance {duration} 255 true',
+            f'effect {player_name} instant_health 1 255 true'
+        ]
+    
     @classmethod
     def set_invincible(cls, player_name: str, enable: bool = True, duration: int = 999999) -> Tuple[bool, str]:
         """设置玩家无敌模式"""
         from app import db
-        from app.models import PlayerSession
+        from app.effect_scheduler import effect_scheduler, EXPIRE_INVINCIBLE
+        from app.player_identity import player_identity
         
         if not player_name:
             return False, "玩家名称不能为空"
@@ -430,12 +505,7 @@ class PlayerManager:
         
         if enable:
             # 发送效果命令
-            commands = [
-                f'effect {player_name} resistance {duration} 255 true',
-                f'effect {player_name} regeneration {duration} 255 true',
-                f'effect {player_name} fire_resistance {duration} 255 true',
-                f'effect {player_name} instant_health 1 255 true'
-            ]
+            commands = cls._invincible_commands(player_name, duration)
             
             success_count = 0
             for cmd in commands:
@@ -447,15 +517,15 @@ class PlayerManager:
             if success_count > 0:
                 # 更新数据库状态
                 try:
-                    session = PlayerSession.query.filter_by(
-                        player_name=player_name,
-                        is_online=True
-                    ).first()
+                    session = cls._online_session(player_name)
                     
+                    until = datetime.utcnow() + timedelta(seconds=duration)
                     if session:
                         session.is_invincible = True
-                        session.invincible_until = datetime.utcnow() + timedelta(seconds=duration)
-                        db.session.commit()
+                        session.invincible_until = until
+                    # 到期时由调度器移除效果（计时器按身份ID关联，改名后仍有效）
+                    player = player_identity.resolve(name=player_name)
+                    effect_scheduler.schedule(player.id if player else None, player_name, EXPIRE_INVINCIBLE, until)
                 except Exception as e:
                     db.session.rollback()
                     print(f"Error updating invincible status: {e}")
@@ -469,15 +539,13 @@ class PlayerManager:
             
             # 更新数据库状态
             try:
-                session = PlayerSession.query.filter_by(
-                    player_name=player_name,
-                    is_online=True
-                ).first()
+                session = cls._online_session(player_name)
                 
                 if session:
                     session.is_invincible = False
                     session.invincible_until = None
-                    db.session.commit()
+                player = player_identity.resolve(name=player_name)
+                effect_scheduler.cancel(player.id if player else None, player_name, EXPIRE_INVINCIBLE)
             except Exception as e:
                 db.session.rollback()
             
@@ -536,3 +604,188 @@ class PlayerManager:
         
         success, msg = cls.send_command(f'tp {player_name} {x} {y} {z}')
         return success, f"已传送 {player_name} 到 ({x}, {y}, {z})" if success else msg
+    
+    BULK_ACTIONS = ('kick', 'effect', 'tp', 'give', 'message')
+    BULK_MAX_PLAYERS = 200
+    
+    @classmethod
+    def _build_bulk_commands(cls, action: str, params: Dict) -> Tuple[Optional[str], Optional[callable]]:
+        """
+        校验批量操作参数（只校验一次），返回 (错误信息, 命令生成函数)
+        命令生成函数接收玩家名称，返回该玩家的命令列表
+        """
+        if action == 'kick':
+            reason = re.sub(r'[^\w\s\u4e00-\u9fff]', '', str(params.get('reason', '')))[:100] or "被管理员踢出"
+            return None, lambda name: [f'kick {name} {reason}']
+        
+        if action == 'effect':
+            effect = str(params.get('effect', '')).strip().lower()
+            try:
+                duration = int(params.get('duration', 30))
+                amplifier = int(params.get('amplifier', 0))
+            except (ValueError, TypeError):
+                return "持续时间和等级必须是整数", None
+            if not 1 <= duration <= 1000000 or not 0 <= amplifier <= 255:
+                return "持续时间或等级超出范围", None
+            
+            if effect == 'invincible':
+                return None, lambda name: cls._invincible_commands(name, duration)
+            if effect == 'clear':
+                return None, lambda name: [f'effect {name} clear']
+            if not re.fullmatch(r'[a-z_]+', effect):
+                return "无效的效果名称", None
+            # 表单和CSV中的值是字符串，"false" / "0" 也表示不隐藏
+            hide = params.get('hide_particles', True)
+            if not isinstance(hide, bool):
+                hide = str(hide).strip().lower()
+                if hide not in ('1', 'true', 'yes', 'y', '0', 'false', 'no', 'n'):
+                    return "hide_particles 必须是布尔值", None
+                hide = hide in ('1', 'true', 'yes', 'y')
+            hide = 'true' if hide else 'false'
+            return None, lambda name: [f'effect {name} {effect} {duration} {amplifier} {hide}']
+        
+        if action == 'tp':
+            target = params.get('target')
+            if target:
+                target = re.sub(r'[^\w]', '', str(target))
+                if not target:
+                    return "无效的传送目标", None
+                return None, lambda name: [f'tp {name} {target}']
+            try:
+                x, y, z = float(params.get('x')), float(params.get('y')), float(params.get('z'))
+            except (ValueError, TypeError):
+                return "坐标必须是数字", None
+            return None, lambda name: [f'tp {name} {x} {y} {z}']
+        
+        if action == 'give':
+            item = str(params.get('item', '')).strip().lower()
+            if not re.fullmatch(r'[a-z0-9_:]+', item):
+                return "无效的物品名称", None
+            try:
+                amount = int(params.get('amount', 1))
+            except (ValueError, TypeError):
+                return "数量必须是整数", None
+            if not 1 <= amount <= 32767:
+                return "数量超出范围", None
+            return None, lambda name: [f'give {name} {item} {amount}']
+        
+        if action == 'message':
+            message = re.sub(r'["\'\n\r]', '', str(params.get('message', '')))[:200].strip()
+            if not message:
+                return "消息不能为空", None
+            return None, lambda name: [f'tell {name} {message}']
+        
+        return f"不支持的操作: {action}", None
+    
+    @classmethod
+    def bulk_action(cls, action: str, players: Optional[List[str]] = None, selector: Optional[str] = None,
+                    params: Optional[Dict] = None) -> Tuple[bool, str, List[Dict]]:
+        """
+        对多个玩家执行同一操作
+        所有命令通过一次写入发送，数据库状态在一个事务中更新
+        
+        Args:
+            action: kick / effect / tp / give / message
+            players: 玩家名称列表
+            selector: 'online' 表示所有在线玩家（与 players 二选一）
+            params: 操作参数
+        
+        Returns:
+            (是否成功, 消息, 每个玩家的结果列表)
+        """
+        from app import db
+        from app.models import PlayerSession
+        from app.player_analytics import player_analytics
+        from app.effect_scheduler import effect_scheduler, EXPIRE_INVINCIBLE
+        from app.player_identity import player_identity
+        
+        params = params or {}
+        error, build = cls._build_bulk_commands(action, params)
+        if error:
+            return False, error, []
+        
+        # 解析目标玩家
+        if selector:
+            if selector not in ('online', '@a'):
+                return False, f"不支持的选择器: {selector}", []
+            names = [p.player_name for p in PlayerSession.query.filter_by(is_online=True).all()]
+        else:
+            names = players or []
+        
+        if not names:
+            return False, "没有目标玩家", []
+        if len(names) > cls.BULK_MAX_PLAYERS:
+            return False, f"一次最多操作 {cls.BULK_MAX_PLAYERS} 个玩家", []
+        
+        # 按请求顺序记录每个玩家的结果，无效名称直接标记失败
+        results = []
+        targets = []
+        for raw in names:
+            name = re.sub(r'[^\w]', '', str(raw))
+            if not name:
+                results.append({'player': str(raw), 'success': False, 'message': '无效的玩家名称'})
+            elif name in targets:
+                results.append({'player': name, 'success': False, 'message': '重复的玩家'})
+            else:
+                targets.append(name)
+                results.append({'player': name, 'success': True, 'message': f"已发送 {len(build(name))} 条命令"})
+        
+        commands = [cmd for name in targets for cmd in build(name)]
+        success, msg = cls.send_commands(commands)
+        if not success:
+            for result in results:
+                if result['success']:
+                    result.update(success=False, message=msg)
+            return False, msg, results
+        
+        # 在一个事务中更新所有目标玩家的会话状态
+        effect = str(params.get('effect', '')).lower()
+        if targets and (action == 'kick' or (action == 'effect' and effect in ('invincible', 'clear'))):
+            now = datetime.utcnow()
+            until = now + timedelta(seconds=int(params.get('duration', 30)))
+            timers = []
+            cancelled = []
+            try:
+                # 通过身份缓存解析到 player_id，身份表中没有的名称按名称查找
+                players = [player_identity.resolve(name=name) for name in targets]
+                conditions = []
+                player_ids = [player.id for player in players if player is not None]
+                if player_ids:
+                    conditions.append(PlayerSession.player_id.in_(player_ids))
+                unresolved = [name for name, player in zip(targets, players) if player is None]
+                if unresolved:
+                    conditions.append(PlayerSession.player_name.in_(unresolved))
+                sessions = PlayerSession.query.filter(
+                    PlayerSession.is_online == True,  # noqa: E712
+                    db.or_(*conditions)
+                ).all()
+                for session in sessions:
+                    if action == 'kick':
+                        session.is_online = False
+                        session.leave_time = now
+                        session.is_invincible = False
+                    elif effect == 'invincible':
+                        session.is_invincible = True
+                        session.invincible_until = until
+                    else:
+                        session.is_invincible = False
+                        session.invincible_until = None
+                
+                # 定时器与会话状态在同一事务中更新
+                if action == 'effect':
+                    for name, player in zip(targets, players):
+                        player_id = player.id if player else None
+                        if effect == 'invincible':
+                            timers.append(effect_scheduler.schedule(player_id, name, EXPIRE_INVINCIBLE, until, commit=False))
+                        else:
+                            cancelled += effect_scheduler.cancel(player_id, name, EXPIRE_INVINCIBLE, commit=False)
+                db.session.commit()
+                effect_scheduler.activate(timers)
+                effect_scheduler.deactivate(cancelled)
+                if action == 'kick' and sessions:
+                    player_analytics.mark_dirty()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error updating player sessions: {e}")
+        
+        return True, f"已对 {len(targets)} 个玩家执行 {action}", results
@@ -0,0 +1,191 @@
+"""
+玩家位置采样模块 - 定期通过 querytarget @a 获取玩家位置
+位置按维度存储在定长数组环形缓冲区中，采样后预先计算区块级热力图瓦片，
+用于找出玩家聚集（农场、常加载区块、实体堆积）的位置
+"""
+import json
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import Config
+
+CHUNK_SIZE = 16   # 每个区块的方块数
+TILE_SIZE = 16    # 每个瓦片的区块数（16x16 区块）
+DIMENSIONS = {0: 'overworld', 1: 'nether', 2: 'the_end'}
+
+# querytarget 的输出格式: Target data: [{"dimension":0,"position":{"x":..,"y":..,"z":..},"uniqueId":"..","yRot":..}]
+TARGET_DATA_PATTERN = r'Target data:\s*(\[.*\])'
+
+
+class PositionBuffer:
+    """单个维度的位置环形缓冲区（时间戳 + 区块坐标）"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.chunk_x = np.zeros(capacity, dtype=np.int32)
+        self.chunk_z = np.zeros(capacity, dtype=np.int32)
+        self.count = 0
+        self._next = 0
+
+    def append(self, timestamp: int, chunk_x: np.ndarray, chunk_z: np.ndarray):
+        """追加一批位置，满了之后覆盖最旧的数据"""
+        n = len(chunk_x)
+        if n == 0:
+            return
+        if n > self.capacity:
+            chunk_x, chunk_z = chunk_x[-self.capacity:], chunk_z[-self.capacity:]
+            n = self.capacity
+        idx = (self._next + np.arange(n)) % self.capacity
+        self.timestamps[idx] = timestamp
+        self.chunk_x[idx] = chunk_x
+        self.chunk_z[idx] = chunk_z
+        self._next = (self._next + n) % self.capacity
+        self.count = min(self.count + n, self.capacity)
+
+    def since(self, cutoff: int):
+        """返回时间不早于 cutoff 的区块坐标"""
+        valid = self.timestamps[:self.count] >= cutoff
+        return self.chunk_x[:self.count][valid], self.chunk_z[:self.count][valid]
+
+
+class PositionSampler:
+    """定期采样玩家位置并生成热力图"""
+
+    def __init__(self):
+        self.app = None
+        self.buffers: Dict[int, PositionBuffer] = {}
+        self.last_sample: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._tiles: Dict[int, Dict] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def init_app(self, app):
+        """启动采样线程（采样间隔为0时禁用）"""
+        self.app = app
+        if Config.POSITION_SAMPLE_INTERVAL <= 0:
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='position-sampler', daemon=True)
+        self._thread.start()
+
+    def _buffer(self, dimension: int) -> PositionBuffer:
+        if dimension not in self.buffers:
+            self.buffers[dimension] = PositionBuffer(Config.POSITION_BUFFER_SIZE)
+        return self.buffers[dimension]
+
+    def sample_once(self) -> bool:
+        """采样一次（需要在应用上下文中调用）"""
+        from app.models import PlayerSession
+        from app.player_manager import PlayerManager
+
+        # 没有在线玩家时不发送命令，避免空转
+        if not PlayerManager.is_server_running():
+            return False
+        if not PlayerSession.query.filter_by(is_online=True).first():
+            return False
+
+        success, msg, response = PlayerManager.send_command_and_wait('querytarget @a', TARGET_DATA_PATTERN)
+        if not success:
+            self.last_error = msg
+            return False
+
+        try:
+            targets = json.loads(response.match.group(1))
+        except ValueError as e:
+            self.last_error = f"无法解析 querytarget 输出: {e}"
+            return False
+
+        self.record(targets)
+        return True
+
+    def record(self, targets: List[Dict], timestamp: Optional[int] = None):
+        """记录一批 querytarget 结果并重新计算热力图"""
+        timestamp = int(timestamp or time.time())
+        dims = np.fromiter((t.get('dimension', 0) for t in targets), dtype=np.int32, count=len(targets))
+        xs = np.fromiter((t['position']['x'] for t in targets), dtype=np.float64, count=len(targets))
+        zs = np.fromiter((t['position']['z'] for t in targets), dtype=np.float64, count=len(targets))
+        chunk_x = np.floor_divide(xs, CHUNK_SIZE).astype(np.int32)
+        chunk_z = np.floor_divide(zs, CHUNK_SIZE).astype(np.int32)
+
+        with self._lock:
+            for dimension in np.unique(dims):
+                mask = dims == dimension
+                self._buffer(int(dimension)).append(timestamp, chunk_x[mask], chunk_z[mask])
+            self._rebuild_tiles(timestamp)
+            self.last_sample = time.time()
+            self.last_error = None
+
+    def _rebuild_tiles(self, now: int):
+        """按保留时间窗口重新计算每个维度的区块热力图瓦片"""
+        cutoff = now - Config.POSITION_RETENTION
+        tiles = {}
+        for dimension, buffer in self.buffers.items():
+            cx, cz = buffer.since(cutoff)
+            if len(cx) == 0:
+                continue
+
+            # 统计每个区块的采样次数
+            chunks, counts = np.unique(np.stack([cx, cz], axis=1), axis=0, return_counts=True)
+            tile_x = np.floor_divide(chunks[:, 0], TILE_SIZE)
+            tile_z = np.floor_divide(chunks[:, 1], TILE_SIZE)
+            local = np.mod(chunks[:, 1], TILE_SIZE) * TILE_SIZE + np.mod(chunks[:, 0], TILE_SIZE)
+
+            # 把区块计数填入每个瓦片的 16x16 网格
+            tile_keys, tile_index = np.unique(np.stack([tile_x, tile_z], axis=1), axis=0, return_inverse=True)
+            tile_index = tile_index.reshape(-1)
+            grid = np.zeros((len(tile_keys), TILE_SIZE * TILE_SIZE), dtype=np.int64)
+            np.add.at(grid, (tile_index, local), counts)
+
+            hottest = np.argsort(-counts, kind='stable')[:20]
+            tiles[dimension] = {
+                'dimension': dimension,
+                'name': DIMENSIONS.get(dimension, str(dimension)),
+                'samples': int(counts.sum()),
+                'max': int(counts.max()),
+                'hottest_chunks': [
+                    {'chunk_x': int(chunks[i, 0]), 'chunk_z': int(chunks[i, 1]), 'count': int(counts[i])}
+                    for i in hottest
+                ],
+                'tiles': [
+                    {'tile_x': int(key[0]), 'tile_z': int(key[1]), 'counts': grid[i].tolist()}
+                    for i, key in enumerate(tile_keys)
+                ],
+            }
+        self._tiles = tiles
+
+    def get_heatmap(self, dimension: Optional[int] = None) -> Dict:
+        """返回预先计算的热力图瓦片"""
+        with self._lock:
+            tiles = self._tiles
+            if dimension is not None:
+                tiles = {dimension: tiles[dimension]} if dimension in tiles else {}
+            return {
+                'chunk_size': CHUNK_SIZE,
+                'tile_size': TILE_SIZE,
+                'retention': Config.POSITION_RETENTION,
+                'interval': Config.POSITION_SAMPLE_INTERVAL,
+                'last_sample': self.last_sample,
+                'last_error': self.last_error,
+                'dimensions': list(tiles.values()),
+            }
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                with self.app.app_context():
+                    self.sample_once()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Error sampling player positions: {e}")
+            self._stop_event.wait(Config.POSITION_SAMPLE_INTERVAL)
+
+
+# 全局位置采样实例
+position_sampler = PositionSampler()
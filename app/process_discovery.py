@@ -0,0 +1,167 @@
+"""
+进程发现模块 - 直接扫描 /proc 查找 bedrock_server 进程
+每个进程只读取一次 /proc/<pid>/stat（其中包含进程名、父进程和启动时间），
+先按进程名筛选，只有候选进程才读取 cmdline；结果按 (pid, 启动时间) 缓存，
+PID 被复用时启动时间不同，不会误用旧进程的信息。没有 /proc 的系统回退到 psutil。
+命令行包含服务器路径的包装进程（shell、screen 等）也会返回，但标记为 wrapper，
+只用于查找 PID，不能当作服务器进程结束
+"""
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import psutil
+
+PROC_DIR = Path('/proc')
+
+# 进程名（comm，最长15个字符）属于这些解释器/shell时，也检查命令行（例如包装脚本）
+WRAPPER_COMMS = ('sh', 'bash', 'dash', 'su', 'sudo', 'env', 'screen', 'tmux')
+WRAPPER_PREFIXES = ('python',)
+
+
+class ProcStat(NamedTuple):
+    """/proc/<pid>/stat 中用到的字段"""
+    pid: int
+    comm: str
+    state: str
+    ppid: int
+    starttime: int  # 开机后的时钟滴答数
+
+
+def _read(path: str) -> bytes:
+    """不经过Python文件对象直接读取（/proc 文件很小，扫描时每个进程都要读一次）"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        chunks = []
+        while True:
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                return b''.join(chunks)
+            chunks.append(chunk)
+    finally:
+        os.close(fd)
+
+
+def read_stat(pid: int) -> Optional[ProcStat]:
+    """读取并解析 /proc/<pid>/stat，进程已退出时返回None"""
+    try:
+        content = _read(f'/proc/{pid}/stat').decode('utf-8', errors='replace')
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        return None
+    # 进程名可能包含空格和括号，以最后一个 ')' 为界
+    start, end = content.find('('), content.rfind(')')
+    if start < 0 or end < 0:
+        return None
+    fields = content[end + 2:].split()
+    try:
+        # 字段编号见 proc(5)：3=state, 4=ppid, 22=starttime
+        return ProcStat(pid, content[start + 1:end], fields[0], int(fields[1]), int(fields[19]))
+    except (IndexError, ValueError):
+        return None
+
+
+def read_cmdline(pid: int) -> str:
+    try:
+        raw = _read(f'/proc/{pid}/cmdline')
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        return ''
+    return raw.rstrip(b'\0').replace(b'\0', b' ').decode('utf-8', errors='replace')
+
+
+class ProcessDiscovery:
+    """按可执行文件名查找进程"""
+
+    def __init__(self):
+        # (pid, starttime) -> 候选进程的命令行（不同的 name 共用）
+        self._cache: Dict[Tuple[int, int], str] = {}
+        self._lock = threading.Lock()
+        self._boot_time: Optional[float] = None
+        self._ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+    @property
+    def available(self) -> bool:
+        return (PROC_DIR / 'self' / 'stat').exists()
+
+    def _create_time(self, starttime: int) -> float:
+        if self._boot_time is None:
+            self._boot_time = psutil.boot_time()
+        return round(self._boot_time + starttime / self._ticks, 2)
+
+    @staticmethod
+    def _is_binary(comm: str, name: str) -> bool:
+        """进程名是否就是服务器可执行文件（name 可以是完整路径，进程名只包含文件名的前15个字符）"""
+        return comm == os.path.basename(name)[:15]
+
+    @classmethod
+    def _is_candidate(cls, comm: str, name: str) -> bool:
+        return cls._is_binary(comm, name) or comm in WRAPPER_COMMS or comm.startswith(WRAPPER_PREFIXES)
+
+    def find(self, name: str) -> List[Dict]:
+        """
+        查找命令行包含 name（进程名或可执行文件路径）的进程
+
+        Returns:
+            [{'pid', 'ppid', 'parent_name', 'cmdline', 'create_time', 'wrapper'}]，
+            wrapper 为 True 表示进程本身不是服务器可执行文件
+        """
+        if not self.available:
+            return self._find_with_psutil(name)
+
+        stats: Dict[int, ProcStat] = {}
+        for entry in os.scandir(PROC_DIR):
+            if entry.name.isdigit():
+                stat = read_stat(int(entry.name))
+                if stat is not None:
+                    stats[stat.pid] = stat
+
+        processes = []
+        seen = set()
+        with self._lock:
+            for stat in stats.values():
+                if stat.state == 'Z' or not self._is_candidate(stat.comm, name):
+                    continue
+                key = (stat.pid, stat.starttime)
+                seen.add(key)
+                cmdline = self._cache.get(key)
+                if cmdline is None:
+                    cmdline = self._cache[key] = read_cmdline(stat.pid)
+                if name not in cmdline:
+                    continue
+                parent = stats.get(stat.ppid)
+                processes.append({
+                    'pid': stat.pid,
+                    'ppid': stat.ppid,
+                    'parent_name': parent.comm if parent else None,
+                    'cmdline': cmdline,
+                    'create_time': self._create_time(stat.starttime),
+                    'wrapper': not self._is_binary(stat.comm, name)
+                })
+            # 已退出的进程从缓存中移除
+            for key in [key for key in self._cache if key not in seen]:
+                del self._cache[key]
+
+        return processes
+
+    @classmethod
+    def _find_with_psutil(cls, name: str) -> List[Dict]:
+        processes = []
+        for proc in psutil.process_iter(['pid', 'name', 'cmdline', 'ppid', 'create_time']):
+            try:
+                cmdline = proc.info.get('cmdline', [])
+                if cmdline and name in ' '.join(cmdline):
+                    processes.append({
+                        'pid': proc.info['pid'],
+                        'ppid': proc.info.get('ppid'),
+                        'parent_name': None,
+                        'cmdline': ' '.join(cmdline),
+                        'create_time': proc.info.get('create_time', 0),
+                        'wrapper': not cls._is_binary((proc.info.get('name') or '')[:15], name)
+                    })
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return processes
+
+
+# 全局进程发现实例
+process_discovery = ProcessDiscovery()
@@ -0,0 +1,147 @@
+"""
+公开状态模块 - 无需登录的只读服务器状态和SVG徽章
+后台线程按固定间隔通过RakNet ping刷新快照，并预先生成JSON、SVG和对应的ETag；
+请求只读取内存中的快照，不会调用psutil或启动子进程
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+from xml.sax.saxutils import escape
+
+from app import raknet
+from config import Config
+
+# Minecraft格式代码（§ + 一个字符）
+FORMAT_CODE_PATTERN = re.compile('§.')
+
+# 徽章中MOTD的最大长度
+BADGE_MOTD_LENGTH = 32
+
+# 徽章颜色
+COLOR_ONLINE = '#4c1'
+COLOR_OFFLINE = '#e05d44'
+COLOR_UNKNOWN = '#9f9f9f'
+COLOR_LABEL = '#555'
+
+
+class Snapshot(NamedTuple):
+    """一次刷新的结果（预先编码好的响应内容）"""
+    data: Dict
+    json_body: bytes
+    json_etag: str
+    badge_body: bytes
+    badge_etag: str
+
+
+def strip_format_codes(text: str) -> str:
+    return FORMAT_CODE_PATTERN.sub('', text or '').strip()
+
+
+def _text_width(text: str) -> int:
+    """估算文本宽度（Verdana 11px，宽字符按两倍计算）"""
+    return sum(14 if ord(ch) > 0x2e80 else 7 for ch in text)
+
+
+def render_badge(data: Dict) -> str:
+    """生成 shields 风格的状态徽章"""
+    label = strip_format_codes(data.get('motd') or '') or 'Bedrock'
+    if len(label) > BADGE_MOTD_LENGTH:
+        label = label[:BADGE_MOTD_LENGTH - 1] + '…'
+
+    if data['online'] is None:
+        value, color = 'unknown', COLOR_UNKNOWN
+    elif data['online']:
+        value, color = f"online {data.get('players_online') or 0}/{data.get('players_max') or 0}", COLOR_ONLINE
+    else:
+        value, color = 'offline', COLOR_OFFLINE
+
+    label_width = _text_width(label) + 10
+    value_width = _text_width(value) + 10
+    width = label_width + value_width
+    label, value = escape(label), escape(value)
+
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="20" role="img" '
+        f'aria-label="{label}: {value}">'
+        f'<title>{label}: {value}</title>'
+        f'<linearGradient id="s" x2="0" y2="100%"><stop offset="0" stop-color="#bbb" stop-opacity=".1"/>'
+        f'<stop offset="1" stop-opacity=".1"/></linearGradient>'
+        f'<clipPath id="r"><rect width="{width}" height="20" rx="3" fill="#fff"/></clipPath>'
+        f'<g clip-path="url(#r)">'
+        f'<rect width="{label_width}" height="20" fill="{COLOR_LABEL}"/>'
+        f'<rect x="{label_width}" width="{value_width}" height="20" fill="{color}"/>'
+        f'<rect width="{width}" height="20" fill="url(#s)"/></g>'
+        f'<g fill="#fff" text-anchor="middle" font-family="Verdana,Geneva,DejaVu Sans,sans-serif" font-size="11">'
+        f'<text x="{label_width / 2}" y="15" fill="#010101" fill-opacity=".3">{label}</text>'
+        f'<text x="{label_width / 2}" y="14">{label}</text>'
+        f'<text x="{label_width + value_width / 2}" y="15" fill="#010101" fill-opacity=".3">{value}</text>'
+        f'<text x="{label_width + value_width / 2}" y="14">{value}</text></g></svg>'
+    )
+
+
+def _etag(body: bytes) -> str:
+    return hashlib.sha1(body).hexdigest()
+
+
+def build_snapshot(data: Dict) -> Snapshot:
+    json_body = json.dumps(data, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    badge_body = render_badge(data).encode('utf-8')
+    return Snapshot(data, json_body, _etag(json_body), badge_body, _etag(badge_body))
+
+
+class PublicStatus:
+    """定期刷新的公开状态快照"""
+
+    def __init__(self):
+        self.app = None
+        self._snapshot = build_snapshot({'online': None, 'updated_at': None})
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def init_app(self, app):
+        """启动后台刷新线程（未启用公开状态时不启动）"""
+        self.app = app
+        if not Config.PUBLIC_STATUS_ENABLED:
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='public-status', daemon=True)
+        self._thread.start()
+
+    @property
+    def snapshot(self) -> Snapshot:
+        return self._snapshot
+
+    def refresh(self) -> Snapshot:
+        """立即ping一次服务器并替换快照"""
+        pong = raknet.ping()
+        data = {'online': pong['online'], 'updated_at': int(time.time())}
+        if pong['online']:
+            data.update({
+                'motd': strip_format_codes(pong.get('motd') or ''),
+                'version': pong.get('version'),
+                'players_online': pong.get('players_online'),
+                'players_max': pong.get('players_max'),
+                'gamemode': pong.get('gamemode'),
+            })
+        else:
+            # 离线时保留上次的MOTD，徽章标题保持不变
+            data['motd'] = self._snapshot.data.get('motd')
+        # 整体替换引用，读取方不需要加锁
+        self._snapshot = build_snapshot(data)
+        return self._snapshot
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing public status: {e}")
+            self._stop_event.wait(Config.PUBLIC_STATUS_INTERVAL)
+
+
+# 全局公开状态实例
+public_status = PublicStatus()
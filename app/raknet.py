@@ -0,0 +1,97 @@
+"""
+RakNet 状态探测模块 - Bedrock 服务器的 unconnected ping/pong
+通过UDP发送一个 Unconnected Ping，解析服务器返回的 Unconnected Pong，
+获取 MOTD、协议版本、在线/最大玩家数，并测量响应时间
+"""
+import os
+import socket
+import struct
+import time
+from typing import Dict, Optional
+
+from config import Config
+
+UNCONNECTED_PING = 0x01
+UNCONNECTED_PONG = 0x1c
+RAKNET_MAGIC = bytes.fromhex('00ffff00fefefefefdfdfdfd12345678')
+
+# 客户端GUID在进程内保持不变
+CLIENT_GUID = struct.unpack('>q', os.urandom(8))[0]
+
+# Pong 中服务器ID字符串的字段顺序（以分号分隔）
+SERVER_ID_FIELDS = (
+    'edition', 'motd', 'protocol', 'version', 'players_online', 'players_max',
+    'server_guid', 'level_name', 'gamemode', 'gamemode_id', 'port_v4', 'port_v6'
+)
+INT_FIELDS = ('protocol', 'players_online', 'players_max', 'gamemode_id', 'port_v4', 'port_v6')
+
+
+def build_ping(timestamp_ms: int) -> bytes:
+    """构造 Unconnected Ping 数据包"""
+    return struct.pack('>Bq', UNCONNECTED_PING, timestamp_ms) + RAKNET_MAGIC + struct.pack('>q', CLIENT_GUID)
+
+
+def parse_pong(data: bytes) -> Optional[Dict]:
+    """解析 Unconnected Pong 数据包，格式不正确时返回None"""
+    # 1字节ID + 8字节时间 + 8字节服务器GUID + 16字节魔数 + 2字节长度
+    header = struct.calcsize('>Bqq') + len(RAKNET_MAGIC) + 2
+    if len(data) < header or data[0] != UNCONNECTED_PONG:
+        return None
+
+    _, timestamp, server_guid = struct.unpack_from('>Bqq', data)
+    if data[17:33] != RAKNET_MAGIC:
+        return None
+
+    (length,) = struct.unpack_from('>H', data, 33)
+    server_id = data[35:35 + length].decode('utf-8', errors='replace')
+    fields = server_id.split(';')
+
+    info = {'timestamp': timestamp, 'raknet_guid': server_guid, 'server_id': server_id}
+    for name, value in zip(SERVER_ID_FIELDS, fields):
+        if name in INT_FIELDS:
+            try:
+                value = int(value)
+            except ValueError:
+                value = None
+        info[name] = value
+    return info
+
+
+def ping(host: Optional[str] = None, port: Optional[int] = None, timeout: Optional[float] = None) -> Dict:
+    """
+    向Bedrock服务器发送 unconnected ping
+
+    Returns:
+        包含 online、latency_ms 以及 pong 中解析出的字段的字典；
+        未响应时 online 为 False 并带有 error
+    """
+    host = host or Config.BEDROCK_SERVER_ADDRESS
+    port = port or Config.BEDROCK_SERVER_PORT
+    timeout = timeout if timeout is not None else Config.RAKNET_PING_TIMEOUT
+
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(timeout)
+    try:
+        timestamp_ms = int(time.monotonic() * 1000)
+        started = time.perf_counter()
+        sock.sendto(build_ping(timestamp_ms), (host, port))
+
+        deadline = started + timeout
+        while True:
+            data, _ = sock.recvfrom(2048)
+            latency = time.perf_counter() - started
+            info = parse_pong(data)
+            # 忽略无关或过期的数据包
+            if info and info['timestamp'] == timestamp_ms:
+                info.pop('timestamp')
+                return {'online': True, 'latency_ms': round(latency * 1000, 3), **info}
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise socket.timeout()
+            sock.settimeout(remaining)
+    except socket.timeout:
+        return {'online': False, 'error': f'{host}:{port} 在 {timeout}s 内未响应'}
+    except OSError as e:
+        return {'online': False, 'error': str(e)}
+    finally:
+        sock.close()
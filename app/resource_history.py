@@ -0,0 +1,346 @@
+"""
+资源历史模块 - 记录服务器进程树的资源占用历史
+每秒采样一次CPU、内存(RSS)、线程数、打开的文件描述符、IO读写速率和上下文切换速率，
+存储在 1秒 / 1分钟 / 1小时 三级定长数组环形缓冲区中；低精度级别由上一级自动降采样
+（平均值 + 最大值），定期保存到文件，管理器重启后继续保留历史
+"""
+import atexit
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import psutil
+
+from config import Config
+
+METRICS = ('cpu_percent', 'rss_mb', 'threads', 'fds', 'read_bps', 'write_bps', 'ctx_switches_ps')
+# 各级别: (名称, 精度秒数)；容量由配置决定
+LEVELS = (('1s', 1), ('1m', 60), ('1h', 3600))
+
+# 进程树子进程列表的刷新间隔（秒），遍历全部进程开销较大，不在每次采样时执行
+TREE_REFRESH_INTERVAL = 30
+# 保存到文件的间隔（秒）
+SAVE_INTERVAL = 60
+
+
+class RingSeries:
+    """一个精度级别的环形缓冲区（时间戳 + 每个指标的平均值和最大值）"""
+
+    def __init__(self, resolution: int, capacity: int):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.avg = np.full((capacity, len(METRICS)), np.nan, dtype=np.float64)
+        self.max = np.full((capacity, len(METRICS)), np.nan, dtype=np.float64)
+        self.count = 0
+        self._next = 0
+        # 正在累积的时间桶（由上一级降采样而来）
+        self._bucket: Optional[int] = None
+        self._sum = np.zeros(len(METRICS))
+        self._weight = np.zeros(len(METRICS))
+        self._peak = np.full(len(METRICS), np.nan)
+
+    def append(self, timestamp: int, avg: np.ndarray, peak: np.ndarray):
+        i = self._next
+        self.timestamps[i] = timestamp
+        self.avg[i] = avg
+        self.max[i] = peak
+        self._next = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def accumulate(self, timestamp: int, avg: np.ndarray, peak: np.ndarray, weight: float = 1.0) \
+            -> Optional[Tuple[int, np.ndarray, np.ndarray, float]]:
+        """
+        把上一级的一条记录累积到当前时间桶（weight 为该记录包含的原始采样数）
+        进入新的时间桶时写入上一个桶并返回它（用于继续向下一级降采样）
+        """
+        bucket = timestamp - timestamp % self.resolution
+        flushed = None
+        if self._bucket is not None and bucket != self._bucket:
+            flushed = self.flush()
+        self._bucket = bucket
+
+        valid = ~np.isnan(avg)
+        self._sum[valid] += avg[valid] * weight
+        self._weight[valid] += weight
+        self._peak = np.fmax(self._peak, peak)
+        return flushed
+
+    def flush(self) -> Optional[Tuple[int, np.ndarray, np.ndarray, float]]:
+        if self._bucket is None or not self._weight.any():
+            self._bucket = None
+            return None
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg = np.where(self._weight > 0, self._sum / self._weight, np.nan)
+        record = (self._bucket, avg, self._peak.copy(), float(self._weight.max()))
+        self.append(*record[:3])
+        self._bucket = None
+        self._sum[:] = 0
+        self._weight[:] = 0
+        self._peak[:] = np.nan
+        return record
+
+    def ordered(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """按时间顺序返回 (时间戳, 平均值, 最大值)"""
+        if self.count < self.capacity:
+            index = np.arange(self.count)
+        else:
+            index = (self._next + np.arange(self.capacity)) % self.capacity
+        return self.timestamps[index], self.avg[index], self.max[index]
+
+    @property
+    def oldest(self) -> Optional[int]:
+        if self.count == 0:
+            return None
+        return int(self.timestamps[0 if self.count < self.capacity else self._next])
+
+
+class ResourceHistory:
+    """进程树资源采样与多级历史"""
+
+    def __init__(self):
+        self.app = None
+        self.levels: Dict[int, RingSeries] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._root: Optional[psutil.Process] = None
+        self._tree: List[psutil.Process] = []
+        self._tree_refreshed = 0.0
+        self._last_totals: Optional[Tuple[float, frozenset, np.ndarray]] = None
+        self._last_save = 0.0
+        self._reset_levels()
+
+    def _reset_levels(self):
+        capacities = {
+            1: Config.RESOURCE_HISTORY_SECONDS,
+            60: Config.RESOURCE_HISTORY_MINUTES,
+            3600: Config.RESOURCE_HISTORY_HOURS,
+        }
+        self.levels = {resolution: RingSeries(resolution, max(capacities[resolution], 1)) for _, resolution in LEVELS}
+
+    def init_app(self, app):
+        """加载保存的历史并启动采样线程（采样间隔为0时禁用）"""
+        self.app = app
+        if Config.RESOURCE_SAMPLE_INTERVAL <= 0:
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self.load()
+        atexit.register(self.save)
+        self._thread = threading.Thread(target=self._run, name='resource-history', daemon=True)
+        self._thread.start()
+
+    # ---------- 采样 ----------
+
+    def _process_tree(self) -> List[psutil.Process]:
+        """服务器进程及其子进程（子进程列表定期刷新）"""
+        from app.server_manager import ServerManager
+
+        pid = ServerManager.get_server_pid()
+        if pid is None:
+            self._root, self._tree = None, []
+            return []
+        try:
+            now = time.monotonic()
+            if self._root is None or self._root.pid != pid or not self._root.is_running():
+                self._root = psutil.Process(pid)
+                self._tree_refreshed = 0.0
+            if now - self._tree_refreshed >= TREE_REFRESH_INTERVAL:
+                # 复用已有的 Process 对象，cpu_percent 依赖上一次调用的基准
+                known = {proc.pid: proc for proc in self._tree}
+                children = [known[c.pid] if known.get(c.pid) == c else c for c in self._root.children(recursive=True)]
+                self._tree = [self._root] + children
+                self._tree_refreshed = now
+        except psutil.NoSuchProcess:
+            self._root, self._tree = None, []
+        return self._tree
+
+    def sample(self) -> Optional[np.ndarray]:
+        """采样一次进程树的资源占用，服务器未运行时返回None"""
+        tree = self._process_tree()
+        if not tree:
+            self._last_totals = None
+            return None
+
+        values = np.zeros(len(METRICS))
+        # 累计值：读字节、写字节、上下文切换
+        totals = np.zeros(3)
+        alive = []
+        for proc in tree:
+            try:
+                with proc.oneshot():
+                    cpu = proc.cpu_percent(None)
+                    rss = proc.memory_info().rss
+                    threads = proc.num_threads()
+                    try:
+                        fds = proc.num_fds()
+                    except (psutil.AccessDenied, AttributeError):
+                        fds = np.nan
+                    try:
+                        io = proc.io_counters()
+                        read_bytes, write_bytes = io.read_bytes, io.write_bytes
+                    except (psutil.AccessDenied, AttributeError):
+                        read_bytes = write_bytes = np.nan
+                    ctx = proc.num_ctx_switches()
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                continue
+            values[0] += cpu
+            values[1] += rss / 1024 / 1024
+            values[2] += threads
+            values[3] += fds
+            totals += (read_bytes, write_bytes, ctx.voluntary + ctx.involuntary)
+            alive.append(proc.pid)
+
+        if not alive:
+            self._tree_refreshed = 0.0
+            self._last_totals = None
+            return None
+        if len(alive) != len(tree):
+            # 有子进程退出，下次采样时重新获取子进程列表
+            self._tree_refreshed = 0.0
+
+        # 速率 = 累计值的差 / 时间差；进程树变化时累计值不可比，本次速率为空
+        now = time.monotonic()
+        members = frozenset(alive)
+        values[4:] = np.nan
+        if self._last_totals is not None:
+            last_time, last_members, last_totals = self._last_totals
+            if members == last_members and now > last_time:
+                values[4:] = np.maximum(totals - last_totals, 0) / (now - last_time)
+        self._last_totals = (now, members, totals)
+        return values
+
+    def record(self, values: np.ndarray, timestamp: Optional[int] = None):
+        """写入1秒级别并逐级降采样"""
+        timestamp = int(timestamp or time.time())
+        with self._lock:
+            self.levels[1].append(timestamp, values, values)
+            record = (timestamp, values, values, 1.0)
+            for _, resolution in LEVELS[1:]:
+                record = self.levels[resolution].accumulate(*record)
+                if record is None:
+                    break
+
+    def _run(self):
+        interval = Config.RESOURCE_SAMPLE_INTERVAL
+        next_run = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                values = self.sample()
+                if values is not None:
+                    self.record(values)
+            except Exception as e:
+                print(f"Error sampling resource usage: {e}")
+
+            if time.monotonic() - self._last_save >= SAVE_INTERVAL:
+                self.save()
+
+            # 按固定节拍采样，不因采样耗时产生漂移
+            next_run += interval
+            delay = next_run - time.monotonic()
+            if delay < 0:
+                next_run = time.monotonic()
+                delay = 0
+            self._stop_event.wait(delay)
+
+    # ---------- 持久化 ----------
+
+    def save(self):
+        """原子保存所有级别到文件"""
+        path: Path = Config.RESOURCE_HISTORY_FILE
+        with self._lock:
+            arrays = {'metrics': np.array(METRICS)}
+            for _, resolution in LEVELS:
+                timestamps, avg, peak = self.levels[resolution].ordered()
+                arrays[f'ts_{resolution}'] = timestamps
+                arrays[f'avg_{resolution}'] = avg
+                arrays[f'max_{resolution}'] = peak
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=f'.{path.name}.', suffix='.tmp', dir=str(path.parent))
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.savez_compressed(f, **arrays)
+                os.replace(tmp_path, path)
+            except Exception:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+        except Exception as e:
+            print(f"Error saving resource history: {e}")
+        self._last_save = time.monotonic()
+
+    def load(self):
+        """从文件恢复历史（指标不一致或文件损坏时忽略）"""
+        path: Path = Config.RESOURCE_HISTORY_FILE
+        if not path.exists():
+            return
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if tuple(data['metrics'].tolist()) != METRICS:
+                    print("资源历史文件的指标与当前版本不一致，已忽略")
+                    return
+                with self._lock:
+                    self._reset_levels()
+                    for _, resolution in LEVELS:
+                        level = self.levels[resolution]
+                        timestamps = data[f'ts_{resolution}'][-level.capacity:]
+                        avg = data[f'avg_{resolution}'][-level.capacity:]
+                        peak = data[f'max_{resolution}'][-level.capacity:]
+                        for i in range(len(timestamps)):
+                            level.append(int(timestamps[i]), avg[i], peak[i])
+        except Exception as e:
+            print(f"Error loading resource history: {e}")
+
+    # ---------- 查询 ----------
+
+    def _pick_resolution(self, start: int) -> int:
+        """覆盖起始时间的最高精度级别"""
+        for _, resolution in LEVELS:
+            oldest = self.levels[resolution].oldest
+            if oldest is not None and oldest <= start:
+                return resolution
+        return LEVELS[-1][1]
+
+    def query(self, start: int, end: int, resolution: Optional[int] = None,
+              metrics: Optional[List[str]] = None) -> Dict:
+        """
+        返回时间范围内的历史（列式JSON）
+
+        Args:
+            start/end: UTC时间戳（秒）
+            resolution: 1 / 60 / 3600，默认选择能覆盖起始时间的最高精度
+            metrics: 需要的指标，默认全部
+        """
+        names = [m for m in (metrics or METRICS) if m in METRICS]
+        columns = [METRICS.index(m) for m in names]
+        with self._lock:
+            if resolution not in self.levels:
+                resolution = self._pick_resolution(start)
+            timestamps, avg, peak = self.levels[resolution].ordered()
+            mask = (timestamps >= start) & (timestamps < end)
+            timestamps, avg, peak = timestamps[mask], avg[mask][:, columns], peak[mask][:, columns]
+
+        def column(values: np.ndarray) -> List[Optional[float]]:
+            rounded = np.round(values, 2)
+            return [None if np.isnan(v) else float(v) for v in rounded]
+
+        result = {
+            'resolution': resolution,
+            'start': start,
+            'end': end,
+            'timestamps': timestamps.tolist(),
+            'avg': {name: column(avg[:, i]) for i, name in enumerate(names)},
+        }
+        # 1秒级别的平均值即原始值
+        if resolution != 1:
+            result['max'] = {name: column(peak[:, i]) for i, name in enumerate(names)}
+        return result
+
+
+# 全局资源历史实例
+resource_history = ResourceHistory()
@@ -1,30 +1,63 @@
-from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash, session
+from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash, session, Response, stream_with_context, abort
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.utils import secure_filename
 from pathlib import Path
 import os
+import time
 import uuid
 import traceback
 from app import db, limiter
-from app.models import Addon, User
+from app.models import Addon, User, Player
 from app.addon_manager import AddonManager
 from app.curseforge import CurseForgeAPI
-from app.server_manager import ServerManager
+from app import raknet
 from app.log_monitor import log_monitor
 from app.player_manager import PlayerManager
+from app.player_analytics import player_analytics
+from app.position_sampler import position_sampler
+from app.join_latency import join_latency
+from app.ban_manager import ban_list
+from app.player_identity import player_identity
+from app.access_manager import access_lists
+from app.event_hub import event_hub
+from app.status_sampler import status_sampler
+from app.lifecycle import lifecycle_worker, ACTIONS as LIFECYCLE_ACTIONS
+from app.instances import instance_registry, DEFAULT_INSTANCE_ID
+from app.server_readiness import server_readiness
+from app.server_shutdown import server_shutdown
+from app.watchdog import watchdog
+from app.resource_history import resource_history, METRICS as RESOURCE_METRICS
+from app.public_status import public_status
+from app.server_properties import server_properties
+from app.server_tuning import server_tuner
+from app import server_tuning
+from app import exporter
 from app.auth import login_required_api, validate_request_data
 from app.security import (
     sanitize_filename, validate_path, validate_file_extension,
     check_file_size, validate_uuid, validate_pack_type, sanitize_html
 )
 from config import Config
-from datetime import datetime
+from datetime import datetime, timedelta
 
 bp = Blueprint('main', __name__)
 
 def allowed_file(filename):
     return validate_file_extension(filename, Config.ALLOWED_EXTENSIONS)
 
+def parse_timestamp(value, default=None):
+    """解析查询参数中的时间（UTC时间戳秒数或ISO格式），返回整数时间戳"""
+    if value is None or value == '':
+        return default
+    try:
+        return int(float(value))
+    except ValueError:
+        pass
+    dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if dt.tzinfo is not None:
+        return int(dt.timestamp())
+    return int((dt - datetime(1970, 1, 1)).total_seconds())
+
 # 认证路由
 @bp.route('/login', methods=['GET', 'POST'])
 @limiter.limit("5 per minute")
@@ -80,7 +113,7 @@ def addons_page():
 @bp.route('/server')
 @login_required
 def server_page():
-    return render_template('server.html')
+    return render_template('server.html', instances=instance_registry.all())
 
 @bp.route('/logs')
 @login_required
@@ -388,43 +421,273 @@ def delete_addon(addon_id):
 @bp.route('/api/server/status', methods=['GET'])
 @login_required_api
 def server_status():
-    """获取服务器状态"""
-    status = ServerManager.get_server_status()
-    return jsonify(status)
+    """获取服务器状态（后台采样的最新快照）"""
+    return jsonify(status_sampler.get())
+
+@bp.route('/api/server/resources', methods=['GET'])
+@login_required_api
+def server_resources():
+    """
+    服务器进程树的资源历史（列式JSON）
+    参数: start/end（时间戳或ISO时间，默认最近1小时），resolution（1/60/3600，默认自动），
+    metrics（逗号分隔，默认全部）
+    """
+    now = int(time.time())
+    try:
+        end = parse_timestamp(request.args.get('end'), now)
+        start = parse_timestamp(request.args.get('start'), end - 3600)
+    except ValueError:
+        return jsonify({'success': False, 'message': '无效的时间参数'}), 400
+    if start >= end:
+        return jsonify({'success': False, 'message': '开始时间必须早于结束时间'}), 400
+    
+    resolution = request.args.get('resolution', type=int)
+    if resolution is not None and resolution not in resource_history.levels:
+        return jsonify({'success': False, 'message': '精度必须是 1、60 或 3600'}), 400
+    metrics = [m for m in request.args.get('metrics', '').split(',') if m] or None
+    if metrics and any(m not in RESOURCE_METRICS for m in metrics):
+        return jsonify({
+            'success': False,
+            'message': f"未知的指标，可选: {', '.join(RESOURCE_METRICS)}"
+        }), 400
+    
+    return jsonify({'success': True, **resource_history.query(start, end, resolution, metrics)})
+
+@bp.route('/api/server/ping', methods=['GET'])
+@login_required_api
+def ping_server():
+    """通过RakNet unconnected ping探测服务器（MOTD、版本、玩家数、响应时间）"""
+    return jsonify(raknet.ping())
+
+def _submit_lifecycle_job(action: str, instance_id: str = DEFAULT_INSTANCE_ID):
+    """提交启动/停止/重启任务，立即返回任务信息（进度通过 /api/server/jobs/<id> 查询）"""
+    job, created = lifecycle_worker.submit(action, current_user.username, instance_id)
+    message = '已加入队列' if created else '相同操作已在进行中'
+    return jsonify({'success': True, 'job': job.to_dict(), 'message': message}), 202
 
 @bp.route('/api/server/start', methods=['POST'])
 @login_required_api
 @limiter.limit("10 per hour")
 def start_server():
     """启动服务器"""
-    success, message = ServerManager.start_server()
-    if success:
-        return jsonify({'success': True, 'message': message})
-    else:
-        return jsonify({'success': False, 'message': message}), 400
+    return _submit_lifecycle_job('start')
 
 @bp.route('/api/server/stop', methods=['POST'])
 @login_required_api
 @limiter.limit("10 per hour")
 def stop_server():
     """停止服务器"""
-    success, message = ServerManager.stop_server()
+    return _submit_lifecycle_job('stop')
+
+@bp.route('/api/server/restart', methods=['POST'])
+@login_required_api
+@limiter.limit("10 per hour")
+def restart_server():
+    """重启服务器"""
+    return _submit_lifecycle_job('restart')
+
+@bp.route('/api/server/jobs', methods=['GET'])
+@login_required_api
+def list_server_jobs():
+    """最近的启动/停止/重启任务（instance 参数只返回该实例的任务）"""
+    return jsonify({'success': True, 'jobs': lifecycle_worker.list(request.args.get('instance'))})
+
+@bp.route('/api/server/jobs/<job_id>', methods=['GET'])
+@login_required_api
+def get_server_job(job_id):
+    """查询任务状态和进度"""
+    job = lifecycle_worker.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': '任务不存在'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@bp.route('/api/server/boots', methods=['GET'])
+@login_required_api
+def get_server_boots():
+    """最近的启动记录（耗时和结果）"""
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    return jsonify({'success': True, 'boots': server_readiness.history(limit)})
+
+@bp.route('/api/server/stops', methods=['GET'])
+@login_required_api
+def get_server_stops():
+    """最近的关闭记录（耗时和是否需要强制结束）"""
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    return jsonify({'success': True, 'stops': server_shutdown.history(limit)})
+
+@bp.route('/api/server/watchdog', methods=['GET'])
+@login_required_api
+def get_server_watchdog():
+    """看门狗状态和最近的记录（崩溃、自动重启、崩溃循环）"""
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    return jsonify({
+        'success': True,
+        'watchdog': watchdog.state(DEFAULT_INSTANCE_ID),
+        'events': watchdog.history(DEFAULT_INSTANCE_ID, limit)
+    })
+
+# API路由 - 多个服务器实例（不带实例ID的服务器接口对应默认实例）
+def _instance_not_found():
+    return jsonify({'success': False, 'message': '服务器实例不存在'}), 404
+
+@bp.route('/api/instances', methods=['GET'])
+@login_required_api
+def list_instances():
+    """所有服务器实例及其最新状态"""
+    instances = [
+        {**instance.to_dict(), 'status': status_sampler.get(instance.id)}
+        for instance in instance_registry.all()
+    ]
+    return jsonify({'success': True, 'instances': instances})
+
+@bp.route('/api/instances/<instance_id>/server/status', methods=['GET'])
+@login_required_api
+def instance_status(instance_id):
+    """实例的服务器状态（后台采样的最新快照）"""
+    status = status_sampler.get(instance_id)
+    if status is None:
+        return _instance_not_found()
+    return jsonify(status)
+
+@bp.route('/api/instances/<instance_id>/server/<action>', methods=['POST'])
+@login_required_api
+@limiter.limit("10 per hour")
+def instance_lifecycle(instance_id, action):
+    """启动/停止/重启实例的服务器"""
+    if instance_registry.get(instance_id) is None:
+        return _instance_not_found()
+    if action not in LIFECYCLE_ACTIONS:
+        return jsonify({'success': False, 'message': f'未知的操作: {action}'}), 404
+    return _submit_lifecycle_job(action, instance_id)
+
+@bp.route('/api/instances/<instance_id>/server/boots', methods=['GET'])
+@login_required_api
+def instance_boots(instance_id):
+    """实例最近的启动记录"""
+    instance = instance_registry.get(instance_id)
+    if instance is None:
+        return _instance_not_found()
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    return jsonify({'success': True, 'boots': instance.readiness.history(limit)})
+
+@bp.route('/api/instances/<instance_id>/server/stops', methods=['GET'])
+@login_required_api
+def instance_stops(instance_id):
+    """实例最近的关闭记录"""
+    instance = instance_registry.get(instance_id)
+    if instance is None:
+        return _instance_not_found()
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    return jsonify({'success': True, 'stops': instance.shutdown.history(limit)})
+
+@bp.route('/api/instances/<instance_id>/server/watchdog', methods=['GET'])
+@login_required_api
+def instance_watchdog(instance_id):
+    """实例的看门狗状态和最近的记录"""
+    instance = instance_registry.get(instance_id)
+    if instance is None:
+        return _instance_not_found()
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    return jsonify({
+        'success': True,
+        'watchdog': watchdog.state(instance.id),
+        'events': watchdog.history(instance.id, limit)
+    })
+
+@bp.route('/api/instances/<instance_id>/logs', methods=['GET'])
+@login_required_api
+def instance_logs(instance_id):
+    """实例的服务器日志"""
+    instance = instance_registry.get(instance_id)
+    if instance is None:
+        return _instance_not_found()
+    lines = request.args.get('lines', 100, type=int)
+    return jsonify({'logs': instance.log_monitor.get_logs(lines)})
+
+@bp.route('/api/instances/<instance_id>/command', methods=['POST'])
+@login_required_api
+@limiter.limit("30 per minute")
+def instance_command(instance_id):
+    """向实例的服务器发送命令"""
+    instance = instance_registry.get(instance_id)
+    if instance is None:
+        return _instance_not_found()
+    return _send_command(instance.player_manager)
+
+# API路由 - 服务器配置与自动调优
+@bp.route('/api/server/properties', methods=['GET'])
+@login_required_api
+def get_server_properties():
+    """读取 server.properties"""
+    if not server_properties.exists():
+        return jsonify({'success': False, 'message': f'配置文件不存在: {server_properties.path}'}), 404
+    return jsonify({'success': True, 'properties': server_properties.as_dict()})
+
+@bp.route('/api/server/properties', methods=['PUT'])
+@login_required_api
+@limiter.limit("30 per minute")
+def update_server_properties():
+    """修改 server.properties（JSON: 键 -> 值），重启服务器后生效"""
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data, dict):
+        return jsonify({'success': False, 'message': '缺少请求数据'}), 400
+    
+    success, message = server_tuner.apply_changes(data, 'manual', created_by=current_user.username)
     if success:
         return jsonify({'success': True, 'message': message})
     else:
         return jsonify({'success': False, 'message': message}), 400
 
-@bp.route('/api/server/restart', methods=['POST'])
+@bp.route('/api/server/autotune', methods=['GET'])
+@login_required_api
+def get_server_autotune():
+    """自动调优状态：当前值、建议和修改记录（含修改前后的负载指标）"""
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+    return jsonify({
+        'success': True,
+        'mode': Config.AUTOTUNE_MODE,
+        'current': {key: server_properties.get(key) for key in server_tuning.TUNED_PROPERTIES},
+        'recommendation': server_tuner.recommend(),
+        'history': server_tuner.history(limit)
+    })
+
+@bp.route('/api/server/autotune/apply', methods=['POST'])
 @login_required_api
 @limiter.limit("10 per hour")
-def restart_server():
-    """重启服务器"""
-    success, message = ServerManager.restart_server()
+def apply_server_autotune():
+    """立即写入当前建议（下一次启动服务器时生效）"""
+    success, message = server_tuner.apply_recommendation(created_by=current_user.username)
     if success:
         return jsonify({'success': True, 'message': message})
     else:
         return jsonify({'success': False, 'message': message}), 400
 
+# API路由 - 公开状态（无需登录）
+def _public_response(body: bytes, etag: str, mimetype: str):
+    """返回预先生成的公开状态内容，支持 If-None-Match 条件请求"""
+    if not Config.PUBLIC_STATUS_ENABLED:
+        abort(404)
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = int(Config.PUBLIC_STATUS_INTERVAL)
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    return response.make_conditional(request)
+
+@bp.route('/api/public/status', methods=['GET'])
+@limiter.exempt
+def public_server_status():
+    """公开的服务器状态（在线、玩家数、MOTD），来自后台刷新的快照"""
+    snapshot = public_status.snapshot
+    return _public_response(snapshot.json_body, snapshot.json_etag, 'application/json')
+
+@bp.route('/api/public/badge.svg', methods=['GET'])
+@limiter.exempt
+def public_server_badge():
+    """公开的服务器状态徽章（SVG）"""
+    snapshot = public_status.snapshot
+    return _public_response(snapshot.badge_body, snapshot.badge_etag, 'image/svg+xml')
+
 # API路由 - 日志
 @bp.route('/api/logs', methods=['GET'])
 @login_required_api
@@ -453,6 +716,101 @@ def stream_logs():
     """流式传输日志（SSE）"""
     return log_monitor.stream_logs()
 
+# API路由 - 白名单与权限
+def _access_payload():
+    """从请求中读取导入数据（JSON，或上传/提交的CSV）"""
+    upload = request.files.get('file')
+    if upload is not None:
+        return access_lists.parse_csv(upload.read().decode('utf-8-sig'))
+    if request.mimetype == 'text/csv':
+        return access_lists.parse_csv(request.get_data(as_text=True))
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or ('allowlist' not in data and 'permissions' not in data):
+        raise ValueError('需要 allowlist 和/或 permissions 列表，或CSV文件')
+    return {key: data[key] for key in ('allowlist', 'permissions') if key in data}
+
+@bp.route('/api/access', methods=['GET'])
+@login_required_api
+def get_access_lists():
+    """获取当前的白名单和权限列表"""
+    try:
+        return jsonify({'success': True, **access_lists.get_lists()})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@bp.route('/api/access/diff', methods=['POST'])
+@login_required_api
+@limiter.limit("30 per minute")
+def diff_access_lists():
+    """预览批量导入白名单/权限会产生的变更"""
+    mode = request.args.get('mode', 'merge')
+    try:
+        diff = access_lists.diff(_access_payload(), mode)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({'success': True, 'diff': diff})
+
+@bp.route('/api/access/apply', methods=['POST'])
+@login_required_api
+@limiter.limit("10 per minute")
+def apply_access_lists():
+    """批量导入白名单/权限：原子写入文件并重新加载"""
+    mode = request.args.get('mode', 'merge')
+    try:
+        success, message, diff = access_lists.apply(_access_payload(), mode)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if success:
+        status = 200
+    else:
+        status = 400 if diff.get('errors') else 500
+    return jsonify({'success': success, 'message': message, 'diff': diff}), status
+
+# API路由 - 数据导出
+@bp.route('/api/export/<dataset>', methods=['GET'])
+@login_required_api
+@limiter.limit("10 per minute")
+def export_data(dataset):
+    """流式导出玩家会话、日志记录或addon清单（CSV / NDJSON，可选gzip）"""
+    if dataset not in exporter.DATASETS:
+        return jsonify({'success': False, 'message': f'未知的导出数据: {dataset}'}), 404
+    
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in exporter.FORMATS:
+        return jsonify({'success': False, 'message': '格式必须是 csv 或 ndjson'}), 400
+    
+    try:
+        start = parse_timestamp(request.args.get('start'))
+        end = parse_timestamp(request.args.get('end'))
+    except ValueError:
+        return jsonify({'success': False, 'message': '时间参数格式无效'}), 400
+    
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    iter_rows, fields = exporter.DATASETS[dataset]
+    chunks = exporter.encode(iter_rows(start, end), fields, fmt, compress)
+    
+    filename = f"{dataset}-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{fmt}"
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    headers = {'X-Accel-Buffering': 'no'}
+    if compress and 'gzip' in request.headers.get('Accept-Encoding', ''):
+        # 客户端支持时作为传输编码，下载后得到未压缩的文件
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+    elif compress:
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+# API路由 - 页面事件推送
+@bp.route('/api/events')
+@login_required_api
+def stream_events():
+    """页面事件通道（SSE），topics 为逗号分隔的 status / players / logs / addons"""
+    topics = [t.strip() for t in request.args.get('topics', '').split(',') if t.strip()]
+    return event_hub.stream(topics)
+
 # API路由 - 玩家管理
 @bp.route('/api/players', methods=['GET'])
 @login_required_api
@@ -467,6 +825,55 @@ def get_players():
         'players': players
     })
 
+@bp.route('/api/players/stats', methods=['GET'])
+@login_required_api
+@limiter.limit("60 per minute")
+def get_player_stats():
+    """获取玩家统计（游戏时长、日活跃、同时在线曲线、高峰时段）"""
+    try:
+        end = parse_timestamp(request.args.get('end'), int(time.time()))
+        start = parse_timestamp(request.args.get('start'), end - int(timedelta(days=7).total_seconds()))
+        bucket = request.args.get('bucket', type=int)
+        limit = min(request.args.get('limit', 50, type=int), 1000)
+    except ValueError:
+        return jsonify({'success': False, 'message': '时间参数格式无效'}), 400
+    
+    try:
+        stats = player_analytics.get_stats(start, end, bucket=bucket, limit=limit)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    return jsonify({'success': True, **stats})
+
+@bp.route('/api/players/identity', methods=['GET'])
+@login_required_api
+def get_player_identity():
+    """按名称或xuid查找玩家身份（当前名称、曾用名、首次/最近出现时间）"""
+    name = request.args.get('name', '').strip()
+    xuid = request.args.get('xuid', '').strip()
+    if not name and not xuid:
+        return jsonify({'success': False, 'message': '需要玩家名称或xuid'}), 400
+    
+    ref = player_identity.resolve(name=name, xuid=xuid, previous_names=True)
+    player = Player.query.get(ref.id) if ref else None
+    if player is None:
+        return jsonify({'success': False, 'message': '未找到该玩家'}), 404
+    return jsonify({'success': True, 'player': player.to_dict()})
+
+@bp.route('/api/players/heatmap', methods=['GET'])
+@login_required_api
+def get_player_heatmap():
+    """获取玩家位置的区块热力图"""
+    dimension = request.args.get('dimension', type=int)
+    return jsonify({'success': True, **position_sampler.get_heatmap(dimension)})
+
+@bp.route('/api/players/join-latency', methods=['GET'])
+@login_required_api
+def get_join_latency():
+    """获取玩家加入耗时直方图（连接到生成）"""
+    days = max(1, min(request.args.get('days', 30, type=int), 365))
+    return jsonify({'success': True, **join_latency.get_stats(days)})
+
 @bp.route('/api/players/invincible', methods=['POST'])
 @login_required_api
 @limiter.limit("30 per minute")
@@ -516,6 +923,10 @@ def kick_player():
 @limiter.limit("30 per minute")
 def send_server_command():
     """发送服务器命令"""
+    return _send_command(PlayerManager)
+
+def _send_command(player_manager):
+    """检查并发送请求中的命令"""
     data = request.get_json()
     if not data:
         return jsonify({'success': False, 'message': '缺少请求数据'}), 400
@@ -535,13 +946,91 @@ def send_server_command():
             'message': f'命令 "{cmd_lower}" 被禁止，请使用服务器控制页面'
         }), 403
     
-    success, message = PlayerManager.send_command(command)
+    success, message = player_manager.send_command(command)
     
     if success:
         return jsonify({'success': True, 'message': message})
     else:
         return jsonify({'success': False, 'message': message}), 400
 
+@bp.route('/api/players/bulk', methods=['POST'])
+@login_required_api
+@limiter.limit("30 per minute")
+def bulk_player_action():
+    """批量玩家操作（kick / effect / tp / give / message）"""
+    data = request.get_json()
+    if not data:
+        return jsonify({'success': False, 'message': '缺少请求数据'}), 400
+    
+    action = str(data.get('action', '')).strip().lower()
+    players = data.get('players')
+    selector = data.get('selector')
+    params = data.get('params') or {}
+    
+    if action not in PlayerManager.BULK_ACTIONS:
+        return jsonify({'success': False, 'message': f'不支持的操作: {action}'}), 400
+    if players is not None and not isinstance(players, list):
+        return jsonify({'success': False, 'message': 'players 必须是列表'}), 400
+    if not isinstance(params, dict):
+        return jsonify({'success': False, 'message': 'params 必须是对象'}), 400
+    if not players and not selector:
+        return jsonify({'success': False, 'message': '缺少目标玩家'}), 400
+    
+    success, message, results = PlayerManager.bulk_action(action, players=players, selector=selector, params=params)
+    
+    return jsonify({
+        'success': success,
+        'message': message,
+        'results': results
+    }), 200 if success else 400
+
+@bp.route('/api/players/bans', methods=['GET'])
+@login_required_api
+def get_bans():
+    """获取封禁列表"""
+    include_expired = request.args.get('all', '').lower() in ('1', 'true')
+    bans = ban_list.list_bans(include_expired=include_expired)
+    return jsonify({'success': True, 'bans': [ban.to_dict() for ban in bans]})
+
+@bp.route('/api/players/bans', methods=['POST'])
+@login_required_api
+@limiter.limit("30 per minute")
+def add_ban():
+    """封禁玩家（可选到期时间）"""
+    data = request.get_json()
+    if not data:
+        return jsonify({'success': False, 'message': '缺少请求数据'}), 400
+    
+    duration = data.get('duration')
+    try:
+        duration = int(duration) if duration else None
+    except (ValueError, TypeError):
+        return jsonify({'success': False, 'message': '封禁时长必须是秒数'}), 400
+    
+    success, message, ban = ban_list.ban(
+        player_name=str(data.get('player', '')),
+        xuid=str(data.get('xuid', '')),
+        reason=str(data.get('reason', '')),
+        duration=duration,
+        created_by=current_user.username
+    )
+    
+    if success:
+        return jsonify({'success': True, 'message': message, 'ban': ban.to_dict()})
+    else:
+        return jsonify({'success': False, 'message': message}), 400
+
+@bp.route('/api/players/bans/<int:ban_id>', methods=['DELETE'])
+@login_required_api
+@limiter.limit("30 per minute")
+def remove_ban(ban_id):
+    """解除封禁"""
+    success, message = ban_list.unban(ban_id)
+    if success:
+        return jsonify({'success': True, 'message': message})
+    else:
+        return jsonify({'success': False, 'message': message}), 404
+
 @bp.route('/api/players/message', methods=['POST'])
 @login_required_api
 @limiter.limit("20 per minute")
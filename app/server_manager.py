@@ -1,124 +1,211 @@
-import os
 import signal
 import subprocess
+import threading
 import psutil
 import time
 from pathlib import Path
-from typing import Dict, Optional, Tuple, List
+from typing import Callable, Dict, Optional, Tuple, List
 from config import Config
+from app import raknet
+from app.service_backend import SystemdBackend, get_backend
+from app.process_discovery import process_discovery
+from app.server_supervisor import server_supervisor
 
 class ServerManager:
     """管理Bedrock服务器进程"""
     
     PID_FILE = Path('/tmp/bedrock_server.pid')
-    SYSTEMD_SERVICE = 'bedrock.service'
+    SYSTEMD_SERVICE: Optional[str] = 'bedrock.service'  # None 表示不使用systemd
     
-    @staticmethod
-    def get_server_status() -> Dict:
-        """获取服务器状态"""
-        # 自动清理孤立进程
-        cleaned_count, _ = ServerManager.cleanup_orphaned_processes()
+    # 以下属性由 app.instances 为每个服务器实例创建的子类覆盖
+    INSTANCE_ID = 'default'
+    SERVER_ADDRESS = Config.BEDROCK_SERVER_ADDRESS
+    SERVER_PORT = Config.BEDROCK_SERVER_PORT
+    # 查找进程时匹配的命令行（多个实例时为可执行文件的完整路径）
+    PROCESS_NAME = 'bedrock_server'
+    # 只有默认实例使用 server.properties 自动调优
+    AUTOTUNE = True
+    supervisor = server_supervisor
+    readiness = None  # None 表示全局的 server_readiness
+    shutdown = None  # None 表示全局的 server_shutdown
+    player_manager = None  # None 表示 PlayerManager
+    
+    # 上一次测量CPU的进程（cpu_percent 返回距上次调用的平均值，不需要阻塞等待）
+    _process: Optional[psutil.Process] = None
+    # 当前线程中执行的生命周期任务的进度回调（由生命周期工作线程设置）
+    _progress = threading.local()
+    
+    @classmethod
+    def set_progress_callback(cls, callback: Optional[Callable[[str], None]]):
+        cls._progress.callback = callback
+    
+    @classmethod
+    def _report(cls, step: str):
+        """报告启动/停止/重启的进度（不在生命周期任务中执行时忽略）"""
+        callback = getattr(cls._progress, 'callback', None)
+        if callback is not None:
+            callback(step)
+    
+    @classmethod
+    def get_server_status(cls, cleanup: bool = True) -> Dict:
+        """
+        获取服务器状态
+        
+        Args:
+            cleanup: 是否先清理孤立进程（后台状态采样按单独的间隔清理，不在每次采样时执行）
+        """
+        cleaned_count = 0
+        if cleanup:
+            cleaned_count, _ = cls.cleanup_orphaned_processes()
         
-        pid = ServerManager.get_server_pid()
+        pid = cls.get_server_pid()
         
         if pid is None:
             return {
                 'running': False,
+                'ready': False,
                 'pid': None,
                 'status': 'stopped',
-                'managed_by': 'systemd' if ServerManager.is_systemd_available() else 'manual'
+                'managed_by': 'systemd' if cls.is_systemd_available() else 'manual'
             }
         
         try:
-            process = psutil.Process(pid)
-            is_systemd = ServerManager.is_systemd_managed()
-            return {
+            process = cls._process
+            if process is None or process.pid != pid or not process.is_running():
+                process = psutil.Process(pid)
+                # 第一次测量需要一个短暂的基准区间
+                cpu_percent = process.cpu_percent(interval=0.1)
+                cls._process = process
+            else:
+                cpu_percent = process.cpu_percent(interval=None)
+            is_systemd = cls.is_systemd_managed()
+            status = {
                 'running': True,
                 'pid': pid,
                 'status': 'running',
-                'cpu_percent': process.cpu_percent(interval=0.1),
+                'cpu_percent': cpu_percent,
                 'memory_mb': process.memory_info().rss / 1024 / 1024,
                 'create_time': process.create_time(),
                 'managed_by': 'systemd' if is_systemd else 'manual',
                 'cleaned_orphans': cleaned_count
             }
+            systemd_state = cls.systemd().state() if is_systemd else None
+            if systemd_state is not None:
+                status['systemd'] = systemd_state.to_dict()
+            status.update(cls.probe())
+            # 进程存在不代表已完成启动：日志出现 "Server started."（或已能响应ping）才算就绪
+            readiness = cls._readiness()
+            status['ready'] = readiness.is_ready(pid) or status['accepting_players']
+            if not status['ready']:
+                status['status'] = 'starting'
+            status.update(readiness.last_ready(pid) or {})
+            if cls._shutdown().is_stopping(pid):
+                status['status'] = 'stopping'
+            return status
         except psutil.NoSuchProcess:
             # PID文件存在但进程不存在
-            ServerManager.PID_FILE.unlink(missing_ok=True)
+            cls.PID_FILE.unlink(missing_ok=True)
             return {
                 'running': False,
+                'ready': False,
                 'pid': None,
                 'status': 'stopped',
-                'managed_by': 'systemd' if ServerManager.is_systemd_available() else 'manual'
+                'managed_by': 'systemd' if cls.is_systemd_available() else 'manual'
             }
         except Exception as e:
             return {
                 'running': False,
+                'ready': False,
                 'pid': None,
                 'status': 'error',
                 'error': str(e),
-                'managed_by': 'systemd' if ServerManager.is_systemd_available() else 'manual'
+                'managed_by': 'systemd' if cls.is_systemd_available() else 'manual'
             }
     
-    @staticmethod
-    def is_systemd_managed() -> bool:
+    @classmethod
+    def probe(cls) -> Dict:
+        """通过RakNet ping检查服务器是否在接受玩家连接"""
+        pong = raknet.ping(cls.SERVER_ADDRESS, cls.SERVER_PORT)
+        if not pong['online']:
+            return {'accepting_players': False, 'ping_error': pong['error']}
+        return {
+            'accepting_players': True,
+            'ping_ms': pong['latency_ms'],
+            'motd': pong.get('motd'),
+            'level_name': pong.get('level_name'),
+            'version': pong.get('version'),
+            'protocol': pong.get('protocol'),
+            'players_online': pong.get('players_online'),
+            'players_max': pong.get('players_max')
+        }
+    
+    @classmethod
+    def _before_start(cls):
+        """启动服务器前的准备（写入待生效的自动调优建议）"""
+        from app.server_tuning import server_tuner
+        if not cls.AUTOTUNE:
+            return
+        cls._report('应用自动调优')
+        server_tuner.before_start()
+    
+    @classmethod
+    def _readiness(cls):
+        if cls.readiness is not None:
+            return cls.readiness
+        from app.server_readiness import server_readiness
+        return server_readiness
+    
+    @classmethod
+    def _shutdown(cls):
+        if cls.shutdown is not None:
+            return cls.shutdown
+        from app.server_shutdown import server_shutdown
+        return server_shutdown
+    
+    @classmethod
+    def _wait_until_ready(cls, attempt) -> Tuple[bool, str]:
+        """等待日志出现 "Server started."（或失败、进程退出、超时）"""
+        cls._report('等待服务器就绪')
+        return cls._readiness().wait(attempt, cls.get_server_pid)
+    
+    @classmethod
+    def systemd(cls) -> SystemdBackend:
+        """服务器systemd单元的状态缓存"""
+        return get_backend(cls.SYSTEMD_SERVICE)
+    
+    @classmethod
+    def is_systemd_managed(cls) -> bool:
         """检查服务器是否由systemd管理"""
-        try:
-            result = subprocess.run(
-                ['systemctl', 'is-active', ServerManager.SYSTEMD_SERVICE],
-                capture_output=True,
-                text=True,
-                timeout=2
-            )
-            # 接受 active 或 activating 状态
-            status = result.stdout.strip()
-            return status in ('active', 'activating')
-        except (subprocess.TimeoutExpired, FileNotFoundError):
-            return False
+        return bool(cls.SYSTEMD_SERVICE) and cls.systemd().is_active()
     
-    @staticmethod
-    def find_all_bedrock_processes() -> List[Dict]:
-        """查找所有bedrock_server进程"""
-        processes = []
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline', 'ppid', 'create_time']):
-            try:
-                cmdline = proc.info.get('cmdline', [])
-                if cmdline and 'bedrock_server' in ' '.join(cmdline):
-                    processes.append({
-                        'pid': proc.info['pid'],
-                        'ppid': proc.info.get('ppid'),
-                        'cmdline': ' '.join(cmdline),
-                        'create_time': proc.info.get('create_time', 0)
-                    })
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-        return processes
+    @classmethod
+    def find_all_bedrock_processes(cls) -> List[Dict]:
+        """查找所有bedrock_server进程（扫描/proc，结果按 (pid, 启动时间) 缓存）"""
+        return process_discovery.find(cls.PROCESS_NAME)
     
-    @staticmethod
-    def cleanup_orphaned_processes() -> Tuple[int, List[int]]:
+    @classmethod
+    def cleanup_orphaned_processes(cls) -> Tuple[int, List[int]]:
         """清理孤立的bedrock_server进程（非systemd管理的）"""
         cleaned_pids = []
-        all_processes = ServerManager.find_all_bedrock_processes()
+        all_processes = cls.find_all_bedrock_processes()
         
         # 如果systemd服务正在运行，获取systemd管理的PID
         systemd_pid = None
-        if ServerManager.is_systemd_managed():
-            try:
-                result = subprocess.run(
-                    ['systemctl', 'show', '--property=MainPID', '--value', ServerManager.SYSTEMD_SERVICE],
-                    capture_output=True,
-                    text=True,
-                    timeout=2
-                )
-                if result.returncode == 0 and result.stdout.strip():
-                    systemd_pid = int(result.stdout.strip())
-            except (subprocess.TimeoutExpired, ValueError, FileNotFoundError):
-                pass
+        if cls.is_systemd_managed():
+            systemd_pid = cls.systemd().main_pid()
         
         for proc_info in all_processes:
             pid = proc_info['pid']
             ppid = proc_info.get('ppid')
             
+            # 包装进程（shell、screen 等）只是命令行包含服务器路径，不能结束
+            if proc_info.get('wrapper'):
+                continue
+            
+            # 跳过管理器自己启动并托管的进程
+            if cls.supervisor.owns(pid):
+                continue
+            
             # 跳过systemd管理的进程（包括直接由systemd启动的wrapper及其子进程）
             if systemd_pid:
                 # 如果进程本身就是systemd MainPID，跳过
@@ -129,13 +216,17 @@ class ServerManager:
                     continue
             
             # 检查是否是systemd的子进程（父进程是init/systemd）
-            try:
-                parent = psutil.Process(pid).parent()
-                # systemd的PID通常是1，或者父进程是systemd
-                if parent.pid == 1 or 'systemd' in parent.name().lower():
-                    continue
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                pass
+            # systemd的PID通常是1，或者父进程是systemd
+            if ppid == 1:
+                continue
+            parent_name = proc_info.get('parent_name')
+            if parent_name is None:
+                try:
+                    parent_name = psutil.Process(ppid).name() if ppid else ''
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    parent_name = ''
+            if 'systemd' in parent_name.lower():
+                continue
             
             # 清理孤立进程
             try:
@@ -151,244 +242,250 @@ class ServerManager:
                 pass
         
         # 清理PID文件（如果存在且对应的进程已被清理）
-        if ServerManager.PID_FILE.exists():
+        if cls.PID_FILE.exists():
             try:
-                pid_from_file = int(ServerManager.PID_FILE.read_text().strip())
+                pid_from_file = int(cls.PID_FILE.read_text().strip())
                 if pid_from_file in cleaned_pids or not psutil.pid_exists(pid_from_file):
-                    ServerManager.PID_FILE.unlink(missing_ok=True)
+                    cls.PID_FILE.unlink(missing_ok=True)
             except (ValueError, FileNotFoundError):
-                ServerManager.PID_FILE.unlink(missing_ok=True)
+                cls.PID_FILE.unlink(missing_ok=True)
         
         return len(cleaned_pids), cleaned_pids
     
-    @staticmethod
-    def get_server_pid() -> Optional[int]:
+    @classmethod
+    def get_server_pid(cls) -> Optional[int]:
         """获取服务器进程PID"""
         # 优先读取PID文件（包含真实的bedrock_server PID）
-        if ServerManager.PID_FILE.exists():
+        if cls.PID_FILE.exists():
             try:
-                pid = int(ServerManager.PID_FILE.read_text().strip())
+                pid = int(cls.PID_FILE.read_text().strip())
                 # 验证进程是否存在
                 if psutil.pid_exists(pid):
                     return pid
                 else:
                     # 进程不存在，删除PID文件
-                    ServerManager.PID_FILE.unlink(missing_ok=True)
+                    cls.PID_FILE.unlink(missing_ok=True)
             except (ValueError, FileNotFoundError):
                 pass
         
         # 如果PID文件不可用，尝试从systemd获取（可能是wrapper的PID）
-        if ServerManager.is_systemd_managed():
-            try:
-                result = subprocess.run(
-                    ['systemctl', 'show', '--property=MainPID', '--value', ServerManager.SYSTEMD_SERVICE],
-                    capture_output=True,
-                    text=True,
-                    timeout=2
-                )
-                if result.returncode == 0 and result.stdout.strip():
-                    pid = int(result.stdout.strip())
-                    if pid > 0 and psutil.pid_exists(pid):
-                        return pid
-            except (subprocess.TimeoutExpired, ValueError, FileNotFoundError):
-                pass
+        if cls.is_systemd_managed():
+            pid = cls.systemd().main_pid()
+            if pid and psutil.pid_exists(pid):
+                return pid
         
         # 回退到原来的方法
-        if not ServerManager.PID_FILE.exists():
+        if not cls.PID_FILE.exists():
             # 尝试通过进程名查找
-            processes = ServerManager.find_all_bedrock_processes()
+            processes = cls.find_all_bedrock_processes()
             if processes:
-                # 返回最新的进程
-                latest = max(processes, key=lambda x: x.get('create_time', 0))
+                # 返回最新的服务器进程，只有找不到时才使用包装进程
+                servers = [p for p in processes if not p.get('wrapper')] or processes
+                latest = max(servers, key=lambda x: x.get('create_time', 0))
                 pid = latest['pid']
-                ServerManager.PID_FILE.write_text(str(pid))
+                cls.PID_FILE.write_text(str(pid))
                 return pid
             return None
         
         try:
-            pid = int(ServerManager.PID_FILE.read_text().strip())
+            pid = int(cls.PID_FILE.read_text().strip())
             # 验证进程是否存在
             if psutil.pid_exists(pid):
                 return pid
             else:
                 # 进程不存在，删除PID文件
-                ServerManager.PID_FILE.unlink(missing_ok=True)
+                cls.PID_FILE.unlink(missing_ok=True)
                 return None
         except (ValueError, FileNotFoundError):
             return None
     
-    @staticmethod
-    def start_server() -> Tuple[bool, str]:
+    @classmethod
+    def start_server(cls) -> Tuple[bool, str]:
         """启动服务器（优先使用systemd）"""
-        status = ServerManager.get_server_status()
+        status = cls.get_server_status(cleanup=False)
         if status['running']:
             return False, "服务器已在运行中"
         
         # 清理孤立的进程
-        cleaned_count, cleaned_pids = ServerManager.cleanup_orphaned_processes()
+        cls._report('清理孤立进程')
+        cleaned_count, cleaned_pids = cls.cleanup_orphaned_processes()
         if cleaned_count > 0:
             time.sleep(1)  # 等待进程完全退出
         
+        # server.properties 只在启动时读取，自动调优在此之前写入
+        cls._before_start()
+        
         # 优先使用systemd启动
-        if ServerManager.is_systemd_available():
+        if cls.is_systemd_available():
+            attempt = cls._readiness().begin('systemd')
             try:
-                result = subprocess.run(
-                    ['sudo', 'systemctl', 'start', ServerManager.SYSTEMD_SERVICE],
-                    capture_output=True,
-                    text=True,
-                    timeout=10
-                )
+                cls._report('通过systemd启动')
+                result = cls.systemd().control('start', timeout=10)
                 if result.returncode == 0:
-                    time.sleep(2)  # 等待服务启动
-                    if ServerManager.is_systemd_managed():
-                        pid = ServerManager.get_server_pid()
-                        return True, f"服务器已通过systemd启动 (PID: {pid})"
+                    ready, message = cls._wait_until_ready(attempt)
+                    if ready:
+                        pid = cls.get_server_pid()
+                        return True, f"服务器已通过systemd启动 (PID: {pid})，{message}"
                     else:
-                        return False, "systemd启动命令成功，但服务未运行"
+                        return False, message
                 else:
+                    cls._readiness().cancel(attempt)
                     error_msg = result.stderr.strip() or result.stdout.strip()
                     return False, f"systemd启动失败: {error_msg}"
             except (subprocess.TimeoutExpired, FileNotFoundError) as e:
                 # systemd不可用，回退到直接启动
-                pass
+                cls._readiness().cancel(attempt)
         
         # 回退到直接启动（如果没有systemd）
-        if not Config.BEDROCK_SERVER_BINARY.exists():
-            return False, f"服务器文件不存在: {Config.BEDROCK_SERVER_BINARY}"
+        if not cls.supervisor.binary.exists():
+            return False, f"服务器文件不存在: {cls.supervisor.binary}"
         
         try:
-            # 切换到服务器目录
-            server_dir = Config.BEDROCK_SERVER_DIR
-            
-            # 启动服务器进程
-            process = subprocess.Popen(
-                [str(Config.BEDROCK_SERVER_BINARY)],
-                cwd=str(server_dir),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                preexec_fn=os.setsid  # 创建新的进程组
-            )
-            
-            # 保存PID
-            ServerManager.PID_FILE.write_text(str(process.pid))
+            # 启动服务器进程（由托管进程持续读取输出、保存PID，标准输入作为命令通道）
+            cls._report('启动服务器进程')
+            attempt = cls._readiness().begin('direct')
+            process = cls.supervisor.start()
             
-            return True, f"服务器已启动 (PID: {process.pid})"
+            ready, message = cls._wait_until_ready(attempt)
+            if not ready:
+                return False, message
+            return True, f"服务器已启动 (PID: {process.pid})，{message}"
         except Exception as e:
             return False, f"启动失败: {str(e)}"
     
-    @staticmethod
-    def is_systemd_available() -> bool:
-        """检查systemd是否可用"""
-        try:
-            result = subprocess.run(
-                ['systemctl', '--version'],
-                capture_output=True,
-                timeout=2
-            )
-            return result.returncode == 0
-        except (subprocess.TimeoutExpired, FileNotFoundError):
-            return False
+    @classmethod
+    def is_systemd_available(cls) -> bool:
+        """检查systemd是否可用（进程内只探测一次；实例没有配置systemd单元时为False）"""
+        return bool(cls.SYSTEMD_SERVICE) and SystemdBackend.available()
     
-    @staticmethod
-    def stop_server() -> Tuple[bool, str]:
+    @classmethod
+    def stop_server(cls) -> Tuple[bool, str]:
         """停止服务器（优先使用systemd）"""
-        # 如果由systemd管理，使用systemd停止
-        if ServerManager.is_systemd_managed():
+        return cls._stop('关闭')
+    
+    @classmethod
+    def _stop(cls, reason: str) -> Tuple[bool, str]:
+        """
+        停止服务器：有玩家在线时先倒计时通知
+        
+        Args:
+            reason: 通知玩家的原因（关闭/重启）
+        """
+        from app.server_shutdown import OUTCOME_CLEAN, OUTCOME_FAILED, OUTCOME_TERMINATED
+        shutdown = cls._shutdown()
+        
+        # 如果由systemd管理，使用systemd停止（SIGTERM后的等待时间由单元的 TimeoutStopSec 决定）
+        if cls.is_systemd_managed():
+            attempt = shutdown.begin('systemd', cls.get_server_pid())
+            shutdown.announce(attempt, reason)
             try:
-                result = subprocess.run(
-                    ['sudo', 'systemctl', 'stop', ServerManager.SYSTEMD_SERVICE],
-                    capture_output=True,
-                    text=True,
-                    timeout=10
-                )
+                cls._report('通过systemd停止')
+                result = cls.systemd().control('stop', timeout=shutdown.deadline)
                 if result.returncode == 0:
-                    time.sleep(1)  # 等待服务停止
-                    return True, "服务器已通过systemd停止"
+                    # 服务器自行保存退出、SIGTERM结束，还是超过 TimeoutStopSec 后被SIGKILL
+                    state = cls.systemd().state(max_age=0)
+                    outcome = shutdown.systemd_outcome(attempt, state)
+                    note = '' if outcome == OUTCOME_CLEAN else f"systemd Result={state.result if state else 'unknown'}"
+                    duration = shutdown.finish(attempt, outcome, note)
+                    if outcome == OUTCOME_CLEAN:
+                        return True, f"服务器已通过systemd停止（耗时 {duration:.1f} 秒）"
+                    if outcome == OUTCOME_TERMINATED:
+                        return True, f"服务器已通过systemd停止（未保存完成即被SIGTERM结束，耗时 {duration:.1f} 秒）"
+                    return True, f"服务器已被systemd强制结束（超过 TimeoutStopSec，耗时 {duration:.1f} 秒）"
                 else:
                     error_msg = result.stderr.strip() or result.stdout.strip()
+                    shutdown.finish(attempt, OUTCOME_FAILED, error_msg)
                     return False, f"systemd停止失败: {error_msg}"
             except (subprocess.TimeoutExpired, FileNotFoundError) as e:
                 # systemd不可用，回退到直接停止
-                pass
+                shutdown.finish(attempt, OUTCOME_FAILED, str(e))
         
         # 回退到直接停止
-        pid = ServerManager.get_server_pid()
+        pid = cls.get_server_pid()
         
         if pid is None:
             return False, "服务器未运行"
         
         try:
-            process = psutil.Process(pid)
-            
-            # 发送SIGTERM信号
-            process.terminate()
-            
-            # 等待进程结束（最多10秒）
-            try:
-                process.wait(timeout=10)
-            except psutil.TimeoutExpired:
-                # 如果10秒后还没结束，强制杀死
-                process.kill()
-                process.wait()
+            # 控制台 stop，超过截止时间后SIGTERM，再超时后SIGKILL
+            success, message = shutdown.stop(pid, reason)
             
             # 删除PID文件
-            ServerManager.PID_FILE.unlink(missing_ok=True)
+            cls.PID_FILE.unlink(missing_ok=True)
             
-            return True, "服务器已停止"
+            return success, message
         except psutil.NoSuchProcess:
-            ServerManager.PID_FILE.unlink(missing_ok=True)
+            cls.PID_FILE.unlink(missing_ok=True)
             return False, "进程不存在"
         except Exception as e:
             return False, f"停止失败: {str(e)}"
     
-    @staticmethod
-    def restart_server() -> Tuple[bool, str]:
+    @classmethod
+    def restart_server(cls) -> Tuple[bool, str]:
         """重启服务器（优先使用systemd）"""
         # 如果由systemd管理，使用systemd重启
-        if ServerManager.is_systemd_available():
+        if cls.is_systemd_available():
+            from app.server_shutdown import OUTCOME_FAILED
+            shutdown = cls._shutdown()
+            pid = cls.get_server_pid()
+            stop = None
+            if pid is not None:
+                # 重启中的停止同样记录耗时
+                stop = shutdown.begin('systemd', pid)
+                shutdown.announce(stop, '重启')
+            cls._before_start()
+            attempt = cls._readiness().begin('systemd')
             try:
-                result = subprocess.run(
-                    ['sudo', 'systemctl', 'restart', ServerManager.SYSTEMD_SERVICE],
-                    capture_output=True,
-                    text=True,
-                    timeout=15
-                )
+                cls._report('通过systemd重启')
+                result = cls.systemd().control('restart', timeout=shutdown.deadline + 15)
+                if stop is not None:
+                    if result.returncode == 0:
+                        # 重启后单元的 Result= 已被新的启动重置，只能根据日志判断是否自行保存退出
+                        shutdown.finish(stop, shutdown.systemd_outcome(stop))
+                    else:
+                        shutdown.finish(stop, OUTCOME_FAILED, result.stderr.strip() or result.stdout.strip())
+                    stop = None
                 if result.returncode == 0:
-                    time.sleep(2)  # 等待服务重启
-                    if ServerManager.is_systemd_managed():
-                        pid = ServerManager.get_server_pid()
-                        return True, f"服务器已通过systemd重启 (PID: {pid})"
+                    ready, message = cls._wait_until_ready(attempt)
+                    if ready:
+                        pid = cls.get_server_pid()
+                        return True, f"服务器已通过systemd重启 (PID: {pid})，{message}"
                     else:
-                        return False, "systemd重启命令成功，但服务未运行"
+                        return False, message
                 else:
+                    cls._readiness().cancel(attempt)
                     error_msg = result.stderr.strip() or result.stdout.strip()
                     return False, f"systemd重启失败: {error_msg}"
             except (subprocess.TimeoutExpired, FileNotFoundError) as e:
                 # systemd不可用，回退到手动重启
-                pass
+                cls._readiness().cancel(attempt)
+                if stop is not None:
+                    shutdown.finish(stop, OUTCOME_FAILED, str(e))
         
         # 回退到手动重启
         # 先停止
-        if ServerManager.get_server_status()['running']:
-            success, message = ServerManager.stop_server()
+        if cls.get_server_status(cleanup=False)['running']:
+            # _stop 会等待进程退出
+            success, message = cls._stop('重启')
             if not success:
                 return False, f"停止失败: {message}"
-            
-            # 等待一下确保进程完全结束
-            time.sleep(2)
         
         # 再启动
-        return ServerManager.start_server()
+        return cls.start_server()
     
-    @staticmethod
-    def send_command(command: str) -> Tuple[bool, str]:
+    @classmethod
+    def send_command(cls, command: str) -> Tuple[bool, str]:
         """向服务器发送命令（如果服务器支持stdin）"""
-        pid = ServerManager.get_server_pid()
+        pid = cls.get_server_pid()
         if pid is None:
             return False, "服务器未运行"
         
-        # 注意：Bedrock服务器通常不支持通过stdin发送命令
-        # 这个方法可能需要通过RCON或其他方式实现
-        # 这里提供一个基础框架
-        return False, "命令发送功能需要RCON支持"
+        # 由管理器启动的进程直接写入标准输入，否则通过FIFO管道
+        if cls.supervisor.owns(pid):
+            return cls.supervisor.send([command])
+        player_manager = cls.player_manager
+        if player_manager is None:
+            from app.player_manager import PlayerManager
+            player_manager = PlayerManager
+        return player_manager.send_command(command)
 
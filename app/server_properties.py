@@ -0,0 +1,165 @@
+"""
+server.properties 模块 - 解析、缓存和原子写入服务器配置
+文件按修改时间缓存解析结果；写入时只替换被修改的行，保留注释、顺序和换行符，
+通过临时文件 + fsync + rename 原子替换。Bedrock只在启动时读取该文件，修改在重启后生效
+"""
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.access_manager import atomic_write_text
+from config import Config
+
+# 已知数值配置的取值范围: 键 -> (最小值, 最大值)，None表示不限
+INT_PROPERTIES = {
+    'view-distance': (5, None),
+    'tick-distance': (4, 12),
+    'max-threads': (0, None),
+    'max-players': (1, None),
+    'server-port': (1, 65535),
+    'server-portv6': (1, 65535),
+    'player-idle-timeout': (0, None),
+    'compression-threshold': (0, 65535),
+}
+BOOL_PROPERTIES = (
+    'online-mode', 'allow-cheats', 'allow-list', 'texturepack-required', 'content-log-file-enabled',
+    'server-authoritative-block-breaking', 'emit-server-telemetry', 'force-gamemode',
+)
+
+
+class ServerProperties:
+    """server.properties 的缓存模型"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self._path = path
+        self._lines: List[str] = []
+        self._index: Dict[str, int] = {}   # 键 -> 行号
+        self._values: Dict[str, str] = {}
+        self._mtime: Optional[int] = None
+        self._lock = threading.RLock()
+
+    @property
+    def path(self) -> Path:
+        return self._path or Config.SERVER_PROPERTIES_FILE
+
+    def _parse(self, content: str):
+        self._lines = content.splitlines(keepends=True)
+        self._index, self._values = {}, {}
+        for number, line in enumerate(self._lines):
+            stripped = line.strip()
+            if not stripped or stripped.startswith('#') or '=' not in stripped:
+                continue
+            key, value = stripped.split('=', 1)
+            self._index[key.strip()] = number
+            self._values[key.strip()] = value.strip()
+
+    def _refresh(self):
+        """文件修改时间变化时重新解析"""
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._parse('')
+            self._mtime = None
+            return
+        if mtime == self._mtime:
+            return
+        with open(self.path, 'r', encoding='utf-8', newline='') as f:
+            self._parse(f.read())
+        self._mtime = mtime
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def as_dict(self) -> Dict[str, str]:
+        with self._lock:
+            self._refresh()
+            return dict(self._values)
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        with self._lock:
+            self._refresh()
+            return self._values.get(key, default)
+
+    def get_int(self, key: str, default: int) -> int:
+        try:
+            return int(self.get(key, default))
+        except (TypeError, ValueError):
+            return default
+
+    @staticmethod
+    def validate(changes: Dict) -> Tuple[bool, str, Dict[str, str]]:
+        """检查并规范化要修改的值，返回 (成功, 消息, 键 -> 字符串值)"""
+        normalized = {}
+        for key, value in changes.items():
+            key = str(key).strip()
+            if not key or any(ch in key for ch in '=#\r\n') or key != key.lower():
+                return False, f"无效的配置项: {key}", {}
+
+            if key in INT_PROPERTIES:
+                try:
+                    number = int(value)
+                except (TypeError, ValueError):
+                    return False, f"{key} 必须是整数", {}
+                low, high = INT_PROPERTIES[key]
+                if (low is not None and number < low) or (high is not None and number > high):
+                    bounds = f"{low if low is not None else ''}~{high if high is not None else ''}"
+                    return False, f"{key} 超出范围 ({bounds})", {}
+                value = str(number)
+            elif key in BOOL_PROPERTIES:
+                if isinstance(value, bool):
+                    value = 'true' if value else 'false'
+                elif str(value).strip().lower() not in ('true', 'false'):
+                    return False, f"{key} 必须是 true 或 false", {}
+                value = str(value).strip().lower()
+            else:
+                value = '' if value is None else str(value).strip()
+                if '\r' in value or '\n' in value:
+                    return False, f"{key} 的值不能包含换行", {}
+            normalized[key] = value
+        return True, "", normalized
+
+    def update(self, changes: Dict) -> Tuple[bool, str, Dict[str, List[Optional[str]]]]:
+        """
+        修改配置项并原子写入
+
+        Returns:
+            (成功, 消息, 实际变化的键 -> [修改前, 修改后])
+        """
+        valid, message, normalized = self.validate(changes)
+        if not valid:
+            return False, message, {}
+        if not self.exists():
+            return False, f"配置文件不存在: {self.path}", {}
+
+        with self._lock:
+            self._refresh()
+            diff = {key: [self._values.get(key), value] for key, value in normalized.items()
+                    if self._values.get(key) != value}
+            if not diff:
+                return True, "配置没有变化", {}
+
+            lines = list(self._lines)
+            newline = '\r\n' if lines and lines[0].endswith('\r\n') else '\n'
+            if lines and not lines[-1].endswith(('\n', '\r')):
+                lines[-1] += newline
+            for key, (_, value) in diff.items():
+                number = self._index.get(key)
+                if number is None:
+                    lines.append(f'{key}={value}{newline}')
+                else:
+                    ending = lines[number][len(lines[number].rstrip('\r\n')):]
+                    lines[number] = f'{key}={value}{ending}'
+
+            try:
+                content = ''.join(lines)
+                atomic_write_text(self.path, content)
+            except OSError as e:
+                return False, f"写入 {self.path.name} 失败: {e}", {}
+            self._parse(content)
+            self._mtime = self.path.stat().st_mtime_ns
+
+        return True, f"已修改 {', '.join(diff)}", diff
+
+
+# 全局 server.properties 实例
+server_properties = ServerProperties()
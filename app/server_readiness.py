@@ -0,0 +1,256 @@
+"""
+服务器就绪检测模块 - 根据日志判断服务器是否已完成启动
+发出启动命令后跟踪日志，直到出现 "Server started."（就绪）或失败标记、进程退出、超时为止，
+不再固定等待几秒就认为启动成功。每次启动的耗时和结果记录到 server_boots 表；
+没有日志文件时（例如只输出到journal）改用RakNet ping判断
+"""
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+import psutil
+
+from app import db, raknet
+from app.models import ServerBoot
+from config import Config
+
+READY_PATTERN = re.compile(r'Server started\.', re.IGNORECASE)
+STARTING_PATTERN = re.compile(r'Starting Server', re.IGNORECASE)
+STOPPING_PATTERN = re.compile(r'Stopping server|Server stop requested|Quit correctly', re.IGNORECASE)
+FAILURE_PATTERN = re.compile(
+    r'Network port occupied|Failed to (?:start|load|open|bind)|Segmentation fault|\bCrash(?:ed)?\b',
+    re.IGNORECASE
+)
+
+OUTCOME_READY = 'ready'
+OUTCOME_FAILED = 'failed'
+OUTCOME_EXITED = 'exited'
+OUTCOME_TIMEOUT = 'timeout'
+
+# 没有日志文件时RakNet ping的间隔（秒）
+PING_INTERVAL = 1.0
+
+
+class BootAttempt:
+    """一次启动"""
+
+    def __init__(self, method: str):
+        self.method = method
+        self.started_at = datetime.utcnow()
+        self.started_mono = time.monotonic()
+        self.ready_at: Optional[datetime] = None
+        self.duration: Optional[float] = None
+        self.outcome: Optional[str] = None
+        self.message = ''
+        self.pid: Optional[int] = None
+        self.done = threading.Event()
+
+    def finish(self, outcome: str, message: str = ''):
+        if self.done.is_set():
+            return
+        self.outcome = outcome
+        self.message = message
+        self.duration = round(time.monotonic() - self.started_mono, 3)
+        if outcome == OUTCOME_READY:
+            self.ready_at = datetime.utcnow()
+        self.done.set()
+
+
+class ServerReadiness:
+    """跟踪服务器启动进度和就绪状态"""
+
+    def __init__(self, manager=None, log_tail=None, instance_id: str = 'default'):
+        self.app = None
+        self.instance_id = instance_id
+        self._manager_class = manager
+        self._tail = log_tail
+        self._attempt: Optional[BootAttempt] = None
+        self._ready_pid: Optional[int] = None
+        self._last_ready: Optional[BootAttempt] = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """订阅日志跟踪（也记录非本程序发起的启动，例如systemd自动重启）"""
+        self.app = app
+        self._subscribe()
+
+    @property
+    def manager(self):
+        """实例的 ServerManager（默认为全局的 ServerManager）"""
+        if self._manager_class is None:
+            from app.server_manager import ServerManager
+            return ServerManager
+        return self._manager_class
+
+    @property
+    def log_tail(self):
+        if self._tail is None:
+            from app.log_monitor import log_tail
+            return log_tail
+        return self._tail
+
+    def _subscribe(self):
+        self.log_tail.subscribe(self.handle_line)
+
+    def handle_line(self, line: str):
+        """处理一行日志"""
+        if READY_PATTERN.search(line):
+            pid = self.manager.get_server_pid()
+            with self._lock:
+                self._ready_pid = pid
+                attempt = self._attempt
+                if attempt is None or attempt.done.is_set():
+                    return
+                attempt.pid = attempt.pid or pid
+                attempt.finish(OUTCOME_READY)
+                self._last_ready = attempt
+            if attempt.method == 'external':
+                self._record_external(attempt)
+            return
+
+        if STARTING_PATTERN.search(line):
+            with self._lock:
+                self._ready_pid = None
+                if self._attempt is None or self._attempt.done.is_set():
+                    self._attempt = BootAttempt('external')
+            return
+
+        if STOPPING_PATTERN.search(line):
+            with self._lock:
+                self._ready_pid = None
+                if self._attempt is not None and self._attempt.method == 'external':
+                    self._attempt = None
+            return
+
+        if FAILURE_PATTERN.search(line):
+            with self._lock:
+                attempt = self._attempt
+                if attempt is None or attempt.done.is_set():
+                    return
+                attempt.finish(OUTCOME_FAILED, line.strip()[:500])
+            if attempt.method == 'external':
+                self._record_external(attempt)
+
+    def begin(self, method: str) -> BootAttempt:
+        """在发出启动命令之前调用，之后出现的日志行才会计入这次启动"""
+        self._subscribe()
+        attempt = BootAttempt(method)
+        with self._lock:
+            self._ready_pid = None
+            self._attempt = attempt
+        return attempt
+
+    def cancel(self, attempt: BootAttempt):
+        """启动命令失败，放弃这次启动"""
+        with self._lock:
+            if self._attempt is attempt:
+                self._attempt = None
+
+    def wait(self, attempt: BootAttempt, pid_getter: Callable[[], Optional[int]],
+             timeout: Optional[float] = None) -> Tuple[bool, str]:
+        """
+        等待服务器就绪（日志出现 "Server started."），并记录这次启动
+
+        Returns:
+            (是否就绪, 消息)；出现失败标记、进程退出或超时时返回False
+        """
+        timeout = Config.SERVER_READY_TIMEOUT if timeout is None else timeout
+        deadline = attempt.started_mono + timeout
+        use_ping = not self.log_tail.log_file.exists()
+        next_ping = 0.0
+
+        while not attempt.done.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                attempt.finish(OUTCOME_TIMEOUT, f"等待服务器就绪超时（{timeout:.0f} 秒）")
+                break
+            if attempt.done.wait(min(0.5, remaining)):
+                break
+
+            pid = pid_getter()
+            if not self._alive(pid):
+                attempt.finish(OUTCOME_EXITED, "服务器进程在就绪前退出")
+                break
+            attempt.pid = pid
+
+            if use_ping and time.monotonic() >= next_ping:
+                next_ping = time.monotonic() + PING_INTERVAL
+                if raknet.ping(self.manager.SERVER_ADDRESS, self.manager.SERVER_PORT, timeout=0.5)['online']:
+                    with self._lock:
+                        self._ready_pid = pid
+                    attempt.finish(OUTCOME_READY)
+
+        with self._lock:
+            if attempt.outcome == OUTCOME_READY:
+                self._last_ready = attempt
+            if self._attempt is attempt:
+                self._attempt = None
+        self._record(attempt)
+
+        if attempt.outcome == OUTCOME_READY:
+            return True, f"启动耗时 {attempt.duration:.1f} 秒"
+        if attempt.outcome == OUTCOME_FAILED:
+            return False, f"服务器启动失败: {attempt.message}"
+        return False, attempt.message
+
+    @staticmethod
+    def _alive(pid: Optional[int]) -> bool:
+        if pid is None:
+            return False
+        try:
+            return psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return False
+
+    def is_ready(self, pid: Optional[int]) -> bool:
+        """进程是否已完成启动（就绪后被替换的进程不算）"""
+        return pid is not None and pid == self._ready_pid
+
+    def last_ready(self, pid: Optional[int]) -> Optional[Dict]:
+        """当前进程的启动耗时"""
+        attempt = self._last_ready
+        if attempt is None or pid is None or attempt.pid != pid:
+            return None
+        return {
+            'ready_at': attempt.ready_at.isoformat() if attempt.ready_at else None,
+            'startup_seconds': attempt.duration
+        }
+
+    def _record(self, attempt: BootAttempt):
+        try:
+            db.session.add(ServerBoot(
+                instance_id=self.instance_id,
+                started_at=attempt.started_at,
+                ready_at=attempt.ready_at,
+                duration_seconds=attempt.duration,
+                outcome=attempt.outcome,
+                method=attempt.method,
+                pid=attempt.pid,
+                message=attempt.message or None
+            ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error recording server boot: {e}")
+
+    def _record_external(self, attempt: BootAttempt):
+        if self.app is None:
+            return
+        with self.app.app_context():
+            self._record(attempt)
+
+    def history(self, limit: int = 50):
+        """最近的启动记录"""
+        # 增加实例之前的记录没有 instance_id，属于默认实例
+        if self.instance_id == 'default':
+            query = ServerBoot.query.filter(db.or_(ServerBoot.instance_id == 'default', ServerBoot.instance_id.is_(None)))
+        else:
+            query = ServerBoot.query.filter_by(instance_id=self.instance_id)
+        boots = query.order_by(ServerBoot.started_at.desc()).limit(limit).all()
+        return [boot.to_dict() for boot in boots]
+
+
+# 全局就绪检测实例
+server_readiness = ServerReadiness()
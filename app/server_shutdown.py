@@ -0,0 +1,249 @@
+"""
+服务器安全关闭模块 - 停止服务器时先倒计时通知在线玩家，再通过控制台发送 stop
+服务器收到 stop 后保存世界并输出 "Quit correctly" 后退出；超过截止时间仍未退出时才发送SIGTERM，
+之后再超时才发送SIGKILL，避免大型世界在保存过程中被强制结束。
+每次关闭的耗时和结果记录到 server_stops 表，用于调整截止时间
+"""
+import re
+import threading
+import time
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeoutError
+from datetime import datetime
+from typing import Optional, Tuple
+
+import psutil
+
+from app import db
+from app.models import ServerStop
+from config import Config
+
+QUIT_PATTERN = re.compile(r'Quit correctly', re.IGNORECASE)
+
+# 倒计时中发送提醒的剩余秒数（倒计时开始时总会提醒一次）
+WARNING_MARKS = (300, 120, 60, 30, 10, 5, 3, 2, 1)
+
+OUTCOME_CLEAN = 'clean'  # 服务器自行保存并退出
+OUTCOME_TERMINATED = 'terminated'  # 超过截止时间后SIGTERM结束
+OUTCOME_KILLED = 'killed'  # SIGTERM后仍未退出，SIGKILL结束
+OUTCOME_FAILED = 'failed'  # 停止命令失败
+
+
+class StopAttempt:
+    """一次关闭"""
+
+    def __init__(self, method: str, pid: Optional[int], quit_future):
+        self.method = method
+        self.pid = pid
+        self.countdown = 0
+        self.started_at = datetime.utcnow()
+        self.started_mono = time.monotonic()
+        self.quit_future = quit_future
+        self.quit_correctly: Optional[bool] = None
+
+
+class ServerShutdown:
+    """倒计时通知、控制台 stop 和逐级升级的关闭流程"""
+
+    def __init__(self, manager=None, log_tail=None, instance_id: str = 'default'):
+        self.instance_id = instance_id
+        self._manager_class = manager
+        self._tail = log_tail
+        self._stopping_pid: Optional[int] = None
+        # 最近一次由本程序停止的进程（看门狗据此区分主动停止和崩溃）
+        self.last_stopped_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def manager(self):
+        """实例的 ServerManager（默认为全局的 ServerManager）"""
+        if self._manager_class is None:
+            from app.server_manager import ServerManager
+            return ServerManager
+        return self._manager_class
+
+    @property
+    def log_tail(self):
+        if self._tail is None:
+            from app.log_monitor import log_tail
+            return log_tail
+        return self._tail
+
+    @property
+    def deadline(self) -> float:
+        """从发出停止命令到进程一定结束的最长时间（秒）"""
+        return Config.SERVER_STOP_TIMEOUT + Config.SERVER_TERM_TIMEOUT
+
+    def is_stopping(self, pid: Optional[int]) -> bool:
+        """进程是否正在关闭（倒计时或等待保存）"""
+        return pid is not None and pid == self._stopping_pid
+
+    def countdown(self, reason: str, seconds: Optional[int] = None) -> int:
+        """
+        倒计时通知在线玩家
+
+        Returns:
+            实际等待的秒数；没有玩家在线或无法发送命令时不等待
+        """
+        seconds = Config.SERVER_STOP_COUNTDOWN if seconds is None else seconds
+        if seconds <= 0 or not self.manager.probe().get('players_online'):
+            return 0
+
+        marks = [seconds] + [mark for mark in WARNING_MARKS if mark < seconds]
+        waited = 0
+        for i, mark in enumerate(marks):
+            success, _ = self.manager.send_command(f'say 服务器将在 {mark} 秒后{reason}')
+            if not success:
+                break
+            self.manager._report(f'通知玩家：{mark} 秒后{reason}')
+            pause = mark - (marks[i + 1] if i + 1 < len(marks) else 0)
+            time.sleep(pause)
+            waited += pause
+        return waited
+
+    def begin(self, method: str, pid: Optional[int]) -> StopAttempt:
+        """
+        在倒计时和停止命令之前调用：状态从此刻起为 stopping，
+        之后出现的 "Quit correctly" 才计入这次关闭
+        """
+        with self._lock:
+            self._stopping_pid = pid
+            self.last_stopped_pid = pid
+        future = self.log_tail.expect(QUIT_PATTERN, timeout=self.deadline + max(Config.SERVER_STOP_COUNTDOWN, 0))
+        return StopAttempt(method, pid, future)
+
+    def announce(self, attempt: StopAttempt, reason: str):
+        """倒计时通知在线玩家，停止耗时从倒计时结束（发出停止命令）时开始计算"""
+        try:
+            attempt.countdown = self.countdown(reason)
+        except Exception as e:
+            self.finish(attempt, OUTCOME_FAILED, str(e))
+            raise
+        attempt.started_at = datetime.utcnow()
+        attempt.started_mono = time.monotonic()
+
+    @staticmethod
+    def _quit_seen(attempt: StopAttempt) -> bool:
+        """日志中是否出现了 "Quit correctly"（只等待一次）"""
+        if attempt.quit_correctly is None:
+            # "Quit correctly" 在进程退出前写入，日志跟踪线程可能还没有读到
+            try:
+                attempt.quit_future.result(timeout=Config.LOG_TAIL_INTERVAL * 2 + 0.5)
+                attempt.quit_correctly = True
+            except (FutureTimeoutError, CancelledError):
+                attempt.quit_correctly = False
+        return attempt.quit_correctly
+
+    def systemd_outcome(self, attempt: StopAttempt, state=None) -> str:
+        """
+        systemctl stop 成功后的结果：日志中出现 "Quit correctly" 为 clean；
+        否则单元 Result=timeout 表示超过 TimeoutStopSec 后被SIGKILL，其余为SIGTERM结束
+        """
+        if self._quit_seen(attempt):
+            return OUTCOME_CLEAN
+        if state is not None and state.result == 'timeout':
+            return OUTCOME_KILLED
+        return OUTCOME_TERMINATED
+
+    def finish(self, attempt: StopAttempt, outcome: str, message: str = '') -> float:
+        """记录这次关闭，返回从发出停止命令到结束的秒数"""
+        duration = round(time.monotonic() - attempt.started_mono, 3)
+        quit_correctly = outcome != OUTCOME_FAILED and self._quit_seen(attempt)
+        self.log_tail.cancel(attempt.quit_future)
+        with self._lock:
+            if self._stopping_pid == attempt.pid:
+                self._stopping_pid = None
+
+        try:
+            db.session.add(ServerStop(
+                instance_id=self.instance_id,
+                started_at=attempt.started_at,
+                finished_at=datetime.utcnow(),
+                countdown_seconds=attempt.countdown,
+                duration_seconds=duration,
+                outcome=outcome,
+                method=attempt.method,
+                quit_correctly=quit_correctly,
+                pid=attempt.pid,
+                message=message[:500] or None
+            ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error recording server stop: {e}")
+        return duration
+
+    def history(self, limit: int = 50):
+        """最近的关闭记录"""
+        if self.instance_id == 'default':
+            query = ServerStop.query.filter(db.or_(ServerStop.instance_id == 'default', ServerStop.instance_id.is_(None)))
+        else:
+            query = ServerStop.query.filter_by(instance_id=self.instance_id)
+        stops = query.order_by(ServerStop.started_at.desc()).limit(limit).all()
+        return [stop.to_dict() for stop in stops]
+
+    @staticmethod
+    def _wait_exit(process: psutil.Process, timeout: float) -> bool:
+        try:
+            process.wait(timeout=timeout)
+            return True
+        except psutil.TimeoutExpired:
+            return False
+        except psutil.NoSuchProcess:
+            return True
+
+    def stop(self, pid: int, reason: str = '关闭') -> Tuple[bool, str]:
+        """
+        安全关闭手动模式下的服务器进程：倒计时通知，控制台 stop，超时后SIGTERM，再超时后SIGKILL
+        """
+        manager = self.manager
+        try:
+            process = psutil.Process(pid)
+        except psutil.NoSuchProcess:
+            return False, "进程不存在"
+
+        attempt = self.begin('console', pid)
+        self.announce(attempt, reason)
+        outcome = None
+        note = ''
+        try:
+            manager._report('发送 stop 命令')
+            sent, note = manager.send_command('stop')
+            if not sent:
+                note = f"无法发送 stop 命令: {note}"
+            else:
+                manager._report('等待服务器保存世界并退出')
+                if self._wait_exit(process, Config.SERVER_STOP_TIMEOUT):
+                    outcome = OUTCOME_CLEAN
+                else:
+                    note = f"服务器未在 {Config.SERVER_STOP_TIMEOUT:.0f} 秒内退出"
+
+            if outcome is None:
+                manager._report('发送SIGTERM')
+                try:
+                    process.terminate()
+                except psutil.NoSuchProcess:
+                    pass
+                if self._wait_exit(process, Config.SERVER_TERM_TIMEOUT):
+                    outcome = OUTCOME_TERMINATED
+                else:
+                    manager._report('强制结束进程')
+                    try:
+                        process.kill()
+                        process.wait()
+                    except psutil.NoSuchProcess:
+                        pass
+                    outcome = OUTCOME_KILLED
+        except Exception as e:
+            self.finish(attempt, OUTCOME_FAILED, str(e))
+            raise
+
+        duration = self.finish(attempt, outcome, '' if outcome == OUTCOME_CLEAN else note)
+        if outcome == OUTCOME_CLEAN:
+            return True, f"服务器已安全关闭（耗时 {duration:.1f} 秒）"
+        if outcome == OUTCOME_TERMINATED:
+            return True, f"服务器已停止（{note}，已发送SIGTERM）"
+        return True, f"服务器已被强制结束（{note}）"
+
+
+# 全局安全关闭实例
+server_shutdown = ServerShutdown()
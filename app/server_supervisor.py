@@ -0,0 +1,134 @@
+"""
+服务器进程托管模块 - 手动模式（没有systemd）下由管理器直接持有 bedrock_server 子进程
+标准输出和标准错误合并后由读取线程持续读出，写入日志文件和内存中的最近输出缓冲区，
+避免管道缓冲区（64KB）写满后服务器阻塞；标准输入作为命令通道，不需要FIFO或RCON。
+子进程的管道属于管理器进程，管理器退出后需要重新启动服务器才能继续发送命令
+"""
+import os
+import subprocess
+import threading
+from collections import deque
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from config import Config
+
+
+class ServerSupervisor:
+    """持有服务器子进程及其标准输入/输出"""
+
+    def __init__(self, binary: Optional[Path] = None, server_dir: Optional[Path] = None,
+                 log_file: Optional[Path] = None, pid_file: Optional[Path] = None):
+        self.binary = Path(binary or Config.BEDROCK_SERVER_BINARY)
+        self.server_dir = Path(server_dir or Config.BEDROCK_SERVER_DIR)
+        self.log_file = Path(log_file or Config.LOG_FILE)
+        self._pid_file = pid_file
+        self._process: Optional[subprocess.Popen] = None
+        self._reader: Optional[threading.Thread] = None
+        self._recent = deque(maxlen=Config.SUPERVISOR_OUTPUT_LINES)
+        self._stdin_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    @property
+    def pid_file(self) -> Path:
+        if self._pid_file is None:
+            from app.server_manager import ServerManager
+            return ServerManager.PID_FILE
+        return self._pid_file
+
+    @property
+    def running(self) -> bool:
+        process = self._process
+        return process is not None and process.poll() is None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._process.pid if self.running else None
+
+    def owns(self, pid: Optional[int]) -> bool:
+        """进程是否由本管理器启动（可以通过标准输入发送命令）"""
+        return pid is not None and pid == self.pid
+
+    def start(self) -> subprocess.Popen:
+        """
+        启动服务器进程并写入PID文件
+        启动失败时抛出与 subprocess.Popen 相同的异常
+        """
+        with self._lock:
+            if self.running:
+                return self._process
+
+            process = subprocess.Popen(
+                [str(self.binary)],
+                cwd=str(self.server_dir),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                preexec_fn=os.setsid  # 创建新的进程组
+            )
+            self._process = process
+            self._reader = threading.Thread(
+                target=self._drain, args=(process,), name='server-output', daemon=True
+            )
+            self._reader.start()
+
+        self.pid_file.write_text(str(process.pid))
+        return process
+
+    def _drain(self, process: subprocess.Popen):
+        """读取服务器输出直到进程退出（进程结束后回收，避免僵尸进程）"""
+        try:
+            log = open(self.log_file, 'ab')
+        except OSError as e:
+            print(f"Error opening server log file: {e}")
+            log = None
+
+        try:
+            for raw in iter(process.stdout.readline, b''):
+                line = raw.decode('utf-8', errors='replace').rstrip('\r\n')
+                if line:
+                    self._recent.append(line)
+                if log is not None:
+                    try:
+                        log.write(raw if raw.endswith(b'\n') else raw + b'\n')
+                        log.flush()
+                    except OSError as e:
+                        print(f"Error writing server log file: {e}")
+        except (OSError, ValueError) as e:
+            print(f"Error reading server output: {e}")
+        finally:
+            if log is not None:
+                log.close()
+            process.stdout.close()
+            process.wait()
+            with self._stdin_lock:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+
+    def send(self, commands: List[str]) -> Tuple[bool, str]:
+        """通过标准输入发送命令（一次写入）"""
+        process = self._process
+        if process is None or process.poll() is not None:
+            return False, "服务器进程不是由管理器启动的"
+
+        data = ''.join(f"{command}\n" for command in commands).encode('utf-8')
+        with self._stdin_lock:
+            try:
+                process.stdin.write(data)
+                process.stdin.flush()
+            except (BrokenPipeError, OSError, ValueError) as e:
+                return False, f"发送命令失败: {str(e)}"
+        if len(commands) == 1:
+            return True, f"命令已发送: {commands[0]}"
+        return True, f"已发送 {len(commands)} 条命令"
+
+    def recent(self, lines: int = 100) -> List[str]:
+        """最近的服务器输出"""
+        output = list(self._recent)
+        return output[-lines:]
+
+
+# 全局服务器进程托管实例
+server_supervisor = ServerSupervisor()
@@ -0,0 +1,277 @@
+"""
+服务器调优模块 - 根据负载历史调整 view-distance / tick-distance / max-threads
+后台线程定期记录服务器进程的CPU占用和在线玩家数；策略根据有玩家在线时的CPU负载
+给出建议值（recommend 模式），或在下一次通过管理器启动/重启服务器前写入
+server.properties（apply 模式）。每次修改都记录修改前和生效后的负载指标
+"""
+import json
+import math
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import psutil
+
+from app import db
+from app.models import PlayerSession, ServerLoadSample, ServerTuningChange
+from app.server_properties import server_properties
+from config import Config
+
+MODES = ('off', 'recommend', 'apply')
+TUNED_PROPERTIES = ('view-distance', 'tick-distance', 'max-threads')
+
+# Bedrock 默认值（配置文件中缺少该项时使用）
+DEFAULT_VIEW_DISTANCE = 32
+DEFAULT_TICK_DISTANCE = 4
+DEFAULT_MAX_THREADS = 8
+
+
+def _percentile(values: List[float], percent: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def load_metrics(start: datetime, end: datetime) -> Dict:
+    """
+    统计时间窗口内的负载指标（需要在应用上下文中调用）
+    CPU分位数只计算有玩家在线的采样，空服时的低负载不能说明能承受更大的视距
+    """
+    rows = db.session.query(ServerLoadSample.cpu_percent, ServerLoadSample.players_online).filter(
+        ServerLoadSample.timestamp >= start, ServerLoadSample.timestamp < end
+    ).all()
+    active = [cpu for cpu, players in rows if players > 0]
+    players = [p for _, p in rows]
+    p95 = _percentile(active, 95)
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'samples': len(rows),
+        'active_samples': len(active),
+        'cpu_avg': round(sum(active) / len(active), 1) if active else None,
+        'cpu_p95': round(p95, 1) if p95 is not None else None,
+        'players_avg': round(sum(players) / len(players), 2) if players else None,
+        'players_peak': max(players) if players else 0,
+    }
+
+
+class ServerTuner:
+    """负载采样、调优策略和修改记录"""
+
+    def __init__(self):
+        self.app = None
+        self._process: Optional[psutil.Process] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """启动负载采样线程（AUTOTUNE_MODE 为 off 时不启动）"""
+        self.app = app
+        if Config.AUTOTUNE_MODE not in MODES:
+            print(f"无效的 AUTOTUNE_MODE: {Config.AUTOTUNE_MODE}（可选: {', '.join(MODES)}）")
+            return
+        if Config.AUTOTUNE_MODE == 'off':
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='server-tuner', daemon=True)
+        self._thread.start()
+
+    # ---------- 采样 ----------
+
+    def sample(self) -> Optional[ServerLoadSample]:
+        """记录一次负载采样（服务器未运行或刚开始跟踪新进程时返回None）"""
+        from app.server_manager import ServerManager
+
+        pid = ServerManager.get_server_pid()
+        if pid is None:
+            self._process = None
+            return None
+        try:
+            if self._process is None or self._process.pid != pid:
+                # cpu_percent(None) 第一次调用只建立基准
+                self._process = psutil.Process(pid)
+                self._process.cpu_percent(None)
+                self._mark_effective(datetime.utcfromtimestamp(self._process.create_time()))
+                return None
+            cpu = self._process.cpu_percent(None) / (psutil.cpu_count() or 1)
+        except psutil.NoSuchProcess:
+            self._process = None
+            return None
+
+        players = PlayerSession.query.filter_by(is_online=True).count()
+        sample = ServerLoadSample(timestamp=datetime.utcnow(), cpu_percent=round(cpu, 2), players_online=players)
+        db.session.add(sample)
+        db.session.commit()
+        return sample
+
+    def _mark_effective(self, started_at: datetime):
+        """服务器（重新）启动后，之前写入的修改开始生效"""
+        pending = ServerTuningChange.query.filter(
+            ServerTuningChange.effective_at.is_(None), ServerTuningChange.created_at <= started_at
+        ).all()
+        for change in pending:
+            change.effective_at = started_at
+        if pending:
+            db.session.commit()
+
+    def _fill_metrics_after(self):
+        """生效满一个统计窗口的修改，补充生效后的负载指标"""
+        window = timedelta(seconds=Config.AUTOTUNE_WINDOW)
+        now = datetime.utcnow()
+        changes = ServerTuningChange.query.filter(
+            ServerTuningChange.metrics_after.is_(None),
+            ServerTuningChange.effective_at.isnot(None),
+            ServerTuningChange.effective_at <= now - window
+        ).all()
+        for change in changes:
+            change.metrics_after = json.dumps(load_metrics(change.effective_at, change.effective_at + window))
+        if changes:
+            db.session.commit()
+
+    def _prune(self):
+        """删除超出保留期限的采样（保留两个统计窗口）"""
+        cutoff = datetime.utcnow() - timedelta(seconds=2 * Config.AUTOTUNE_WINDOW)
+        removed = ServerLoadSample.query.filter(ServerLoadSample.timestamp < cutoff).delete(synchronize_session=False)
+        if removed:
+            db.session.commit()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                with self.app.app_context():
+                    self.sample()
+                    self._fill_metrics_after()
+                    self._prune()
+            except Exception as e:
+                print(f"Error sampling server load: {e}")
+                try:
+                    with self.app.app_context():
+                        db.session.rollback()
+                except Exception:
+                    pass
+            self._stop_event.wait(Config.AUTOTUNE_SAMPLE_INTERVAL)
+
+    # ---------- 策略 ----------
+
+    def _window_start(self, now: datetime) -> Tuple[Optional[datetime], str]:
+        """
+        统计窗口的起点：最近一次修改生效之后（之前的采样反映的是旧配置）
+        还有修改没有生效时返回None
+        """
+        latest = ServerTuningChange.query.order_by(ServerTuningChange.created_at.desc()).first()
+        start = now - timedelta(seconds=Config.AUTOTUNE_WINDOW)
+        if latest is None:
+            return start, ''
+        if latest.effective_at is None:
+            return None, '上一次修改尚未生效（等待服务器重启）'
+        return max(start, latest.effective_at), ''
+
+    def recommend(self) -> Dict:
+        """
+        根据负载历史给出建议（需要在应用上下文中调用）
+        视距和模拟距离的开销大致与距离的平方成正比：按有玩家时的CPU p95
+        估算使负载回到目标值的视距，每次最多调整 AUTOTUNE_VIEW_DISTANCE_STEP
+        """
+        now = datetime.utcnow()
+        start, pending = self._window_start(now)
+        result = {'changes': {}, 'reason': pending, 'metrics': None}
+        if start is None:
+            return result
+
+        metrics = load_metrics(start, now)
+        result['metrics'] = metrics
+        if metrics['active_samples'] < Config.AUTOTUNE_MIN_SAMPLES:
+            result['reason'] = f"有玩家在线的采样不足（{metrics['active_samples']}/{Config.AUTOTUNE_MIN_SAMPLES}）"
+            return result
+
+        cpu = metrics['cpu_p95']
+        high, low = Config.AUTOTUNE_CPU_HIGH, Config.AUTOTUNE_CPU_LOW
+        target = (high + low) / 2
+        cores = psutil.cpu_count() or 1
+        view = server_properties.get_int('view-distance', DEFAULT_VIEW_DISTANCE)
+        tick = server_properties.get_int('tick-distance', DEFAULT_TICK_DISTANCE)
+        threads = server_properties.get_int('max-threads', DEFAULT_MAX_THREADS)
+        step = Config.AUTOTUNE_VIEW_DISTANCE_STEP
+        changes = {}
+
+        if cpu >= high or (cpu <= low and metrics['players_peak'] > 0):
+            estimate = int(round(view * math.sqrt(target / max(cpu, 1))))
+            new_view = max(view - step, min(view + step, estimate))
+            new_view = max(Config.AUTOTUNE_VIEW_DISTANCE_MIN, min(Config.AUTOTUNE_VIEW_DISTANCE_MAX, new_view))
+            if new_view != view:
+                changes['view-distance'] = [view, new_view]
+
+            new_tick = tick - 1 if cpu >= high else tick + 1
+            new_tick = max(Config.AUTOTUNE_TICK_DISTANCE_MIN, min(Config.AUTOTUNE_TICK_DISTANCE_MAX, new_tick))
+            if new_tick != tick:
+                changes['tick-distance'] = [tick, new_tick]
+
+            direction = '降低' if cpu >= high else '提高'
+            threshold = f"≥ {high}%" if cpu >= high else f"≤ {low}%"
+            result['reason'] = f"有玩家在线时CPU p95 为 {cpu}%（{threshold}），{direction}视距/模拟距离"
+        else:
+            result['reason'] = f"有玩家在线时CPU p95 为 {cpu}%，在 {low}%~{high}% 之间，无需调整"
+
+        # 线程数超过核心数没有意义；负载高时用满全部核心（0 表示不限制）
+        if threads > cores or (cpu >= high and 0 < threads < cores):
+            changes['max-threads'] = [threads, cores]
+            result['reason'] += f"；max-threads 调整为核心数 {cores}"
+
+        result['changes'] = changes
+        return result
+
+    # ---------- 修改 ----------
+
+    def apply_changes(self, changes: Dict, source: str = 'manual', created_by: Optional[str] = None,
+                      reason: Optional[str] = None) -> Tuple[bool, str]:
+        """写入 server.properties 并记录修改前的负载指标（需要在应用上下文中调用）"""
+        with self._lock:
+            success, message, diff = server_properties.update(changes)
+            if not success or not diff:
+                return success, message
+
+            now = datetime.utcnow()
+            try:
+                db.session.add(ServerTuningChange(
+                    source=source, created_by=created_by, created_at=now,
+                    changes=json.dumps(diff, ensure_ascii=False), reason=reason,
+                    metrics_before=json.dumps(load_metrics(now - timedelta(seconds=Config.AUTOTUNE_WINDOW), now))
+                ))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error recording server.properties change: {e}")
+        return True, f"{message}，重启服务器后生效"
+
+    def apply_recommendation(self, created_by: Optional[str] = None) -> Tuple[bool, str]:
+        """立即写入当前建议（在下一次启动服务器时生效）"""
+        recommendation = self.recommend()
+        if not recommendation['changes']:
+            return False, recommendation['reason'] or "当前没有调整建议"
+        changes = {key: new for key, (_, new) in recommendation['changes'].items()}
+        return self.apply_changes(changes, 'autotune', created_by, recommendation['reason'])
+
+    def before_start(self):
+        """管理器启动/重启服务器前调用：apply 模式下写入建议值"""
+        if Config.AUTOTUNE_MODE != 'apply' or not server_properties.exists():
+            return
+        try:
+            success, message = self.apply_recommendation()
+            if success:
+                print(f"自动调优: {message}")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error applying server autotune: {e}")
+
+    @staticmethod
+    def history(limit: int = 20) -> List[Dict]:
+        changes = ServerTuningChange.query.order_by(ServerTuningChange.created_at.desc()).limit(limit).all()
+        return [change.to_dict() for change in changes]
+
+
+# 全局服务器调优实例
+server_tuner = ServerTuner()
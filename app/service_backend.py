@@ -0,0 +1,194 @@
+"""
+服务后端模块 - systemd 单元状态查询
+systemd 是否可用只探测一次；单元状态通过一次 `systemctl show -p ...` 获取全部需要的属性，
+按较短的TTL缓存，启动/停止/重启等操作后立即失效。
+systemctl 的路径可通过 SYSTEMCTL 配置，测试时可以替换为一个伪造的脚本
+"""
+import subprocess
+import threading
+import time
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional
+
+from config import Config
+
+PROPERTIES = ('ActiveState', 'SubState', 'MainPID', 'ExecMainStartTimestamp', 'NRestarts', 'Restart', 'Result')
+
+
+class ServiceState(NamedTuple):
+    """一次 systemctl show 的结果"""
+    active_state: str
+    sub_state: str
+    main_pid: Optional[int]
+    started_at: Optional[float]  # 主进程启动时间（时间戳）
+    restarts: int
+    restart_policy: str = 'no'  # 单元的 Restart= 设置
+    result: str = 'success'  # 单元最近一次运行的结果（Result=，timeout 表示停止超时后被SIGKILL）
+
+    @property
+    def is_active(self) -> bool:
+        # 接受 active 或 activating 状态
+        return self.active_state in ('active', 'activating')
+
+    @property
+    def restarts_automatically(self) -> bool:
+        """单元配置了 Restart=（进程退出后由systemd重启）"""
+        return self.restart_policy not in ('', 'no')
+
+    def to_dict(self) -> Dict:
+        return {
+            'active_state': self.active_state,
+            'sub_state': self.sub_state,
+            'main_pid': self.main_pid,
+            'started_at': self.started_at,
+            'restarts': self.restarts,
+            'restart_policy': self.restart_policy,
+            'result': self.result
+        }
+
+
+def _parse_timestamp(value: str) -> Optional[float]:
+    """解析 systemd 时间戳（例如 'Mon 2024-01-15 10:30:45 UTC' 或 '@1705314645'）"""
+    value = value.strip()
+    if not value or value == 'n/a':
+        return None
+    if value.startswith('@'):
+        try:
+            return float(value[1:])
+        except ValueError:
+            return None
+    parts = value.split()
+    # systemctl 默认以本地时区输出：星期 日期 时间 时区
+    for date_part, time_part in ((parts[1:2], parts[2:3]), (parts[0:1], parts[1:2])):
+        if not date_part or not time_part:
+            continue
+        try:
+            return datetime.strptime(f'{date_part[0]} {time_part[0]}', '%Y-%m-%d %H:%M:%S').timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_show_output(output: str) -> ServiceState:
+    values = {}
+    for line in output.splitlines():
+        if '=' in line:
+            key, value = line.split('=', 1)
+            values[key.strip()] = value.strip()
+
+    try:
+        main_pid = int(values.get('MainPID') or 0)
+    except ValueError:
+        main_pid = 0
+    try:
+        restarts = int(values.get('NRestarts') or 0)
+    except ValueError:
+        restarts = 0
+
+    return ServiceState(
+        active_state=values.get('ActiveState', 'unknown'),
+        sub_state=values.get('SubState', 'unknown'),
+        main_pid=main_pid or None,
+        started_at=_parse_timestamp(values.get('ExecMainStartTimestamp', '')),
+        restarts=restarts,
+        restart_policy=values.get('Restart') or 'no',
+        result=values.get('Result') or 'success'
+    )
+
+
+class SystemdBackend:
+    """一个systemd单元的状态缓存"""
+
+    # systemd 是否可用（进程内所有单元共享，只探测一次）
+    _available: Optional[bool] = None
+    _available_lock = threading.Lock()
+
+    def __init__(self, unit: str):
+        self.unit = unit
+        self._state: Optional[ServiceState] = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def available(cls) -> bool:
+        """检查systemd是否可用"""
+        if cls._available is None:
+            with cls._available_lock:
+                if cls._available is None:
+                    try:
+                        result = subprocess.run([Config.SYSTEMCTL, '--version'], capture_output=True, timeout=2)
+                        cls._available = result.returncode == 0
+                    except (subprocess.TimeoutExpired, FileNotFoundError, PermissionError):
+                        cls._available = False
+        return cls._available
+
+    @classmethod
+    def reset_availability(cls):
+        cls._available = None
+
+    def state(self, max_age: Optional[float] = None) -> Optional[ServiceState]:
+        """
+        获取单元状态（缓存时间不超过 max_age，默认 SYSTEMD_STATE_TTL）
+        systemd不可用或查询失败时返回None
+        """
+        if not self.available():
+            return None
+        max_age = Config.SYSTEMD_STATE_TTL if max_age is None else max_age
+
+        with self._lock:
+            if self._state is not None and time.monotonic() - self._fetched_at < max_age:
+                return self._state
+
+            command = [Config.SYSTEMCTL, 'show', self.unit]
+            for name in PROPERTIES:
+                command += ['-p', name]
+            try:
+                result = subprocess.run(command, capture_output=True, text=True, timeout=2)
+            except (subprocess.TimeoutExpired, FileNotFoundError) as e:
+                print(f"Error querying {self.unit}: {e}")
+                return None
+            if result.returncode != 0:
+                return None
+
+            self._state = parse_show_output(result.stdout)
+            self._fetched_at = time.monotonic()
+            return self._state
+
+    def is_active(self) -> bool:
+        state = self.state()
+        return state is not None and state.is_active
+
+    def main_pid(self) -> Optional[int]:
+        state = self.state()
+        return state.main_pid if state is not None else None
+
+    def invalidate(self):
+        with self._lock:
+            self._state = None
+
+    def control(self, action: str, timeout: float) -> subprocess.CompletedProcess:
+        """
+        执行 start / stop / restart（通过sudo），执行前后都使缓存失效
+        超时或找不到命令时抛出与 subprocess.run 相同的异常
+        """
+        command = [Config.SYSTEMCTL, action, self.unit]
+        if Config.SYSTEMCTL_SUDO:
+            command.insert(0, 'sudo')
+        self.invalidate()
+        try:
+            return subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+        finally:
+            self.invalidate()
+
+
+_backends: Dict[str, SystemdBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(unit: str) -> SystemdBackend:
+    """获取单元的状态缓存（每个单元一个实例）"""
+    with _backends_lock:
+        backend = _backends.get(unit)
+        if backend is None:
+            backend = _backends[unit] = SystemdBackend(unit)
+        return backend
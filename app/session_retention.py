@@ -0,0 +1,152 @@
+"""
+玩家会话保留模块 - 压缩历史会话
+把超过保留期限的已结束会话汇总为每个玩家每天一行，然后删除原始记录，
+避免 player_sessions 无限增长
+"""
+import threading
+from datetime import datetime, timedelta, date
+from typing import Dict, Optional, Tuple
+
+from app import db
+from app.models import PlayerSession, PlayerDailySummary
+from config import Config
+
+
+def _split_by_day(join_time: datetime, leave_time: datetime):
+    """把会话按UTC日期拆分，返回 (日期, 秒数) 序列"""
+    current = join_time
+    while current < leave_time:
+        next_day = datetime.combine(current.date() + timedelta(days=1), datetime.min.time())
+        end = min(next_day, leave_time)
+        yield current.date(), int((end - current).total_seconds())
+        current = end
+
+
+def compact_sessions(retention_days: int, batch_size: int = 5000) -> Tuple[int, int]:
+    """
+    压缩超过保留期限的已结束会话
+
+    Args:
+        retention_days: 保留最近多少天的原始会话
+        batch_size: 每批处理的会话数量（每批一个事务）
+
+    Returns:
+        (删除的会话数, 更新的汇总行数)
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    removed = 0
+    touched = 0
+
+    while True:
+        sessions = PlayerSession.query.filter(
+            PlayerSession.is_online == False,  # noqa: E712
+            PlayerSession.leave_time.isnot(None),
+            PlayerSession.leave_time < cutoff
+        ).order_by(PlayerSession.id).limit(batch_size).all()
+
+        if not sessions:
+            break
+
+        # 在内存中按 (玩家, 日期) 汇总本批会话
+        totals: Dict[Tuple[str, date], Dict] = {}
+        for session in sessions:
+            join_time = session.join_time or session.leave_time
+            for day, seconds in _split_by_day(join_time, max(session.leave_time, join_time)):
+                entry = totals.setdefault((session.player_name, day), {
+                    'sessions': 0, 'seconds': 0, 'first_join': join_time, 'last_leave': session.leave_time,
+                    'player_id': session.player_id
+                })
+                entry['seconds'] += seconds
+                entry['first_join'] = min(entry['first_join'], join_time)
+                entry['last_leave'] = max(entry['last_leave'], session.leave_time)
+            # 会话计入加入当天
+            totals.setdefault((session.player_name, join_time.date()), {
+                'sessions': 0, 'seconds': 0, 'first_join': join_time, 'last_leave': session.leave_time,
+                'player_id': session.player_id
+            })['sessions'] += 1
+
+        try:
+            names = {name for name, _ in totals}
+            days = {day for _, day in totals}
+            existing = {
+                (row.player_name, row.day): row
+                for row in PlayerDailySummary.query.filter(
+                    PlayerDailySummary.player_name.in_(names),
+                    PlayerDailySummary.day.in_(days)
+                ).all()
+            }
+
+            for (name, day), entry in totals.items():
+                row = existing.get((name, day))
+                if row is None:
+                    row = PlayerDailySummary(
+                        player_id=entry['player_id'], player_name=name, day=day, session_count=0, playtime_seconds=0,
+                        first_join=entry['first_join'], last_leave=entry['last_leave']
+                    )
+                    db.session.add(row)
+                row.player_id = row.player_id or entry['player_id']
+                row.session_count += entry['sessions']
+                row.playtime_seconds += entry['seconds']
+                row.first_join = min(filter(None, [row.first_join, entry['first_join']]))
+                row.last_leave = max(filter(None, [row.last_leave, entry['last_leave']]))
+
+            ids = [session.id for session in sessions]
+            PlayerSession.query.filter(PlayerSession.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        removed += len(sessions)
+        touched += len(totals)
+        db.session.expunge_all()
+
+    return removed, touched
+
+
+class SessionRetention:
+    """定期运行会话压缩的后台任务"""
+
+    def __init__(self):
+        self.app = None
+        self.last_run: Optional[datetime] = None
+        self.last_result: Optional[Tuple[int, int]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def init_app(self, app):
+        """启动后台压缩线程（保留天数为0时禁用）"""
+        self.app = app
+        if Config.SESSION_RETENTION_DAYS <= 0:
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='session-retention', daemon=True)
+        self._thread.start()
+
+    def run_once(self) -> Tuple[int, int]:
+        """立即执行一次压缩"""
+        from app.player_analytics import player_analytics
+
+        result = compact_sessions(Config.SESSION_RETENTION_DAYS)
+        self.last_run = datetime.utcnow()
+        self.last_result = result
+        if result[0]:
+            # 已加载的会话数组中包含被删除的记录，需要重新加载
+            player_analytics.reset()
+        return result
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                with self.app.app_context():
+                    removed, touched = self.run_once()
+                    if removed:
+                        print(f"会话压缩完成: 删除 {removed} 条会话，更新 {touched} 条每日汇总")
+            except Exception as e:
+                print(f"Error compacting player sessions: {e}")
+            self._stop_event.wait(Config.SESSION_COMPACT_INTERVAL)
+
+
+# 全局会话保留任务实例
+session_retention = SessionRetention()
@@ -0,0 +1,93 @@
+"""
+服务器状态采样模块 - 后台线程定期刷新服务器状态快照
+/api/server/status 和页面事件推送直接读取内存中的快照，不再在请求中
+遍历进程、启动systemctl子进程或阻塞测量CPU；孤立进程清理按更长的间隔单独执行。
+所有服务器实例由同一个线程依次采样
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+from config import Config
+
+
+class StatusSampler:
+    """服务器状态快照"""
+
+    def __init__(self):
+        self.app = None
+        self._snapshots: Dict[str, Dict] = {}
+        self._sampled_at = 0.0
+        self._last_cleanup: Optional[float] = None
+        self._cleaned_orphans: Dict[str, int] = {}
+        self._refresh_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def init_app(self, app):
+        """启动后台采样线程"""
+        self.app = app
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='status-sampler', daemon=True)
+        self._thread.start()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def refresh(self, cleanup: bool = False):
+        """立即采样所有实例并替换快照"""
+        from app.instances import instance_registry
+        from app.watchdog import watchdog
+
+        with self._refresh_lock:
+            for instance in instance_registry.all():
+                manager = instance.server_manager
+                if cleanup:
+                    try:
+                        self._cleaned_orphans[instance.id], _ = manager.cleanup_orphaned_processes()
+                    except Exception as e:
+                        print(f"Error cleaning up orphaned processes ({instance.id}): {e}")
+
+                status = manager.get_server_status(cleanup=False)
+                if status.get('running'):
+                    status['cleaned_orphans'] = self._cleaned_orphans.get(instance.id, 0)
+                status['instance_id'] = instance.id
+                status['watchdog'] = watchdog.state(instance.id)
+                status['sampled_at'] = time.time()
+                # 整体替换引用，读取方不需要加锁
+                self._snapshots[instance.id] = status
+            if cleanup:
+                self._last_cleanup = time.monotonic()
+            self._sampled_at = time.monotonic()
+
+    def get(self, instance_id: str = 'default') -> Optional[Dict]:
+        """
+        返回实例最新的状态快照（实例不存在时返回None）
+        后台线程没有运行时（例如在辅助脚本中）按采样间隔同步刷新
+        """
+        if not self._snapshots or (not self.running and time.monotonic() - self._sampled_at >= Config.STATUS_SAMPLE_INTERVAL):
+            self.refresh()
+        snapshot = self._snapshots.get(instance_id)
+        return dict(snapshot) if snapshot is not None else None
+
+    def invalidate(self):
+        """服务器启动/停止后立即重新采样"""
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wakeup.clear()
+            cleanup = self._last_cleanup is None or \
+                time.monotonic() - self._last_cleanup >= Config.ORPHAN_CLEANUP_INTERVAL
+            try:
+                self.refresh(cleanup=cleanup)
+            except Exception as e:
+                print(f"Error sampling server status: {e}")
+            self._wakeup.wait(Config.STATUS_SAMPLE_INTERVAL)
+
+
+# 全局状态采样实例
+status_sampler = StatusSampler()
@@ -0,0 +1,339 @@
+"""
+看门狗模块 - 发现服务器在管理界面之外停止（崩溃、被杀死、卡死）并自动重启
+后台线程定期检查每个实例：已就绪的进程消失，而且不是本程序或控制台 stop 停止的，视为崩溃，
+日志中的崩溃标记作为原因；可选用RakNet ping检测卡死。重启前按指数退避等待，
+WATCHDOG_CRASH_LOOP_WINDOW 分钟内重启 WATCHDOG_CRASH_LOOP_RESTARTS 次视为崩溃循环，停止服务器并报警。
+由systemd管理时只有单元进入 failed 才算崩溃，systemctl stop 之后的 inactive 不会被重新启动；
+systemd单元配置了 Restart= 时由systemd负责重启，看门狗只根据 NRestarts 记录并检测崩溃循环。
+所有记录保存到 watchdog_events 表
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import requests
+
+from app import db, raknet
+from app.models import WatchdogEvent
+from app.server_readiness import FAILURE_PATTERN, STOPPING_PATTERN
+from config import Config
+
+
+class _Watch:
+    """一个实例的看门狗状态"""
+
+    def __init__(self):
+        self.pid: Optional[int] = None  # 已就绪、正在看护的进程
+        self.crash_marker: Optional[str] = None  # 日志中最近的崩溃标记
+        self.stop_seen = False  # 日志中出现了停止标记（例如在控制台输入 stop）
+        self.ping_failures = 0
+        self.restarts = deque()  # 时间窗口内的重启时间（monotonic）
+        self.next_restart_at: Optional[float] = None
+        self.job = None  # 看门狗提交的生命周期任务
+        self.halted = False  # 检测到崩溃循环，不再自动重启
+        self.systemd_restarts: Optional[int] = None  # 上次看到的 NRestarts
+        self.systemd_policy: Optional[str] = None
+        self.via_systemd = False  # 看护的进程是systemd单元的主进程
+        self.last_event: Optional[Dict] = None
+
+
+class Watchdog:
+    """检测服务器意外退出并按退避策略自动重启"""
+
+    def __init__(self):
+        self.app = None
+        self._watches: Dict[str, _Watch] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def init_app(self, app):
+        """启动后台检查线程（WATCHDOG_ENABLED 为false时不启动）"""
+        self.app = app
+        if not Config.WATCHDOG_ENABLED:
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='watchdog', daemon=True)
+        self._thread.start()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _watch(self, instance) -> _Watch:
+        with self._lock:
+            watch = self._watches.get(instance.id)
+            if watch is None:
+                watch = self._watches[instance.id] = _Watch()
+                instance.log_tail.subscribe(lambda line: self._on_line(watch, line))
+            return watch
+
+    @staticmethod
+    def _on_line(watch: _Watch, line: str):
+        if FAILURE_PATTERN.search(line):
+            watch.crash_marker = line.strip()[:500]
+        elif STOPPING_PATTERN.search(line):
+            watch.stop_seen = True
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Error in watchdog: {e}")
+            self._stop_event.wait(Config.WATCHDOG_INTERVAL)
+
+    def check(self):
+        """检查所有实例一次"""
+        from app.instances import instance_registry
+
+        with self.app.app_context():
+            for instance in instance_registry.all():
+                try:
+                    self._check(instance, self._watch(instance))
+                except Exception as e:
+                    print(f"Error in watchdog ({instance.id}): {e}")
+
+    def _check(self, instance, watch: _Watch):
+        from app.lifecycle import lifecycle_worker
+
+        manager = instance.server_manager
+        now = time.monotonic()
+        window = Config.WATCHDOG_CRASH_LOOP_WINDOW * 60
+        while watch.restarts and now - watch.restarts[0] > window:
+            watch.restarts.popleft()
+
+        if watch.job is not None:
+            if not watch.job.finished:
+                return
+            self._job_finished(instance, watch, now)
+
+        # 启动/停止/重启任务执行期间进程变化是预期的
+        if lifecycle_worker.busy(instance.id):
+            watch.pid = None
+            return
+
+        state = self._systemd_state(manager)
+        systemd_restarts = state is not None and state.restarts_automatically
+        watch.systemd_policy = state.restart_policy if systemd_restarts else None
+        if systemd_restarts:
+            self._check_systemd(instance, watch, state, now)
+
+        pid = manager.get_server_pid()
+        if watch.pid is not None and pid != watch.pid:
+            # 看护的进程已经退出
+            old_pid, watch.pid = watch.pid, None
+            if not systemd_restarts and not self._stopped_on_purpose(instance, watch, old_pid, manager):
+                reason = watch.crash_marker or '进程意外退出'
+                if pid is None:
+                    self._crashed(instance, watch, 'crash', old_pid, reason, now)
+                else:
+                    self._record(instance, watch, 'crash', old_pid, reason, message=f"已有新的服务器进程 (PID: {pid})")
+            watch.crash_marker = None
+            watch.stop_seen = False
+
+        if watch.next_restart_at is not None:
+            if now >= watch.next_restart_at:
+                self._restart(instance, watch, now)
+            return
+
+        if pid is not None and watch.pid is None:
+            if self._ready(instance, pid):
+                self._arm(watch, pid, via_systemd=state is not None and state.is_active)
+        elif pid is not None and Config.WATCHDOG_PING_FAILURES > 0:
+            self._check_ping(instance, watch, pid, now)
+
+    @staticmethod
+    def _systemd_state(manager):
+        if not manager.is_systemd_available():
+            return None
+        return manager.systemd().state()
+
+    @staticmethod
+    def _ready(instance, pid: int) -> bool:
+        from app.status_sampler import status_sampler
+
+        if instance.readiness.is_ready(pid):
+            return True
+        snapshot = status_sampler.get(instance.id)
+        return snapshot is not None and snapshot.get('pid') == pid and bool(snapshot.get('ready'))
+
+    @staticmethod
+    def _arm(watch: _Watch, pid: int, via_systemd: bool = False):
+        """开始看护一个已就绪的进程（手动启动服务器后恢复自动重启）"""
+        if watch.halted:
+            # 崩溃循环后手动启动：重新计算时间窗口，下一次崩溃仍会先尝试重启
+            watch.restarts.clear()
+            watch.halted = False
+        watch.pid = pid
+        watch.via_systemd = via_systemd
+        watch.ping_failures = 0
+        watch.crash_marker = None
+        watch.stop_seen = False
+
+    @staticmethod
+    def _stopped_on_purpose(instance, watch: _Watch, pid: int, manager) -> bool:
+        """
+        进程是本程序停止的，或者日志中出现了停止标记；
+        由systemd管理时只有单元进入 failed 才算崩溃（inactive 表示在命令行执行了 systemctl stop 等）
+        """
+        if watch.stop_seen or instance.shutdown.last_stopped_pid == pid:
+            return True
+        if watch.via_systemd:
+            state = manager.systemd().state(max_age=0)
+            if state is not None and state.active_state != 'failed':
+                return True
+        return False
+
+    def _check_systemd(self, instance, watch: _Watch, state, now: float):
+        """单元配置了 Restart=：根据 NRestarts 的增加记录systemd的自动重启"""
+        if watch.systemd_restarts is None or state.restarts < watch.systemd_restarts:
+            watch.systemd_restarts = state.restarts
+            return
+        count = state.restarts - watch.systemd_restarts
+        if count <= 0:
+            return
+        watch.systemd_restarts = state.restarts
+        watch.restarts.extend([now] * count)
+        reason = watch.crash_marker or '进程退出'
+        self._record(instance, watch, 'systemd_restart', watch.pid, reason,
+                     message=f"systemd已自动重启（Restart={state.restart_policy}，累计 {state.restarts} 次）")
+        if len(watch.restarts) >= Config.WATCHDOG_CRASH_LOOP_RESTARTS and not watch.halted:
+            self._halt(instance, watch, reason, stop=True)
+
+    def _check_ping(self, instance, watch: _Watch, pid: int, now: float):
+        """已就绪的进程连续多次不响应ping视为卡死"""
+        manager = instance.server_manager
+        if raknet.ping(manager.SERVER_ADDRESS, manager.SERVER_PORT)['online']:
+            watch.ping_failures = 0
+            return
+        watch.ping_failures += 1
+        if watch.ping_failures >= Config.WATCHDOG_PING_FAILURES:
+            watch.ping_failures = 0
+            self._crashed(instance, watch, 'unresponsive', pid,
+                          f"连续 {Config.WATCHDOG_PING_FAILURES} 次ping无响应", now)
+
+    def _crashed(self, instance, watch: _Watch, kind: str, pid: Optional[int], reason: str, now: float):
+        """记录崩溃并安排重启（达到崩溃循环阈值时停止并报警）"""
+        if len(watch.restarts) >= Config.WATCHDOG_CRASH_LOOP_RESTARTS:
+            self._record(instance, watch, kind, pid, reason)
+            self._halt(instance, watch, reason, stop=instance.server_manager.get_server_pid() is not None)
+            return
+        backoff = min(Config.WATCHDOG_BACKOFF_BASE * 2 ** len(watch.restarts), Config.WATCHDOG_BACKOFF_MAX)
+        watch.next_restart_at = now + backoff
+        self._record(instance, watch, kind, pid, reason, backoff, f"{backoff:.0f} 秒后自动重启")
+
+    def _restart(self, instance, watch: _Watch, now: float):
+        from app.lifecycle import lifecycle_worker
+
+        watch.next_restart_at = None
+        watch.restarts.append(now)
+        # 卡死时进程仍在运行，需要先停止
+        action = 'restart' if instance.server_manager.get_server_pid() is not None else 'start'
+        watch.job, _ = lifecycle_worker.submit(action, requested_by='watchdog', instance_id=instance.id)
+
+    def _job_finished(self, instance, watch: _Watch, now: float):
+        from app.lifecycle import STATE_SUCCEEDED
+
+        job, watch.job = watch.job, None
+        # 任务替换了进程，重新开始看护
+        watch.pid = None
+        if job.state == STATE_SUCCEEDED:
+            self._record(instance, watch, 'restart', instance.server_manager.get_server_pid(), None,
+                         message=job.message)
+        else:
+            reason = watch.crash_marker or job.message
+            watch.crash_marker = None
+            self._crashed(instance, watch, 'restart_failed', None, reason, now)
+
+    def _halt(self, instance, watch: _Watch, reason: str, stop: bool):
+        """崩溃循环：不再自动重启，停止服务器并报警"""
+        from app.lifecycle import lifecycle_worker
+
+        watch.halted = True
+        watch.next_restart_at = None
+        message = (f"{Config.WATCHDOG_CRASH_LOOP_WINDOW:g} 分钟内重启 {len(watch.restarts)} 次，"
+                   f"判定为崩溃循环，已停止自动重启")
+        if stop:
+            lifecycle_worker.submit('stop', requested_by='watchdog', instance_id=instance.id)
+            message += "并停止服务器"
+        self._record(instance, watch, 'crash_loop', None, reason, message=message)
+        self._alert(instance, message, reason)
+
+    @staticmethod
+    def _alert(instance, message: str, reason: str):
+        print(f"Watchdog alert ({instance.id}): {message} - {reason}")
+        if not Config.WATCHDOG_ALERT_WEBHOOK:
+            return
+        try:
+            requests.post(Config.WATCHDOG_ALERT_WEBHOOK, json={
+                'event': 'crash_loop',
+                'instance': instance.id,
+                'name': instance.name,
+                'message': message,
+                'reason': reason,
+                'text': f"[{instance.name}] {message}: {reason}"
+            }, timeout=5)
+        except requests.exceptions.RequestException as e:
+            print(f"Error sending watchdog alert: {e}")
+
+    def _record(self, instance, watch: _Watch, kind: str, pid: Optional[int], reason: Optional[str],
+                backoff: Optional[float] = None, message: str = ''):
+        event = WatchdogEvent(
+            instance_id=instance.id,
+            kind=kind,
+            pid=pid,
+            reason=reason[:500] if reason else None,
+            backoff_seconds=backoff,
+            message=message[:500] or None
+        )
+        try:
+            db.session.add(event)
+            db.session.commit()
+            watch.last_event = event.to_dict()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error recording watchdog event: {e}")
+
+    def state(self, instance_id: str = 'default') -> Dict:
+        """实例的看门狗状态"""
+        watch = self._watches.get(instance_id)
+        state = {
+            'enabled': self.running,
+            'watching': False,
+            'halted': False,
+            'restarting': False,
+            'restart_in': None,
+            'restarts_in_window': 0,
+            'systemd_restart': None,
+            'last_event': None
+        }
+        if watch is None:
+            return state
+        state.update({
+            'watching': watch.pid is not None,
+            'halted': watch.halted,
+            'restarting': watch.job is not None and not watch.job.finished,
+            'restarts_in_window': len(watch.restarts),
+            'systemd_restart': watch.systemd_policy,
+            'last_event': watch.last_event
+        })
+        if watch.next_restart_at is not None:
+            state['restart_in'] = max(0, round(watch.next_restart_at - time.monotonic()))
+        return state
+
+    @staticmethod
+    def history(instance_id: str = 'default', limit: int = 50):
+        """最近的看门狗记录"""
+        if instance_id == 'default':
+            query = WatchdogEvent.query.filter(db.or_(WatchdogEvent.instance_id == 'default', WatchdogEvent.instance_id.is_(None)))
+        else:
+            query = WatchdogEvent.query.filter_by(instance_id=instance_id)
+        events = query.order_by(WatchdogEvent.created_at.desc(), WatchdogEvent.id.desc()).limit(limit).all()
+        return [event.to_dict() for event in events]
+
+
+# 全局看门狗实例
+watchdog = Watchdog()
@@ -24,6 +24,17 @@ class Config:
     WORLD_DIR = BEDROCK_SERVER_DIR / 'worlds' / 'Bedrock level'
     WORLD_BEHAVIOR_PACKS_CONFIG = WORLD_DIR / 'world_behavior_packs.json'
     WORLD_RESOURCE_PACKS_CONFIG = WORLD_DIR / 'world_resource_packs.json'
+    ALLOWLIST_FILE = BEDROCK_SERVER_DIR / 'allowlist.json'
+    PERMISSIONS_FILE = BEDROCK_SERVER_DIR / 'permissions.json'
+    SERVER_PROPERTIES_FILE = BEDROCK_SERVER_DIR / 'server.properties'
+    
+    BEDROCK_SERVER_ADDRESS = os.environ.get('BEDROCK_SERVER_ADDRESS', '127.0.0.1')  # 状态探测使用的地址
+    BEDROCK_SERVER_PORT = int(os.environ.get('BEDROCK_SERVER_PORT', 19132))  # 游戏端口（UDP）
+    RAKNET_PING_TIMEOUT = float(os.environ.get('RAKNET_PING_TIMEOUT', 0.5))  # unconnected ping 超时（秒）
+    
+    # 多个服务器实例：上面的配置为默认实例，INSTANCES_FILE（JSON数组）中列出同一主机上的其他实例
+    DEFAULT_INSTANCE_NAME = os.environ.get('DEFAULT_INSTANCE_NAME', '默认服务器')
+    INSTANCES_FILE = Path(os.environ.get('INSTANCES_FILE', BASE_DIR / 'instances.json'))
     
     # 文件上传配置
     UPLOAD_FOLDER = BASE_DIR / 'static' / 'uploads'
@@ -40,6 +51,84 @@ class Config:
     
     # 日志配置
     LOG_FILE = BEDROCK_SERVER_DIR / 'Dedicated_Server.txt'
+    LOG_TAIL_INTERVAL = float(os.environ.get('LOG_TAIL_INTERVAL', 0.05))  # 日志跟踪轮询间隔（秒）
+    COMMAND_RESPONSE_TIMEOUT = float(os.environ.get('COMMAND_RESPONSE_TIMEOUT', 5))  # 等待命令响应的最长时间（秒）
+
+    # systemd（SYSTEMCTL 可指向测试用的伪造脚本）
+    SYSTEMCTL = os.environ.get('SYSTEMCTL', 'systemctl')
+    SYSTEMCTL_SUDO = os.environ.get('SYSTEMCTL_SUDO', 'true').lower() in ('1', 'true', 'yes')  # 启动/停止时通过sudo执行
+    SYSTEMD_STATE_TTL = float(os.environ.get('SYSTEMD_STATE_TTL', 2))  # 单元状态缓存时间（秒）
+
+    # 启动就绪检测：等待日志出现 "Server started." 的最长时间（秒）
+    SERVER_READY_TIMEOUT = float(os.environ.get('SERVER_READY_TIMEOUT', 180))
+    # 手动模式下保留在内存中的最近服务器输出行数
+    SUPERVISOR_OUTPUT_LINES = int(os.environ.get('SUPERVISOR_OUTPUT_LINES', 1000))
+    # 安全关闭：有玩家在线时的倒计时（秒，0 表示不倒计时），
+    # 发送 stop 后等待保存并退出的截止时间，之后发送SIGTERM，再等待 SERVER_TERM_TIMEOUT 后SIGKILL
+    SERVER_STOP_COUNTDOWN = int(os.environ.get('SERVER_STOP_COUNTDOWN', 30))
+    SERVER_STOP_TIMEOUT = float(os.environ.get('SERVER_STOP_TIMEOUT', 120))
+    SERVER_TERM_TIMEOUT = float(os.environ.get('SERVER_TERM_TIMEOUT', 10))
+
+    # 服务器状态后台采样间隔（秒），/api/server/status 直接返回最新快照
+    STATUS_SAMPLE_INTERVAL = float(os.environ.get('STATUS_SAMPLE_INTERVAL', 5))
+    ORPHAN_CLEANUP_INTERVAL = float(os.environ.get('ORPHAN_CLEANUP_INTERVAL', 300))  # 孤立进程清理间隔（秒）
+
+    # 看门狗：服务器意外退出后自动重启（systemd单元配置了 Restart= 时只记录，不重复重启）
+    WATCHDOG_ENABLED = os.environ.get('WATCHDOG_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    WATCHDOG_INTERVAL = float(os.environ.get('WATCHDOG_INTERVAL', 5))  # 检查间隔（秒）
+    WATCHDOG_BACKOFF_BASE = float(os.environ.get('WATCHDOG_BACKOFF_BASE', 10))  # 第一次重启前的等待（秒），之后每次翻倍
+    WATCHDOG_BACKOFF_MAX = float(os.environ.get('WATCHDOG_BACKOFF_MAX', 300))
+    # 崩溃循环：WATCHDOG_CRASH_LOOP_WINDOW 分钟内重启 WATCHDOG_CRASH_LOOP_RESTARTS 次后停止服务器并报警
+    WATCHDOG_CRASH_LOOP_RESTARTS = int(os.environ.get('WATCHDOG_CRASH_LOOP_RESTARTS', 5))
+    WATCHDOG_CRASH_LOOP_WINDOW = float(os.environ.get('WATCHDOG_CRASH_LOOP_WINDOW', 10))
+    # 连续多少次RakNet ping无响应视为卡死并重启（0 表示不检查）
+    WATCHDOG_PING_FAILURES = int(os.environ.get('WATCHDOG_PING_FAILURES', 0))
+    # 报警时POST JSON的地址（可选）
+    WATCHDOG_ALERT_WEBHOOK = os.environ.get('WATCHDOG_ALERT_WEBHOOK', '')
+
+    # 资源历史：采样间隔（秒，0表示禁用）和各精度级别保留的条数（1秒 / 1分钟 / 1小时）
+    RESOURCE_SAMPLE_INTERVAL = float(os.environ.get('RESOURCE_SAMPLE_INTERVAL', 1))
+    RESOURCE_HISTORY_SECONDS = int(os.environ.get('RESOURCE_HISTORY_SECONDS', 3600))   # 1小时
+    RESOURCE_HISTORY_MINUTES = int(os.environ.get('RESOURCE_HISTORY_MINUTES', 1440))   # 1天
+    RESOURCE_HISTORY_HOURS = int(os.environ.get('RESOURCE_HISTORY_HOURS', 24 * 90))   # 90天
+    RESOURCE_HISTORY_FILE = BASE_DIR / 'database' / 'resource_history.npz'
+
+    # 页面事件推送采样间隔（秒），所有打开的页面共享同一次采样
+    EVENT_STATUS_INTERVAL = float(os.environ.get('EVENT_STATUS_INTERVAL', 5))
+    EVENT_PLAYERS_INTERVAL = float(os.environ.get('EVENT_PLAYERS_INTERVAL', 10))
+    EVENT_ADDONS_INTERVAL = float(os.environ.get('EVENT_ADDONS_INTERVAL', 10))
+
+    # 公开状态（无需登录的状态接口和徽章），快照由后台线程按间隔刷新（秒）
+    PUBLIC_STATUS_ENABLED = os.environ.get('PUBLIC_STATUS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    PUBLIC_STATUS_INTERVAL = float(os.environ.get('PUBLIC_STATUS_INTERVAL', 30))
+
+    # server.properties 自动调优：off 关闭 / recommend 只给出建议 / apply 在管理器启动服务器前写入建议值
+    AUTOTUNE_MODE = os.environ.get('AUTOTUNE_MODE', 'off').lower()
+    AUTOTUNE_SAMPLE_INTERVAL = float(os.environ.get('AUTOTUNE_SAMPLE_INTERVAL', 60))  # 负载采样间隔（秒）
+    AUTOTUNE_WINDOW = int(os.environ.get('AUTOTUNE_WINDOW', 24 * 3600))  # 统计窗口（秒）
+    AUTOTUNE_MIN_SAMPLES = int(os.environ.get('AUTOTUNE_MIN_SAMPLES', 30))  # 给出建议所需的有玩家在线的采样数
+    AUTOTUNE_CPU_HIGH = float(os.environ.get('AUTOTUNE_CPU_HIGH', 75))  # CPU p95 高于此值时降低视距（占全部核心的百分比）
+    AUTOTUNE_CPU_LOW = float(os.environ.get('AUTOTUNE_CPU_LOW', 35))  # CPU p95 低于此值时提高视距
+    AUTOTUNE_VIEW_DISTANCE_MIN = int(os.environ.get('AUTOTUNE_VIEW_DISTANCE_MIN', 12))
+    AUTOTUNE_VIEW_DISTANCE_MAX = int(os.environ.get('AUTOTUNE_VIEW_DISTANCE_MAX', 32))
+    AUTOTUNE_VIEW_DISTANCE_STEP = int(os.environ.get('AUTOTUNE_VIEW_DISTANCE_STEP', 4))  # 每次最多调整的视距
+    AUTOTUNE_TICK_DISTANCE_MIN = int(os.environ.get('AUTOTUNE_TICK_DISTANCE_MIN', 4))
+    AUTOTUNE_TICK_DISTANCE_MAX = int(os.environ.get('AUTOTUNE_TICK_DISTANCE_MAX', 8))
+
+    # 定时效果：玩家重连后重新应用未到期效果的延迟（秒，刚连接时玩家尚未生成）
+    EFFECT_REAPPLY_DELAY = float(os.environ.get('EFFECT_REAPPLY_DELAY', 5))
+
+    # 玩家统计配置
+    ANALYTICS_CACHE_TTL = float(os.environ.get('ANALYTICS_CACHE_TTL', 10))  # 包含在线会话的统计结果缓存时间（秒）
+    ANALYTICS_CACHE_SIZE = int(os.environ.get('ANALYTICS_CACHE_SIZE', 32))  # 最多缓存的统计结果数
+    ANALYTICS_MAX_POINTS = int(os.environ.get('ANALYTICS_MAX_POINTS', 2000))  # 同时在线曲线的最大点数，超过时自动增大时间粒度
+    SESSION_RETENTION_DAYS = int(os.environ.get('SESSION_RETENTION_DAYS', 180))  # 原始会话保留天数，0表示不压缩
+    SESSION_COMPACT_INTERVAL = int(os.environ.get('SESSION_COMPACT_INTERVAL', 6 * 3600))  # 会话压缩运行间隔（秒）
+    POSITION_SAMPLE_INTERVAL = float(os.environ.get('POSITION_SAMPLE_INTERVAL', 60))  # 玩家位置采样间隔（秒），0表示禁用
+    POSITION_RETENTION = int(os.environ.get('POSITION_RETENTION', 24 * 3600))  # 热力图统计的时间窗口（秒）
+    POSITION_BUFFER_SIZE = int(os.environ.get('POSITION_BUFFER_SIZE', 100000))  # 每个维度最多保存的位置采样数
+    PLAYER_CACHE_SIZE = int(os.environ.get('PLAYER_CACHE_SIZE', 10000))  # 名称/xuid 身份缓存的最大条目数
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))  # 导出时每批从数据库读取的行数
 
     # 安全配置
     SESSION_COOKIE_SECURE = False  # 如果使用HTTPS，设置为True
@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
-from app import create_app
+from app import create_app, start_background_services
 from config import Config
 
 app = create_app()
+start_background_services(app)
 
 if __name__ == '__main__':
     app.run(
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""检查玩家会话的高频查询是否使用索引（EXPLAIN QUERY PLAN）"""
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import text
+
+from app import db, create_app
+from app.models import PlayerSession
+
+
+def explain(query) -> str:
+    """返回查询的SQLite执行计划"""
+    sql = str(query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+    rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}')).fetchall()
+    return '\n'.join(row[-1] for row in rows)
+
+
+# (说明, 查询, 期望使用的索引)
+CHECKS = [
+    (
+        '在线状态查询 (_online_session / _player_connected / is_player_invincible / bulk_action)',
+        lambda: PlayerSession.query.filter_by(player_id=1, is_online=True),
+        'ix_player_sessions_player_online',
+    ),
+    (
+        '未知玩家按名称查询在线状态（身份表中没有的名称）',
+        lambda: PlayerSession.query.filter_by(player_name='Steve', is_online=True),
+        'ix_player_sessions_name_online',
+    ),
+    (
+        '历史会话压缩 / 统计增量加载',
+        lambda: PlayerSession.query.filter(
+            PlayerSession.is_online == False,  # noqa: E712
+            PlayerSession.leave_time < datetime.utcnow() - timedelta(days=30)
+        ),
+        'ix_player_sessions_online_leave',
+    ),
+]
+
+app = create_app()
+with app.app_context():
+    print("=== 检查玩家会话查询计划 ===\n")
+    failed = 0
+
+    for description, build_query, index_name in CHECKS:
+        plan = explain(build_query())
+        ok = index_name in plan and 'SCAN player_sessions' not in plan
+        print(f"{'✅' if ok else '❌'} {description}")
+        print(f"   期望索引: {index_name}")
+        for line in plan.splitlines():
+            print(f"   {line}")
+        print()
+        if not ok:
+            failed += 1
+
+    if failed:
+        print(f"⚠️  {failed} 个查询未使用期望的索引")
+        sys.exit(1)
+    print("所有查询均使用了索引")
@@ -0,0 +1,58 @@
+#!/bin/bash
+# 伪造的 systemctl，用于在没有systemd的环境中测试服务器管理逻辑
+# 使用方法: SYSTEMCTL=scripts/fake_systemctl.sh SYSTEMCTL_SUDO=false python3 run.py
+# 单元状态保存在 FAKE_SYSTEMD_DIR（默认 /tmp/fake-systemd），start/restart 启动一个 sleep 进程作为主进程
+
+STATE_DIR="${FAKE_SYSTEMD_DIR:-/tmp/fake-systemd}"
+mkdir -p "$STATE_DIR"
+echo "$*" >> "$STATE_DIR/calls"
+
+state() { cat "$STATE_DIR/state" 2>/dev/null || echo inactive; }
+main_pid() { cat "$STATE_DIR/pid" 2>/dev/null || echo 0; }
+
+start_main() {
+    sleep 86400 >/dev/null 2>&1 &
+    echo $! > "$STATE_DIR/pid"
+    date '+%a %Y-%m-%d %H:%M:%S %Z' > "$STATE_DIR/started"
+    echo active > "$STATE_DIR/state"
+}
+
+stop_main() {
+    kill "$(main_pid)" 2>/dev/null
+    echo 0 > "$STATE_DIR/pid"
+    echo inactive > "$STATE_DIR/state"
+}
+
+case "$1" in
+    --version)
+        echo "systemd 252 (fake)"
+        ;;
+    is-active)
+        state
+        [ "$(state)" = active ]
+        ;;
+    show)
+        if [ "$(state)" = active ]; then sub=running; pid=$(main_pid); else sub=dead; pid=0; fi
+        echo "ActiveState=$(state)"
+        echo "SubState=$sub"
+        echo "MainPID=$pid"
+        echo "ExecMainStartTimestamp=$(cat "$STATE_DIR/started" 2>/dev/null || echo n/a)"
+        echo "NRestarts=$(cat "$STATE_DIR/restarts" 2>/dev/null || echo 0)"
+        echo "Restart=$(cat "$STATE_DIR/restart" 2>/dev/null || echo no)"
+        echo "Result=$(cat "$STATE_DIR/result" 2>/dev/null || echo success)"
+        ;;
+    start)
+        [ "$(state)" = active ] || start_main
+        ;;
+    stop)
+        stop_main
+        ;;
+    restart)
+        stop_main
+        start_main
+        ;;
+    *)
+        echo "fake_systemctl: 不支持的命令 $1" >&2
+        exit 1
+        ;;
+esac
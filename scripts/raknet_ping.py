@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""向Bedrock服务器发送 RakNet unconnected ping 并打印 pong 内容"""
+import argparse
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import raknet
+from config import Config
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RakNet unconnected ping')
+    parser.add_argument('host', nargs='?', default=Config.BEDROCK_SERVER_ADDRESS)
+    parser.add_argument('port', nargs='?', type=int, default=Config.BEDROCK_SERVER_PORT)
+    parser.add_argument('--timeout', type=float, default=Config.RAKNET_PING_TIMEOUT)
+    parser.add_argument('--count', type=int, default=1, help='ping 次数')
+    args = parser.parse_args()
+
+    failures = 0
+    for _ in range(args.count):
+        result = raknet.ping(args.host, args.port, args.timeout)
+        if not result['online']:
+            failures += 1
+            print(f"❌ {result['error']}")
+            continue
+        print(f"✅ {args.host}:{args.port}  {result['latency_ms']}ms  "
+              f"{result.get('motd')} ({result.get('version')}, 协议 {result.get('protocol')})  "
+              f"玩家 {result.get('players_online')}/{result.get('players_max')}  "
+              f"世界 {result.get('level_name')}")
+
+    sys.exit(1 if failures == args.count else 0)
+
+
+if __name__ == '__main__':
+    main()